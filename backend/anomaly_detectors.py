@@ -0,0 +1,218 @@
+import os
+
+# Anomaly Detection Engines (engine.detect_anomalies)
+# Each engine gets the upload's [Net Cash Flow, Operating Expenses] rows in date order (and the
+# upload's industry) and flags about ANOMALY_CONTAMINATION of them.
+#   isolation_forest - scikit-learn IsolationForest fitted on the upload itself
+#   robust_zscore    - robust z-scores against a local median / MAD baseline in NumPy; no model to fit,
+#                      linear in the number of rows
+#   pretrained       - scores with the industry's IsolationForest trained offline (anomaly_models.py);
+#                      falls back to isolation_forest when no model has been trained yet
+# ANOMALY_ENGINE picks the default; /upload and /jobs take anomaly_engine per request.
+# Streamed uploads (engine.AnomalyStream) never hold all their rows: each engine is set up on the first
+# ANOMALY_STREAM_FIT_ROWS rows (AnomalyDetector.flagger) and later chunks are flagged as they arrive.
+#   ANOMALY_CONTAMINATION - share of rows flagged (IsolationForest's contamination)
+#   IFOREST_N_ESTIMATORS  - trees per forest
+#   IFOREST_MAX_SAMPLES   - rows subsampled per tree: "auto" (min(256, rows)), a row count, or a fraction (0-1]
+#   IFOREST_N_JOBS        - threads for fitting and scoring (-1 = all cores)
+#   ROBUST_WINDOW         - rows per baseline window (median / MAD per window, interpolated between windows)
+#   ROBUST_Z_THRESHOLD    - minimum robust z-score to flag
+#   ANOMALY_STREAM_FIT_ROWS - streamed uploads: rows held to set an engine up on (the forest's fit sample)
+ANOMALY_ENGINE = os.getenv("ANOMALY_ENGINE", "isolation_forest")
+ANOMALY_CONTAMINATION = float(os.getenv("ANOMALY_CONTAMINATION", "0.05"))
+IFOREST_N_ESTIMATORS = int(os.getenv("IFOREST_N_ESTIMATORS", "100"))
+IFOREST_MAX_SAMPLES = os.getenv("IFOREST_MAX_SAMPLES", "auto")
+IFOREST_N_JOBS = int(os.getenv("IFOREST_N_JOBS", "1"))
+ROBUST_WINDOW = int(os.getenv("ROBUST_WINDOW", "256"))
+ROBUST_Z_THRESHOLD = float(os.getenv("ROBUST_Z_THRESHOLD", "3.5"))
+ANOMALY_STREAM_FIT_ROWS = int(os.getenv("ANOMALY_STREAM_FIT_ROWS", "100000"))
+
+ANOMALY_FEATURES = ['Net Cash Flow', 'Operating Expenses']
+
+# MAD -> standard deviation for normal data, and the same for the mean absolute deviation fallback
+MAD_SCALE = 1.4826
+MEAN_AD_SCALE = 1.2533
+
+def _max_samples(value):
+    if value == "auto":
+        return value
+    number = float(value)
+    return number if 0 < number <= 1 and "." in value else int(number)
+
+class AnomalyDetector:
+    """
+    Base class of the engines. flag(data, industry) takes a float array of shape
+    (rows, len(ANOMALY_FEATURES)) in date order and returns a boolean mask of the anomalous rows.
+    flagger(sample, industry) sets the engine up on a sample and returns a function flagging further
+    arrays the same way (streamed uploads); by default each array is flagged on its own.
+    """
+    name = None
+
+    def flag(self, data, industry=None):
+        raise NotImplementedError
+
+    def flagger(self, sample, industry=None):
+        return lambda data: self.flag(data, industry)
+
+class IsolationForestDetector(AnomalyDetector):
+    """
+    The original detector. The forest is fitted with contamination="auto" (no scoring pass inside
+    fit) and the cutoff is taken from one score_samples pass, so rows are scored once instead of
+    twice as fit_predict does; the flagged rows are the same.
+    """
+    name = "isolation_forest"
+
+    def __init__(self, n_estimators=IFOREST_N_ESTIMATORS, max_samples=IFOREST_MAX_SAMPLES, n_jobs=IFOREST_N_JOBS,
+                 contamination=ANOMALY_CONTAMINATION, random_state=42):
+        self.n_estimators = n_estimators
+        self.max_samples = _max_samples(max_samples) if isinstance(max_samples, str) else max_samples
+        self.n_jobs = n_jobs
+        self.contamination = contamination
+        self.random_state = random_state
+
+    def _fit(self, data):
+        # scikit-learn is imported here, not at module load: it dominates cold-start time
+        from sklearn.ensemble import IsolationForest
+        max_samples = self.max_samples
+        if isinstance(max_samples, int):
+            max_samples = min(max_samples, len(data))
+        model = IsolationForest(n_estimators=self.n_estimators, max_samples=max_samples, n_jobs=self.n_jobs,
+                                contamination="auto", random_state=self.random_state)
+        return model.fit(data)
+
+    def flag(self, data, industry=None):
+        import numpy as np
+        scores = self._fit(data).score_samples(data)
+        return scores < np.percentile(scores, 100.0 * self.contamination)
+
+    def flagger(self, sample, industry=None):
+        # Fitted on the sample; the cutoff is the sample's own contamination percentile
+        import numpy as np
+        model = self._fit(sample)
+        cutoff = np.percentile(model.score_samples(sample), 100.0 * self.contamination)
+        return lambda data: model.score_samples(data) < cutoff
+
+class RobustZScoreDetector(AnomalyDetector):
+    """
+    Per feature, |x - median| / (1.4826 * MAD) against a local baseline: the statement is cut into
+    windows of `window` rows, each window's median and MAD are computed at once (np.median over a
+    (windows, window) view, which partitions rather than sorts) and linearly interpolated between
+    window centres. A row's score is its largest feature z-score; rows above `threshold` are
+    flagged, highest first, up to `contamination` of the rows.
+    Where a window's MAD is 0 (e.g. Operating Expenses on a run of credits) the feature's
+    whole-statement scale is used instead.
+    """
+    name = "robust_zscore"
+
+    def __init__(self, window=ROBUST_WINDOW, threshold=ROBUST_Z_THRESHOLD, contamination=ANOMALY_CONTAMINATION):
+        self.window = max(1, window)
+        self.threshold = threshold
+        self.contamination = contamination
+
+    @staticmethod
+    def _global_scale(values):
+        import numpy as np
+        median = np.median(values)
+        deviation = np.abs(values - median)
+        scale = MAD_SCALE * np.median(deviation)
+        return scale if scale > 0 else MEAN_AD_SCALE * deviation.mean()
+
+    def _baseline(self, values):
+        """
+        Returns (median, MAD) per row.
+        """
+        import numpy as np
+        n = len(values)
+        full = n // self.window * self.window
+        blocks = values[:full].reshape(-1, self.window)
+        medians = np.median(blocks, axis=1) if full else np.empty(0)
+        mads = np.median(np.abs(blocks - medians[:, None]), axis=1) if full else np.empty(0)
+        centres = np.arange(len(medians)) * self.window + (self.window - 1) / 2
+        if full < n: # Leftover rows form one short window
+            tail = values[full:]
+            tail_median = np.median(tail)
+            medians = np.append(medians, tail_median)
+            mads = np.append(mads, np.median(np.abs(tail - tail_median)))
+            centres = np.append(centres, (full + n - 1) / 2)
+        if len(centres) == 1:
+            return np.full(n, medians[0]), np.full(n, mads[0])
+        rows = np.arange(n)
+        return np.interp(rows, centres, medians), np.interp(rows, centres, mads)
+
+    def scores(self, data):
+        import numpy as np
+        scores = np.zeros(len(data))
+        for column in range(data.shape[1]):
+            values = np.ascontiguousarray(data[:, column], dtype=np.float64)
+            fallback = self._global_scale(values)
+            if fallback == 0: # Constant feature: nothing stands out
+                continue
+            median, mad = self._baseline(values)
+            scale = np.where(mad > 0, MAD_SCALE * mad, fallback)
+            np.maximum(scores, np.abs(values - median) / scale, out=scores)
+        return scores
+
+    def flag(self, data, industry=None):
+        import numpy as np
+        scores = self.scores(data)
+        flagged = scores > self.threshold
+        limit = int(self.contamination * len(data))
+        if flagged.sum() > limit:
+            flagged[:] = False
+            if limit:
+                flagged[np.argpartition(scores, -limit)[-limit:]] = True
+        return flagged
+
+class PretrainedDetector(AnomalyDetector):
+    """
+    Scores rows with the industry's pre-trained forest (decision_function < 0, i.e. the cutoff set
+    on the training rows). No fitting happens per upload.
+    """
+    name = "pretrained"
+
+    def flag(self, data, industry=None):
+        from anomaly_models import model_registry
+        found = model_registry.get(industry)
+        if found is None:
+            model_registry.record_scored(fallback=True)
+            return get_detector(IsolationForestDetector.name).flag(data, industry)
+        model, _ = found
+        model_registry.record_scored()
+        return model.decision_function(data) < 0
+
+    def flagger(self, sample, industry=None):
+        from anomaly_models import model_registry
+        found = model_registry.get(industry)
+        if found is None:
+            model_registry.record_scored(fallback=True)
+            return get_detector(IsolationForestDetector.name).flagger(sample, industry)
+        model, _ = found
+        model_registry.record_scored()
+        return lambda data: model.decision_function(data) < 0
+
+ANOMALY_ENGINES = {
+    IsolationForestDetector.name: IsolationForestDetector,
+    RobustZScoreDetector.name: RobustZScoreDetector,
+    PretrainedDetector.name: PretrainedDetector,
+}
+
+def resolve_engine(name=None):
+    """
+    Canonical engine name for a request's anomaly_engine (None / "" = ANOMALY_ENGINE).
+    Raises ValueError for unknown names.
+    """
+    name = (name or ANOMALY_ENGINE).strip().lower()
+    if name not in ANOMALY_ENGINES:
+        raise ValueError(f"Unknown anomaly engine '{name}'. Choose one of: {', '.join(ANOMALY_ENGINES)}")
+    return name
+
+_detectors = {}
+
+def get_detector(name=None):
+    """
+    The shared detector for an engine name (see resolve_engine), configured from the settings above.
+    """
+    name = resolve_engine(name)
+    if name not in _detectors:
+        _detectors[name] = ANOMALY_ENGINES[name]()
+    return _detectors[name]
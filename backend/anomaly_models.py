@@ -0,0 +1,350 @@
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+# Pre-trained Anomaly Models (the "pretrained" anomaly engine, see anomaly_detectors.py)
+# IsolationForests trained offline, one per industry, on the statement rows of stored reports
+# (transactions table), so an upload is only scored (decision_function) instead of fitting a forest.
+# The cutoff is fixed at training time (ANOMALY_CONTAMINATION of the training rows), so a short
+# statement is judged against the industry's history rather than against itself.
+# Reports are grouped by industry_key, so "Retail" and "retail" train (and are scored by) one model.
+# Layout: ANOMALY_MODEL_DIR/<industry>/v<N>.joblib + v<N>.json (metadata), current.json names the live
+# version. The "_all" model is trained on every report and serves industries without a model.
+# Models are loaded once per process; current.json is re-checked every ANOMALY_MODEL_RECHECK_S so a
+# retrain (or a first model) is picked up without a restart.
+#   ANOMALY_MODEL_DIR       - where models are kept
+#   ANOMALY_MODEL_MAX_ROWS  - most recent statement rows a model is trained on
+#   ANOMALY_MODEL_MIN_ROWS  - industries with fewer stored rows get no model of their own
+#   ANOMALY_MODEL_KEEP      - versions kept per industry
+#   ANOMALY_MODEL_RECHECK_S - how often a loaded model's current.json is checked for a newer version
+# Usage:
+#   python anomaly_models.py train                      (every industry with enough rows, plus _all)
+#   python anomaly_models.py train --industry Retail --industry Manufacturing
+#   python anomaly_models.py list
+ANOMALY_MODEL_DIR = os.getenv("ANOMALY_MODEL_DIR", "./anomaly_models")
+ANOMALY_MODEL_MAX_ROWS = int(os.getenv("ANOMALY_MODEL_MAX_ROWS", "200000"))
+ANOMALY_MODEL_MIN_ROWS = int(os.getenv("ANOMALY_MODEL_MIN_ROWS", "1000"))
+ANOMALY_MODEL_KEEP = int(os.getenv("ANOMALY_MODEL_KEEP", "3"))
+ANOMALY_MODEL_RECHECK_S = float(os.getenv("ANOMALY_MODEL_RECHECK_S", "60"))
+
+ALL_INDUSTRIES = "_all"
+
+def industry_key(industry):
+    """
+    Directory name for an industry (None = ALL_INDUSTRIES).
+    """
+    if not industry:
+        return ALL_INDUSTRIES
+    return re.sub(r"[^a-z0-9]+", "_", str(industry).strip().lower()).strip("_") or ALL_INDUSTRIES
+
+def _write_json(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+class _Loaded:
+    def __init__(self, model, metadata, pointer_mtime):
+        self.model = model
+        self.metadata = metadata
+        self.pointer_mtime = pointer_mtime
+        self.checked_at = time.monotonic()
+
+class ModelRegistry:
+    """
+    Trained models on disk, and the ones this process has loaded. get(industry) returns the
+    industry's model (or the _all model) with its metadata.
+    """
+
+    def __init__(self, directory=ANOMALY_MODEL_DIR, recheck_s=ANOMALY_MODEL_RECHECK_S):
+        self.directory = directory
+        self.recheck_s = recheck_s
+        self._loaded = {} # industry key -> _Loaded (model None when the industry has none)
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock() # One disk load at a time
+
+        # Counters
+        self.loads = 0
+        self.load_s = 0.0
+        self.scored = 0
+        self.fallbacks = 0
+
+    def _pointer(self, key):
+        return os.path.join(self.directory, key, "current.json")
+
+    def _pointer_mtime(self, key):
+        try:
+            return os.stat(self._pointer(key)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def current_version(self, key):
+        try:
+            with open(self._pointer(key), encoding="utf-8") as f:
+                return json.load(f)["version"]
+        except FileNotFoundError:
+            return None
+
+    def metadata(self, key, version):
+        with open(os.path.join(self.directory, key, f"v{version}.json"), encoding="utf-8") as f:
+            return json.load(f)
+
+    def load(self, key, version=None):
+        """
+        Reads a model from disk: (model, metadata), or None if the industry has no model.
+        """
+        import joblib
+        version = version or self.current_version(key)
+        if version is None:
+            return None
+        start = time.perf_counter()
+        model = joblib.load(os.path.join(self.directory, key, f"v{version}.joblib"))
+        metadata = self.metadata(key, version)
+        with self._lock:
+            self.loads += 1
+            self.load_s += time.perf_counter() - start
+        return model, metadata
+
+    def _entry(self, key):
+        with self._lock:
+            entry = self._loaded.get(key)
+        if entry is not None and time.monotonic() - entry.checked_at < self.recheck_s:
+            return entry
+        with self._load_lock:
+            mtime = self._pointer_mtime(key)
+            if entry is not None and entry.pointer_mtime == mtime:
+                entry.checked_at = time.monotonic()
+                return entry
+            loaded = self.load(key) if mtime is not None else None
+            entry = _Loaded(*(loaded or (None, None)), mtime)
+            with self._lock:
+                self._loaded[key] = entry
+        return entry
+
+    def get(self, industry=None):
+        """
+        (model, metadata) for the industry, else the _all model, else None.
+        """
+        for key in dict.fromkeys((industry_key(industry), ALL_INDUSTRIES)):
+            entry = self._entry(key)
+            if entry.model is not None:
+                return entry.model, entry.metadata
+        return None
+
+    def version_tag(self, industry=None):
+        """
+        The model get(industry) scores with, as "<industry key>/v<version>" ("" when there is none and
+        the engine falls back to fitting per upload). Part of pretrained-engine result cache keys.
+        """
+        found = self.get(industry)
+        if found is None:
+            return ""
+        metadata = found[1]
+        return f"{industry_key(metadata['industry'])}/v{metadata['version']}"
+
+    def reload(self):
+        with self._lock:
+            self._loaded.clear()
+
+    def record_scored(self, fallback=False):
+        with self._lock:
+            if fallback:
+                self.fallbacks += 1
+            else:
+                self.scored += 1
+
+    def save(self, key, model, metadata):
+        """
+        Writes a new version for the industry and makes it current. Returns the metadata with its version.
+        """
+        import joblib
+        directory = os.path.join(self.directory, key)
+        os.makedirs(directory, exist_ok=True)
+        versions = self.versions(key)
+        version = (versions[-1] if versions else 0) + 1
+        metadata = dict(metadata, version=version)
+        model_path = os.path.join(directory, f"v{version}.joblib")
+        joblib.dump(model, f"{model_path}.tmp")
+        os.replace(f"{model_path}.tmp", model_path)
+        metadata["model_bytes"] = os.path.getsize(model_path)
+        _write_json(os.path.join(directory, f"v{version}.json"), metadata)
+        _write_json(self._pointer(key), {"version": version})
+        for old in versions[:max(0, len(versions) + 1 - ANOMALY_MODEL_KEEP)]:
+            for ext in ("joblib", "json"):
+                try:
+                    os.remove(os.path.join(directory, f"v{old}.{ext}"))
+                except FileNotFoundError:
+                    pass
+        return metadata
+
+    def versions(self, key):
+        try:
+            names = os.listdir(os.path.join(self.directory, key))
+        except FileNotFoundError:
+            return []
+        return sorted(int(m.group(1)) for m in (re.fullmatch(r"v(\d+)\.joblib", n) for n in names) if m)
+
+    def industries(self):
+        try:
+            return sorted(k for k in os.listdir(self.directory) if self.current_version(k) is not None)
+        except FileNotFoundError:
+            return []
+
+    def stats(self):
+        with self._lock:
+            loaded = {key: entry.metadata["version"] for key, entry in self._loaded.items() if entry.model is not None}
+            return {
+                "loaded": loaded,
+                "loads": self.loads,
+                "avg_load_ms": round(self.load_s / self.loads * 1000, 2) if self.loads else None,
+                "scored": self.scored,
+                "fallbacks": self.fallbacks
+            }
+
+# Shared process-wide instance
+model_registry = ModelRegistry()
+
+def stored_industries(db):
+    """
+    The industries of the stored reports as {industry key: [the spellings stored under it]}.
+    """
+    from sqlalchemy import select
+    from database import Report
+    grouped = {}
+    for industry in db.execute(select(Report.industry).where(Report.industry.is_not(None)).distinct()).scalars():
+        key = industry_key(industry)
+        if key != ALL_INDUSTRIES:
+            grouped.setdefault(key, []).append(industry)
+    return {key: sorted(values) for key, values in sorted(grouped.items())}
+
+def training_rows(db, industry=None, max_rows=ANOMALY_MODEL_MAX_ROWS):
+    """
+    Feature matrix (anomaly_detectors.ANOMALY_FEATURES) of the most recent stored statement rows of
+    an industry's reports (every report whose industry has the same industry_key; None = all reports),
+    and the number of reports they came from.
+    """
+    import numpy as np
+    from sqlalchemy import select, func
+    from database import Report, Transaction
+    revenue = func.coalesce(Transaction.revenue, 0.0)
+    expenses = func.coalesce(Transaction.operating_expenses, 0.0)
+    loans = func.coalesce(Transaction.loan_repayment, 0.0)
+    query = select(revenue - expenses - loans, expenses, Transaction.report_id).join(Report, Report.id == Transaction.report_id)
+    key = industry_key(industry)
+    if key != ALL_INDUSTRIES:
+        query = query.where(Report.industry.in_(stored_industries(db).get(key, [])))
+    rows = db.execute(query.order_by(Transaction.id.desc()).limit(max_rows)).all()
+    if not rows:
+        return np.empty((0, 2)), 0
+    data = np.array([row[:2] for row in rows], dtype=np.float64)
+    return data, len({row[2] for row in rows})
+
+def train_model(db, industry=None, registry=model_registry, max_rows=ANOMALY_MODEL_MAX_ROWS, min_rows=ANOMALY_MODEL_MIN_ROWS):
+    """
+    Trains and saves the model of one industry key (None = the _all model), on the reports of
+    every spelling of it. Returns its metadata, or None when there are fewer than min_rows stored rows.
+    """
+    import sklearn
+    from sklearn.ensemble import IsolationForest
+    from anomaly_detectors import ANOMALY_FEATURES, IsolationForestDetector
+    data, reports = training_rows(db, industry, max_rows)
+    if len(data) < min_rows:
+        return None
+    forest = IsolationForestDetector() # Same IFOREST_* settings as the per-upload engine
+    max_samples = min(forest.max_samples, len(data)) if isinstance(forest.max_samples, int) else forest.max_samples
+    start = time.perf_counter()
+    model = IsolationForest(n_estimators=forest.n_estimators, max_samples=max_samples, contamination=forest.contamination,
+                            n_jobs=forest.n_jobs, random_state=forest.random_state).fit(data)
+    metadata = {
+        "industry": industry_key(industry),
+        "trained_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "rows": len(data),
+        "reports": reports,
+        "features": ANOMALY_FEATURES,
+        "contamination": forest.contamination,
+        "n_estimators": model.n_estimators,
+        "max_samples": model.max_samples_,
+        "offset": float(model.offset_),
+        "train_s": round(time.perf_counter() - start, 3),
+        "sklearn_version": sklearn.__version__,
+    }
+    return registry.save(industry_key(industry), model, metadata)
+
+def train_models(db, industries=None, registry=model_registry, max_rows=ANOMALY_MODEL_MAX_ROWS, min_rows=ANOMALY_MODEL_MIN_ROWS):
+    """
+    Trains the named industries, or every industry found in the reports plus the _all model; each
+    industry key once. Returns {industry key: metadata or None (too few rows)}.
+    """
+    if not industries:
+        industries = [None] + list(stored_industries(db))
+    keys = dict.fromkeys(industry_key(industry) for industry in industries)
+    return {key: train_model(db, None if key == ALL_INDUSTRIES else key, registry, max_rows, min_rows) for key in keys}
+
+def profile_model(registry, key, rows=10_000, repeat=5):
+    """
+    Load memory (tracemalloc peak while loading), and median decision_function latency on rows synthetic rows.
+    """
+    import statistics
+    import tracemalloc
+    import joblib, sklearn.ensemble # Imported before measuring, so only the model is counted
+    import numpy as np
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    model, _ = registry.load(key)
+    load_bytes = tracemalloc.get_traced_memory()[1] - before
+    if not tracing:
+        tracemalloc.stop()
+    rng = np.random.default_rng(0)
+    expenses = rng.gamma(2.0, 5000.0, rows)
+    data = np.column_stack([rng.gamma(2.0, 5000.0, rows) - expenses, expenses])
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model.decision_function(data)
+        samples.append(time.perf_counter() - start)
+    return {"load_mb": load_bytes / 1e6, "score_ms": statistics.median(samples) * 1000, "score_rows": rows}
+
+def _print_model(registry, key, metadata):
+    profile = profile_model(registry, key)
+    print(f"  {key:<20} v{metadata['version']:<3} {metadata['rows']:>8} rows from {metadata['reports']:>5} reports | "
+          f"trained {metadata['trained_at']} in {metadata['train_s']:.2f}s | file {metadata['model_bytes'] / 1e6:.2f} MB, "
+          f"loaded {profile['load_mb']:.2f} MB | scores {profile['score_rows']} rows in {profile['score_ms']:.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and inspect the per-industry anomaly models")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train", help="Train from stored reports")
+    train.add_argument("--industry", action="append", help="Industry to train (repeatable); default: all plus _all")
+    train.add_argument("--max-rows", type=int, default=ANOMALY_MODEL_MAX_ROWS)
+    train.add_argument("--min-rows", type=int, default=ANOMALY_MODEL_MIN_ROWS)
+    commands.add_parser("list", help="Show current models with scoring latency and memory")
+    args = parser.parse_args()
+
+    registry = model_registry
+    if args.command == "train":
+        from database import SessionLocal, init_db
+        init_db()
+        with SessionLocal() as db:
+            trained = train_models(db, args.industry, registry, args.max_rows, args.min_rows)
+        for key, metadata in trained.items():
+            if metadata is None:
+                print(f"  {key:<20} skipped: fewer than {args.min_rows} stored rows")
+            else:
+                _print_model(registry, key, metadata)
+        return
+
+    keys = registry.industries()
+    if not keys:
+        print(f"No models in {registry.directory}. Train them with: python anomaly_models.py train")
+    for key in keys:
+        _print_model(registry, key, registry.metadata(key, registry.current_version(key)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+from file_loader import SUPPORTED_EXTENSIONS
+
+# Nightly batch scoring: runs analyze_financials over many statements on a process pool.
+# Usage:
+#   python batch_analyze.py statements/ --output results.jsonl --workers 8
+#   python batch_analyze.py "exports/**/*.csv" --output results.jsonl   (resumes: finished files are skipped)
+# Each output line is one file: path, size, mtime, status ('ok' / 'error'), rows, seconds, and the result or error.
+
+# Modules imported once in the fork server, so workers start with pandas/sklearn already loaded
+PRELOAD_MODULES = ["engine", "file_loader", "sklearn.ensemble"]
+
+def collect_files(inputs):
+    """
+    Expands directories (recursively) and glob patterns into a sorted list of supported files.
+    """
+    files = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                files.update(os.path.join(root, n) for n in names if n.lower().endswith(SUPPORTED_EXTENSIONS))
+        else:
+            files.update(p for p in glob.glob(item, recursive=True) if p.lower().endswith(SUPPORTED_EXTENSIONS))
+    return sorted(os.path.abspath(p) for p in files)
+
+def file_identity(path):
+    stat = os.stat(path)
+    return {"path": path, "size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+def load_finished(output_path, retry_errors=False):
+    """
+    Returns {(path, size, mtime)} already recorded in the output, so reruns skip unchanged files.
+    """
+    finished = set()
+    if not os.path.exists(output_path):
+        return finished
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue # Partially written line from an interrupted run
+            if retry_errors and record.get("status") != "ok":
+                continue
+            finished.add((record["path"], record["size"], record["mtime"]))
+    return finished
+
+def analyze_file(path):
+    """
+    Worker: parse + analyze one statement. Never raises; errors are returned as records.
+    """
+    from engine import analyze_financials
+    from file_loader import load_statement
+
+    record = file_identity(path)
+    start = time.perf_counter()
+    try:
+        with open(path, "rb") as f:
+            df = load_statement(f, path.lower())
+        rows = 0 if df is None else len(df)
+        result = analyze_financials(df)
+        record["rows"] = rows
+        if "error" in result:
+            record.update(status="error", error=result["error"])
+        else:
+            record.update(
+                status="ok",
+                score=result["score"],
+                credit_score=result["credit_score"],
+                tax_status=result["tax_status"],
+                forecast_next_month=result["forecast_next_month"],
+                metrics=result["metrics"],
+                flags=[flag["type"] for flag in result["flags"]],
+                anomaly_count=len(result["anomalies"]),
+                months=len(result["charts_data"])
+            )
+    except Exception as e:
+        record.update(status="error", rows=0, error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc(limit=3))
+    record["seconds"] = round(time.perf_counter() - start, 4)
+    return record
+
+def get_pool_context():
+    """
+    forkserver + preload where available: the heavy imports happen once, not once per worker.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload(PRELOAD_MODULES)
+        return ctx
+    return multiprocessing.get_context("spawn")
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze a directory or glob of statements in parallel")
+    parser.add_argument("inputs", nargs="+", help="Directories and/or glob patterns (CSV, XLS/XLSX, PDF)")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL file, appended to")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("BATCH_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--no-resume", action="store_true", help="Re-run files already in the output")
+    parser.add_argument("--retry-errors", action="store_true", help="Re-run files whose previous attempt failed")
+    args = parser.parse_args()
+
+    files = collect_files(args.inputs)
+    finished = set() if args.no_resume else load_finished(args.output, args.retry_errors)
+    pending = [p for p in files if tuple(file_identity(p).values()) not in finished]
+    print(f"Found {len(files)} files, {len(files) - len(pending)} already processed, {len(pending)} to run with {args.workers} workers")
+    if not pending:
+        return
+
+    ok = errors = rows = 0
+    start = time.perf_counter()
+    with open(args.output, "a", encoding="utf-8") as out:
+        with get_pool_context().Pool(processes=args.workers) as pool:
+            for record in pool.imap_unordered(analyze_file, pending, chunksize=1):
+                out.write(json.dumps(record, default=str) + "\n")
+                out.flush() # Every finished file is durable, so an interrupted run resumes cleanly
+                rows += record.get("rows", 0)
+                if record["status"] == "ok":
+                    ok += 1
+                else:
+                    errors += 1
+                    print(f"ERROR {record['path']}: {record['error'].splitlines()[0]}", file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    print(f"Done: {ok} ok, {errors} errors in {elapsed:.1f}s "
+          f"({len(pending) / elapsed:.2f} files/s, {rows / elapsed:,.0f} rows/s) -> {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import asyncio
+import functools
+import os
+import statistics
+import tempfile
+import time
+
+# Benchmark: concurrent report saves + history reads on local SQLite, inside one event loop, for
+#   blocking:  sync Session calls made directly in the coroutine (what an async endpoint doing
+#              db.commit() would do)
+#   sync pool: sync Session calls on the "db" thread pool (run_in_stage, DB_WORKERS threads)
+#   async:     AsyncSession (aiosqlite); only row conversion goes to the pool
+# Reports save throughput, read latency while saves run, and the worst event-loop stall.
+# Usage: python bench_async_db.py --saves 32 --rows 2000 --readers 8 --read-interval 0.05
+
+def make_result(rows):
+    records = [{"Date": f"2024-01-{i % 28 + 1:02d} 10:00:00", "Description": f"UPI/PAYMENT/{i}",
+                "Debit": float(i % 500), "Credit": 0.0, "Operating Expenses": float(i % 500)} for i in range(rows)]
+    metrics = {"rev_growth_pct": 4.2, "expense_ratio": 0.82, "net_cash_flow": 125000.0}
+    return {"score": 64, "metrics": metrics, "flags": [], "transaction_data": records}
+
+async def loop_lag(stop, lags):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.005)
+        lags.append(time.perf_counter() - start - 0.005)
+
+async def run(mode, saves, result, transactions, readers, read_interval):
+    import database
+    from executors import run_in_stage
+
+    async def save(i):
+        if mode == "async":
+            async with database.AsyncSessionLocal() as db:
+                await database.save_report_async(db, result, f"bench_{i}.csv", transactions,
+                                                 offload=functools.partial(run_in_stage, "db"))
+            return
+        def save_sync():
+            with database.SessionLocal() as db:
+                database.save_report(db, result, f"bench_{i}.csv", transactions)
+        if mode == "blocking":
+            save_sync()
+        else:
+            await run_in_stage("db", save_sync)
+
+    async def read():
+        if mode == "async":
+            async with database.AsyncSessionLocal() as db:
+                await database.get_recent_reports_async(db)
+            return
+        def read_sync():
+            with database.SessionLocal() as db:
+                database.get_recent_reports(db)
+        if mode == "blocking":
+            read_sync()
+        else:
+            await run_in_stage("db", read_sync)
+
+    done = asyncio.Event()
+    latencies = []
+    async def reader():
+        while not done.is_set():
+            start = time.perf_counter()
+            await read()
+            latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(max(0.0, read_interval - (time.perf_counter() - start))) # Fixed read rate
+
+    stop = asyncio.Event()
+    lags = []
+    lag_task = asyncio.create_task(loop_lag(stop, lags))
+    reader_tasks = [asyncio.create_task(reader()) for _ in range(readers)]
+    start = time.perf_counter()
+    await asyncio.gather(*(save(i) for i in range(saves)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await asyncio.gather(*reader_tasks)
+    stop.set()
+    await lag_task
+    latencies.sort()
+    return {
+        "saves_per_s": saves / elapsed,
+        "read_p50_ms": statistics.median(latencies) * 1000 if latencies else float("nan"),
+        "read_p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else float("nan"),
+        "reads": len(latencies),
+        "max_loop_stall_ms": max(lags, default=0.0) * 1000
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync vs async SQLAlchemy under concurrent saves and reads (SQLite)")
+    parser.add_argument("--saves", type=int, default=32)
+    parser.add_argument("--rows", type=int, default=2000, help="Transaction rows per saved report")
+    parser.add_argument("--readers", type=int, default=8, help="Concurrent history readers while saves run")
+    parser.add_argument("--read-interval", type=float, default=0.05, help="Seconds between one reader's reads")
+    args = parser.parse_args()
+
+    os.environ["FINANCIAL_DB_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    import database
+    from database import transaction_columns_from_records
+    database.init_db()
+    result = make_result(args.rows)
+    transactions = transaction_columns_from_records(result["transaction_data"])
+
+    print(f"{args.saves} concurrent saves of {args.rows} rows, {args.readers} readers every {args.read_interval * 1000:.0f} ms, SQLite:")
+    for mode in ("blocking", "sync pool", "async"):
+        stats = asyncio.run(run(mode, args.saves, result, transactions, args.readers, args.read_interval))
+        asyncio.run(database.dispose_async_engine()) # The async engine is bound to the loop that made it
+        print(f"  {mode:<9}  {stats['saves_per_s']:6.1f} saves/s | reads p50 {stats['read_p50_ms']:7.1f} ms "
+              f"p95 {stats['read_p95_ms']:7.1f} ms ({stats['reads']} reads) | max loop stall {stats['max_loop_stall_ms']:7.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from categorization import _categorize_normalized, normalize_description
+from categorization_cache import category_cache
+from engine import apply_bank_categories
+
+# Benchmark: per-row iterrows categorization (old analyze_financials path) vs batch API
+# Usage: python bench_categorization.py --sizes 10000 100000 1000000 --legacy-max 100000
+
+MERCHANTS = [
+    "UPI/SWIGGY/{ref}", "UPI/ZOMATO/{ref}", "NEFT SALARY {ref}", "ACH EMI HDFC LOAN {ref}",
+    "POS AMAZON RETAIL {ref}", "AWS BILLING {ref}", "RENT WEWORK BLR", "IMPS CLIENT PAYMENT {ref}",
+    "ATM WDL {ref}", "NETFLIX SUBSCRIPTION", "BANK CHARGES Q{ref}", "FACEBOOK ADS {ref}",
+    "CHQ DEP 000{ref}", "TRF TO SELF", "INTEREST DEBIT", "GST PAYMENT {ref}", "MISC {ref}",
+]
+
+def make_statement(n_rows, n_refs=500, seed=42):
+    """
+    Builds a synthetic raw bank statement with repeated merchants and noisy reference numbers.
+    """
+    rng = np.random.default_rng(seed)
+    templates = rng.choice(MERCHANTS, size=n_rows)
+    refs = rng.integers(0, n_refs, size=n_rows)
+    descriptions = [t.format(ref=r) for t, r in zip(templates, refs)]
+    is_credit = rng.random(n_rows) < 0.3
+    amounts = rng.gamma(2.0, 5000.0, size=n_rows).round(2)
+    return pd.DataFrame({
+        "Date": pd.date_range("2021-01-01", periods=n_rows, freq="min"),
+        "Description": descriptions,
+        "Debit": np.where(is_credit, 0.0, amounts),
+        "Credit": np.where(is_credit, amounts, 0.0),
+    })
+
+def legacy_categorize(df):
+    """
+    The previous analyze_financials loop, kept here for comparison.
+    """
+    df = df.copy()
+    df['Revenue'] = 0.0
+    df['Operating Expenses'] = 0.0
+    df['Loan Repayment'] = 0.0
+    for idx, row in df.iterrows():
+        credit_val = row['Credit']
+        if credit_val > 0:
+            df.at[idx, 'Revenue'] += credit_val
+            continue
+        debit_val = row['Debit']
+        if debit_val > 0:
+            category = _categorize_normalized(normalize_description(row['Description'])) # uncached, as before
+            if category == 'Loan Repayment':
+                df.at[idx, 'Loan Repayment'] += debit_val
+            else:
+                df.at[idx, 'Operating Expenses'] += debit_val
+    return df
+
+def batch_categorize(df):
+    """
+    The current analyze_financials path (batch call + column-wise masks).
+    """
+    df = df.copy()
+    df['Revenue'] = 0.0
+    df['Operating Expenses'] = 0.0
+    df['Loan Repayment'] = 0.0
+    apply_bank_categories(df)
+    return df
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark statement categorization")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy-max", type=int, default=100_000, help="Skip the slow per-row path above this size")
+    args = parser.parse_args()
+
+    cols = ['Revenue', 'Operating Expenses', 'Loan Repayment']
+    print(f"{'rows':>10} {'legacy (s)':>12} {'batch (s)':>10} {'speedup':>9}  match")
+    for n_rows in args.sizes:
+        df = make_statement(n_rows)
+
+        category_cache.clear() # cold cache: measure scoring, not memoization
+        start = time.perf_counter()
+        new_df = batch_categorize(df)
+        batch_s = time.perf_counter() - start
+
+        if n_rows <= args.legacy_max:
+            start = time.perf_counter()
+            old_df = legacy_categorize(df)
+            legacy_s = time.perf_counter() - start
+            match = old_df[cols].equals(new_df[cols])
+            print(f"{n_rows:>10} {legacy_s:>12.2f} {batch_s:>10.2f} {legacy_s / batch_s:>8.1f}x  {match}")
+            if not match:
+                raise SystemExit("Batch categorization diverged from the per-row path")
+        else:
+            print(f"{n_rows:>10} {'skipped':>12} {batch_s:>10.2f} {'-':>9}  -")
+
+if __name__ == "__main__":
+    main()
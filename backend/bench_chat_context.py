@@ -0,0 +1,71 @@
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+# Benchmark: DB time of loading the /chat context as the saved statement grows.
+# legacy: the whole latest Report row, transaction_data included (the old /chat query)
+# summary: latest report id + summary columns only (a context-cache miss)
+# cached: latest report id only, context served from chat_context_cache
+# Usage: python bench_chat_context.py --rows 1000 10000 100000 --repeat 20
+
+def make_records(n):
+    return [{"Date": f"2024-01-{i % 28 + 1:02d} 10:00:00", "Description": f"UPI/PAYMENT/{i}/VENDOR{i % 97}",
+             "Debit": float(i % 500), "Credit": 0.0, "Balance": 100000.0 - i, "Category": "Operating Expenses"}
+            for i in range(n)]
+
+def median_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="/chat context DB time vs statement size")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["FINANCIAL_DB_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    from sqlalchemy.orm import undefer
+    from database import SessionLocal, init_db, save_report, Report, get_latest_report_id, get_report_summary
+    from chat_context import ChatContextCache
+    init_db()
+
+    metrics = {"rev_growth_pct": 4.2, "expense_ratio": 0.82, "net_cash_flow": 125000.0}
+    for n in args.rows:
+        db = SessionLocal()
+        save_report(db, {"score": 64, "metrics": metrics, "flags": [], "ai_insights": "Margins are tight.",
+                         "transaction_data": make_records(n)}, f"statement_{n}.csv")
+        db.close()
+
+        cache = ChatContextCache()
+        def legacy():
+            db = SessionLocal()
+            try:
+                report = db.query(Report).options(undefer(Report.transaction_data)).order_by(Report.upload_date.desc()).first()
+                assert report.transaction_data is not None
+            finally:
+                db.close()
+        def summary():
+            db = SessionLocal()
+            try:
+                assert get_report_summary(db, get_latest_report_id(db)) is not None
+            finally:
+                db.close()
+        def cached():
+            db = SessionLocal()
+            try:
+                assert cache.get_or_build(get_latest_report_id(db), lambda rid: get_report_summary(db, rid)) is not None
+            finally:
+                db.close()
+
+        print(f"{n:>7} rows: legacy {median_ms(legacy, args.repeat):8.2f} ms | summary {median_ms(summary, args.repeat):6.2f} ms | "
+              f"cached {median_ms(cached, args.repeat):6.2f} ms  ({cache.stats()['hits']} hits)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import json
+import statistics
+import tempfile
+import time
+
+import httpx
+
+# Benchmark: /chat time-to-first-token with SSE streaming vs the blocking JSON answer, and a check
+# that a client hanging up mid-stream cancels the upstream model call.
+# Starts the API and the local Gemini stand-in (which streams its answer word by word).
+# Usage: python bench_chat_stream.py --chats 10 --token-delay 0.05
+
+def timed_json_chat(client, base):
+    start = time.perf_counter()
+    r = client.post(f"{base}/chat", json={"message": "How is my cash flow?"}, timeout=60)
+    r.raise_for_status()
+    assert r.json()["answer"]
+    return time.perf_counter() - start
+
+def timed_stream_chat(client, base):
+    """
+    (seconds to first delta, seconds to done event, answer)
+    """
+    start = time.perf_counter()
+    first = None
+    event = None
+    with client.stream("POST", f"{base}/chat", json={"message": "How is my cash flow?"},
+                       headers={"Accept": "text/event-stream"}, timeout=60) as r:
+        r.raise_for_status()
+        for line in r.iter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if event in ("done", "error"):
+                    return first, time.perf_counter() - start, data["answer"]
+                if first is None:
+                    first = time.perf_counter() - start
+    raise RuntimeError("stream ended without a done event")
+
+def main():
+    parser = argparse.ArgumentParser(description="/chat streaming vs blocking answers")
+    parser.add_argument("--chats", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.3, help="Simulated model latency before the first token (s)")
+    parser.add_argument("--token-delay", type=float, default=0.05, help="Simulated delay between streamed words (s)")
+    args = parser.parse_args()
+
+    import fake_gemini
+    from bench_load import free_port, start_api, upload
+    from bench_categorization import make_statement
+    fake_gemini.LATENCY_S = args.latency
+    fake_gemini.TOKEN_DELAY_S = args.token_delay
+    fake_gemini.SIMULATE_GENERATION = True
+    gemini_url = fake_gemini.start_in_thread(free_port())
+
+    df = make_statement(500)
+    df['Date'] = df['Date'].dt.strftime('%d/%m/%Y %H:%M')
+    payload = df.to_csv(index=False).encode()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        proc, base = start_api(tmp, gemini_url, free_port())
+        try:
+            with httpx.Client() as client:
+                upload(client, base, payload).raise_for_status()
+
+                blocking = [timed_json_chat(client, base) for _ in range(args.chats)]
+                streamed = [timed_stream_chat(client, base) for _ in range(args.chats)]
+                print(f"{args.chats} chats, {args.latency:.1f}s to first token, {args.token_delay * 1000:.0f} ms per word:")
+                print(f"  blocking JSON: answer after {statistics.median(blocking):.2f}s (median)")
+                print(f"  SSE stream:    first words after {statistics.median(s[0] for s in streamed):.2f}s, "
+                      f"done after {statistics.median(s[1] for s in streamed):.2f}s (median)")
+
+                # Hang up after the first delta; the fake server should see its stream cancelled
+                before = fake_gemini.stats["streams_cancelled"]
+                with client.stream("POST", f"{base}/chat", json={"message": "Hi"},
+                                   headers={"Accept": "text/event-stream"}, timeout=60) as r:
+                    for line in r.iter_lines():
+                        if line.startswith("data: "):
+                            break
+                time.sleep(1.0)
+                cancelled = fake_gemini.stats["streams_cancelled"] - before
+                gemini = client.get(f"{base}/metrics").json()["gemini"]
+                print(f"  disconnect mid-stream: upstream cancelled={cancelled == 1}, "
+                      f"api streams started/completed/cancelled = "
+                      f"{gemini['streams_started']}/{gemini['streams_completed']}/{gemini['streams_cancelled']}")
+                print(f"fake server: {fake_gemini.stats}")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+if __name__ == "__main__":
+    main()
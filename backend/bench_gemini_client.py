@@ -0,0 +1,73 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import fake_gemini
+
+# Benchmark: a fresh genai.Client per call (the old behaviour) vs the shared pooled client, and
+# model-name resolution in a new worker process with and without the persisted model file.
+# Runs against the local fake Gemini server (no API key or network needed).
+# Usage: python bench_gemini_client.py --calls 200 --latency 0.02
+
+def timed_calls(make_client, calls):
+    import gemini_utils
+    model = gemini_utils.get_gemini_model_name()
+    before = gemini_utils.client_stats.snapshot()
+    start = time.perf_counter()
+    for i in range(calls):
+        make_client().models.generate_content(model=model, contents=f"ping {i}")
+    elapsed = time.perf_counter() - start
+    after = gemini_utils.client_stats.snapshot()
+    return elapsed, after["new_connections"] - before["new_connections"], after
+
+def worker_model_resolution(env):
+    """
+    Seconds a fresh process spends resolving the model name.
+    """
+    code = ("import time, gemini_utils; t = time.perf_counter(); gemini_utils.get_gemini_model_name(); "
+            "print('resolved:', time.perf_counter() - t)")
+    proc = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                          env=env, capture_output=True, text=True, check=True)
+    return float([l for l in proc.stdout.splitlines() if l.startswith("resolved:")][-1].split()[1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the shared Gemini client against a fake endpoint")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02, help="Simulated model latency (s)")
+    parser.add_argument("--workers", type=int, default=5, help="Fresh processes started per resolution mode")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    fake_gemini.LATENCY_S = args.latency
+    tmp = tempfile.mkdtemp()
+    os.environ["GEMINI_BASE_URL"] = fake_gemini.start_in_thread(args.port)
+    os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+    os.environ["GEMINI_MODEL_CACHE_PATH"] = os.path.join(tmp, "gemini_model.json")
+
+    import gemini_utils
+    from google import genai
+    gemini_utils.GEMINI_MODEL_CACHE_PATH = os.environ["GEMINI_MODEL_CACHE_PATH"]
+
+    def fresh_client():
+        return genai.Client(api_key=os.environ["GEMINI_API_KEY"], http_options=gemini_utils.gemini_http_options())
+
+    gemini_utils.get_gemini_client().models.generate_content(model="warm-up", contents="warm-up")
+    fresh_s, fresh_conns, _ = timed_calls(fresh_client, args.calls)
+    shared_s, shared_conns, stats = timed_calls(gemini_utils.get_gemini_client, args.calls)
+    print(f"{args.calls} calls at {args.latency * 1000:.0f} ms simulated latency:")
+    print(f"  client per call: {fresh_s / args.calls * 1000:6.1f} ms/call, new connections {fresh_conns}")
+    print(f"  shared client:   {shared_s / args.calls * 1000:6.1f} ms/call, new connections {shared_conns}")
+
+    for persisted in (False, True):
+        env = dict(os.environ, GEMINI_MODEL_CACHE_PATH=os.environ["GEMINI_MODEL_CACHE_PATH"] if persisted else "")
+        list_calls = fake_gemini.stats["list_calls"]
+        seconds = [worker_model_resolution(env) for _ in range(args.workers)]
+        print(f"  new worker, {'persisted model' if persisted else 'no model file  '}: "
+              f"{sum(seconds) / len(seconds) * 1000:6.1f} ms to resolve, "
+              f"models.list calls {fake_gemini.stats['list_calls'] - list_calls}/{args.workers}")
+    print(f"client stats: {stats}")
+
+if __name__ == "__main__":
+    main()
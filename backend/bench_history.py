@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Benchmark: report history pages on a seeded SQLite database.
+# legacy: full Report rows, ORDER BY upload_date DESC with OFFSET (what a history view on
+#         get_recent_reports-style queries would do)
+# keyset: database.list_reports (HISTORY_COLUMNS only, (upload_date, id) cursor)
+# Pages are timed at the top and half-way down the history, plus filtered queries.
+# Usage: python bench_history.py --reports 1000000 --page 50
+
+def seed(db_path, n, seed=3):
+    import sqlite3
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1)
+    insight = "Revenue is growing steadily but operating expenses absorb most of it. " * 4
+    metrics = json.dumps({"rev_growth_pct": 4.2, "expense_ratio": 0.82, "net_cash_flow": 125000.0, "dscr": 1.4})
+    flags = json.dumps([{"type": "High Expense Risk", "severity": "Medium", "message": "Expenses above 80% of revenue"}])
+    connection = sqlite3.connect(db_path)
+    rows = ((f"statement_{i % 5000}.csv", (start + timedelta(seconds=60 * i + rng.randint(0, 59))).isoformat(" ", "microseconds"),
+             rng.uniform(20, 95), rng.uniform(-20, 40), rng.uniform(0.4, 1.2), rng.uniform(-1e5, 5e5), metrics, flags,
+             insight, "en", rng.randint(300, 900), "Compliant", rng.uniform(1e4, 1e6)) for i in range(n))
+    connection.executemany(
+        "INSERT INTO reports (filename, upload_date, score, revenue_growth, expense_ratio, net_cash_flow, raw_metrics, "
+        "risk_flags, ai_insights, language, credit_score, tax_status, forecast_next_month) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)", rows)
+    connection.commit()
+    connection.execute("ANALYZE")
+    connection.close()
+
+def median_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyset history pages vs OFFSET over full rows")
+    parser.add_argument("--reports", type=int, default=1_000_000)
+    parser.add_argument("--page", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ["FINANCIAL_DB_URL"] = f"sqlite:///{db_path}"
+    from database import SessionLocal, init_db, Report, list_reports, history_query, encode_history_cursor
+    init_db()
+    start = time.perf_counter()
+    seed(db_path, args.reports)
+    print(f"seeded {args.reports} reports in {time.perf_counter() - start:.1f}s ({os.path.getsize(db_path) / 1e6:.0f} MB)")
+
+    db = SessionLocal()
+    depth = args.reports // 2
+    key = db.query(Report.upload_date, Report.id).order_by(Report.upload_date.desc(), Report.id.desc()).offset(depth - 1).first()
+    cursor = encode_history_cursor(*key)
+
+    def legacy(offset):
+        return lambda: db.query(Report).order_by(Report.upload_date.desc()).offset(offset).limit(args.page).all()
+    def keyset(cursor=None, **filters):
+        return lambda: list_reports(db, args.page, cursor, **filters)
+
+    # Same rows either way
+    assert [r.id for r in legacy(depth)()] == [r["id"] for r in keyset(cursor)()["reports"]]
+
+    print(f"page of {args.page} (median of {args.repeat}):")
+    print(f"  first page:        legacy {median_ms(legacy(0), args.repeat):8.2f} ms | keyset {median_ms(keyset(), args.repeat):6.2f} ms")
+    print(f"  at row {depth:>9}: legacy {median_ms(legacy(depth), args.repeat):8.2f} ms | keyset {median_ms(keyset(cursor), args.repeat):6.2f} ms")
+
+    year = dict(start=datetime(2020, 6, 1), end=datetime(2020, 7, 1))
+    filtered = {
+        "one month": year,
+        "score 40-60": dict(min_score=40, max_score=60),
+        "score 90+, one month": dict(min_score=90, **year),
+        "one filename": dict(filename="statement_42.csv"),
+    }
+    for name, filters in filtered.items():
+        print(f"  {name + ':':<22} keyset {median_ms(keyset(**filters), args.repeat):6.2f} ms")
+
+    plan = db.connection().exec_driver_sql(
+        "EXPLAIN QUERY PLAN " + str(history_query(args.page, cursor).compile(compile_kwargs={"literal_binds": True}))).fetchall()
+    print(f"  keyset plan: {'; '.join(row[-1] for row in plan)}")
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+import fake_gemini
+
+# Benchmark: AI insight generation with and without the insight cache, for a stream of statements
+# whose metrics vary a little around a few typical businesses, then a simulated restart.
+# Runs against the local fake Gemini server (no API key or network needed).
+# Usage: python bench_insight_cache.py --statements 100 --latency 1.0
+
+def make_statements(n, seed=11):
+    rng = random.Random(seed)
+    profiles = [(62, 0.82, 0.12, 125_000), (45, 0.95, 0.35, -40_000), (78, 0.70, 0.05, 310_000)]
+    statements = []
+    for _ in range(n):
+        score, expense, debt, cash = rng.choice(profiles)
+        flags = [{"type": "High Expense Risk", "severity": "Medium"}] if expense > 0.8 else []
+        if debt > 0.3:
+            flags.append({"type": "Debt Stress", "severity": "High"})
+        metrics = {
+            "expense_ratio": round(expense + rng.uniform(-0.02, 0.02), 3),
+            "debt_burden_ratio": round(debt + rng.uniform(-0.02, 0.02), 3),
+            "net_cash_flow": round(cash * rng.uniform(0.9, 1.1), 2)
+        }
+        statements.append((score + rng.randint(-1, 1), flags, rng.choice(["Retail", "Manufacturing"]), metrics))
+    return statements
+
+def run(statements, use_cache):
+    from llm_service import generate_llm_insight
+    start = time.perf_counter()
+    for score, flags, industry, metrics in statements:
+        assert generate_llm_insight(score, flags, industry, metrics, "en", use_cache=use_cache)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LLM insight cache against a fake Gemini endpoint")
+    parser.add_argument("--statements", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=1.0, help="Simulated model latency (s)")
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    fake_gemini.LATENCY_S = args.latency
+    os.environ["GEMINI_BASE_URL"] = fake_gemini.start_in_thread(args.port)
+    os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+    db_path = os.path.join(tempfile.mkdtemp(), "insight_cache.db")
+
+    import insight_cache
+    insight_cache.insight_cache = insight_cache.InsightCache(db_path)
+    statements = make_statements(args.statements)
+
+    live_s = run(statements, use_cache=False)
+    cached_s = run(statements, use_cache=True)
+    print(f"{args.statements} statements at {args.latency:.1f}s model latency:")
+    print(f"  live model:    {live_s:7.2f}s")
+    print(f"  insight cache: {cached_s:7.2f}s  {insight_cache.insight_cache.stats()}")
+
+    insight_cache.insight_cache = insight_cache.InsightCache(db_path) # Simulated restart: empty memory, same file
+    calls = fake_gemini.stats["generate_calls"]
+    restarted_s = run(statements, use_cache=True)
+    print(f"  after restart: {restarted_s:7.2f}s  model calls {fake_gemini.stats['generate_calls'] - calls}, "
+          f"{insight_cache.insight_cache.stats()}")
+
+if __name__ == "__main__":
+    main()
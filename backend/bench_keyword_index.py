@@ -0,0 +1,78 @@
+import argparse
+import random
+import string
+import time
+from collections import Counter
+from categorization import CATEGORIES, _categorize_normalized, normalize_description, get_keyword_index, categorize_transactions_batch
+from categorization_cache import category_cache
+from bench_categorization import MERCHANTS
+
+# Benchmark: keyword index with fuzzy fallback vs fuzzy scoring of every row.
+# The equivalence of the two paths is asserted in test_keyword_index.py.
+# Usage: python bench_keyword_index.py --rows 50000
+
+def make_corpus(n_rows, seed=7):
+    """
+    Synthetic descriptions: bank-style templates, raw keywords, keyword fragments, typos and noise.
+    """
+    rng = random.Random(seed)
+    keywords = [k for kws in CATEGORIES.values() for k in kws]
+    noise = string.ascii_letters + string.digits + "/-_ *."
+
+    def typo(word):
+        if len(word) < 3:
+            return word
+        i = rng.randrange(len(word))
+        return word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1:]
+
+    corpus = []
+    for _ in range(n_rows):
+        kind = rng.random()
+        if kind < 0.4:
+            corpus.append(rng.choice(MERCHANTS).format(ref=rng.randrange(10_000)))
+        elif kind < 0.55:
+            corpus.append(rng.choice(keywords).upper())
+        elif kind < 0.65:
+            k = rng.choice(keywords)
+            start = rng.randrange(len(k))
+            corpus.append(k[start:start + rng.randint(1, 4)])
+        elif kind < 0.8:
+            corpus.append(f"{rng.choice(['POS', 'UPI', 'NEFT', 'IMPS'])} {typo(rng.choice(keywords))} {rng.randrange(999)}")
+        else:
+            corpus.append("".join(rng.choices(noise, k=rng.randint(0, 24))))
+    return corpus
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyword index benchmark")
+    parser.add_argument("--rows", type=int, default=50_000)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.rows)
+    keys = [normalize_description(d) for d in corpus]
+    index = get_keyword_index()
+
+    start = time.perf_counter()
+    expected = [_categorize_normalized(k) for k in keys]
+    fuzzy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    hits = index.match_many(keys)
+    got = [hit if hit is not None else _categorize_normalized(k) for k, hit in zip(keys, hits)]
+    indexed_s = time.perf_counter() - start
+
+    mismatches = sum(e != g for e, g in zip(expected, got))
+    hit_count = sum(h is not None for h in hits)
+
+    category_cache.clear()
+    batch_categories, batch_paths = categorize_transactions_batch(corpus, return_paths=True)
+    batch_mismatches = sum(e != g for e, g in zip(expected, batch_categories))
+
+    print(f"rows:                 {args.rows}")
+    print(f"index hits:           {hit_count} ({hit_count / args.rows:.1%}), fuzzy fallbacks: {args.rows - hit_count}")
+    print(f"fuzzy every row:      {fuzzy_s:.2f}s")
+    print(f"index + fuzzy misses: {indexed_s:.2f}s ({fuzzy_s / indexed_s:.1f}x)")
+    print(f"batch paths:          {dict(Counter(batch_paths))}")
+    print(f"mismatches:           per-row {mismatches}, batch {batch_mismatches}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import argparse
+import os
+import time
+import numpy as np
+import fake_gemini
+
+# Benchmark: batched/concurrent LLM categorization vs one Gemini call per description,
+# against the local fake Gemini server (no API key or network needed).
+# Usage: python bench_llm_categorization.py --rows 20000 --sequential-sample 20
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched LLM categorization against a fake Gemini endpoint")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--unique", type=int, default=1_000, help="Distinct low-confidence descriptions")
+    parser.add_argument("--sequential-sample", type=int, default=20, help="Per-row calls timed for comparison")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    os.environ["GEMINI_BASE_URL"] = fake_gemini.start_in_thread(args.port)
+    os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+
+    from categorization import categorize_transactions_batch, categorize_transaction_llm, last_llm_batch_stats
+    from categorization_cache import category_cache, llm_category_cache
+
+    rng = np.random.default_rng(3)
+    prefixes = ["VPA", "NACH DR HDFCBK", "BHIM", "TXN", "ZXQ"]
+    unknown = [f"{prefixes[i % len(prefixes)]} {rng.integers(1000, 9999)} QWZ{i}" for i in range(args.unique)]
+    descriptions = rng.choice(unknown, size=args.rows)
+    debits = np.full(args.rows, 100.0)
+    credits = np.zeros(args.rows)
+
+    category_cache.clear()
+    llm_category_cache.clear()
+    start = time.perf_counter()
+    categories, paths = categorize_transactions_batch(descriptions, debits, credits, return_paths=True, use_llm=True)
+    batch_s = time.perf_counter() - start
+    batch_stats = dict(last_llm_batch_stats)
+
+    start = time.perf_counter()
+    categorize_transactions_batch(descriptions, debits, credits, use_llm=True)
+    cached_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for description in unknown[:args.sequential_sample]:
+        categorize_transaction_llm(description)
+    per_call_s = (time.perf_counter() - start) / args.sequential_sample
+
+    print(f"rows: {args.rows}, low-confidence unique descriptions: {args.unique}")
+    print(f"batched:    {batch_s:.2f}s, calls={batch_stats['calls']}, rows/call={batch_stats['rows_per_call']}, "
+          f"failed={batch_stats['failed_calls']}, llm rows={int((paths == 'llm').sum())}")
+    print(f"re-run:     {cached_s:.2f}s (llm cache)")
+    print(f"per-row:    ~{per_call_s * args.unique:.2f}s estimated ({args.unique} calls at {per_call_s:.3f}s each)")
+    print(f"fake server: {fake_gemini.stats}")
+
+if __name__ == "__main__":
+    main()
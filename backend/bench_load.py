@@ -0,0 +1,123 @@
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+# Load test: /chat latency while large statements are being uploaded.
+# Starts the API (uvicorn main:app) against a temporary SQLite DB and the local Gemini stand-in,
+# measures /chat latency idle, then again while --uploaders clients upload --rows-row CSV statements in a loop.
+# With the stage pools /chat should stay flat; extra uploads beyond the admission limit get 503.
+# Usage: python bench_load.py --rows 100000 --uploaders 6 --chats 40
+# On few cores, run the CPU stages as (niced) processes: ANALYSIS_EXECUTOR=process RENDER_EXECUTOR=process
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_api(tmp, gemini_url, port):
+    env = dict(
+        os.environ,
+        PYTHONPATH=BACKEND_DIR,
+        FINANCIAL_DB_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+        GEMINI_API_KEY="fake",
+        GEMINI_BASE_URL=gemini_url,
+        CATEGORY_CACHE_PATH=""
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=tmp, env=env, stdout=subprocess.DEVNULL
+    )
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        try:
+            httpx.get(f"{base}/metrics", timeout=1)
+            return proc, base
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.kill()
+    raise SystemExit("API did not start")
+
+def upload(client, base, payload):
+    return client.post(f"{base}/upload", files={"file": ("statement.csv", payload, "text/csv")},
+                       data={"industry": "Retail", "language": "en"}, timeout=600)
+
+def chat_latencies(base, n):
+    latencies = []
+    with httpx.Client() as client:
+        for _ in range(n):
+            start = time.perf_counter()
+            r = client.post(f"{base}/chat", json={"message": "How is my cash flow?"}, timeout=60)
+            r.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+def summarize(label, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(f"{label:>14}: p50 {statistics.median(latencies) * 1000:7.1f} ms, p95 {p95 * 1000:7.1f} ms, max {latencies[-1] * 1000:7.1f} ms")
+    return p95
+
+def main():
+    parser = argparse.ArgumentParser(description="/chat latency under concurrent uploads")
+    parser.add_argument("--rows", type=int, default=100_000, help="Rows per uploaded statement")
+    parser.add_argument("--uploaders", type=int, default=6, help="Concurrent upload clients")
+    parser.add_argument("--chats", type=int, default=40, help="Chat requests per phase")
+    args = parser.parse_args()
+
+    from bench_categorization import make_statement
+    from fake_gemini import start_in_thread
+    gemini_url = start_in_thread(free_port())
+
+    df = make_statement(args.rows)
+    df['Date'] = df['Date'].dt.strftime('%d/%m/%Y %H:%M')
+    payload = df.to_csv(index=False).encode()
+    print(f"upload size: {len(payload) / 1024 / 1024:.1f} MB ({args.rows} rows), uploaders: {args.uploaders}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        proc, base = start_api(tmp, gemini_url, free_port())
+        try:
+            with httpx.Client() as client:
+                start = time.perf_counter()
+                upload(client, base, payload).raise_for_status() # Seeds the report /chat reads
+                print(f"single upload: {time.perf_counter() - start:.2f}s")
+
+            idle_p95 = summarize("idle", chat_latencies(base, args.chats))
+
+            stop = threading.Event()
+            codes = []
+            def uploader():
+                with httpx.Client() as client:
+                    while not stop.is_set():
+                        r = upload(client, base, payload)
+                        codes.append(r.status_code)
+                        if r.status_code == 503:
+                            time.sleep(min(float(r.headers.get("Retry-After", 1)), 1)) # Back off like a real client
+            threads = [threading.Thread(target=uploader) for _ in range(args.uploaders)]
+            for t in threads:
+                t.start()
+            time.sleep(1) # Let the uploads get into parsing/analysis
+            loaded_p95 = summarize("during uploads", chat_latencies(base, args.chats))
+            stop.set()
+            for t in threads:
+                t.join()
+
+            print(f"uploads: {codes.count(200)} ok, {codes.count(503)} rejected (503), "
+                  f"{len(codes) - codes.count(200) - codes.count(503)} other")
+            print(f"admission: {httpx.get(f'{base}/metrics').json()['upload_admission']}")
+            print(f"p95 slowdown under load: {loaded_p95 / idle_p95:.2f}x")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+if __name__ == "__main__":
+    main()
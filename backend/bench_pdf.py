@@ -0,0 +1,107 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Benchmark: PDF statement ingestion. Legacy serial pdfplumber loop vs pdf_ingest (serial and pooled).
+# Generates a multi-page statement whose table header repeats on every page, runs each mode in its
+# own process and reports pages/sec and peak RSS (parent, and the largest pool worker).
+# Usage: python bench_pdf.py --pages 120 --workers 4
+
+def write_pdf(path, n_pages, rows_per_page=40):
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, LongTable, TableStyle
+    from bench_categorization import make_statement
+
+    df = make_statement(n_pages * rows_per_page)
+    data = [["Date", "Description", "Debit", "Credit", "Balance"]]
+    for date, desc, debit, credit in zip(df["Date"], df["Description"], df["Debit"], df["Credit"]):
+        data.append([date.strftime("%d/%m/%Y"), desc[:40], f"{debit:.2f}" if debit else "", f"{credit:.2f}" if credit else "", "0.00"])
+    table = LongTable(data, repeatRows=1) # Header repeated at the top of every page, like real bank exports
+    table.setStyle(TableStyle([("GRID", (0, 0), (-1, -1), 0.5, colors.black), ("FONTSIZE", (0, 0), (-1, -1), 7)]))
+    SimpleDocTemplate(path, pagesize=A4).build([table])
+
+def peak_rss_mb():
+    from bench_streaming import peak_rss_mb as own_peak
+    return own_peak()
+
+def worker_peak_mb(pid):
+    # Pool workers are forked by the fork server, not by us, so RUSAGE_CHILDREN never sees them
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0
+
+def legacy_load(path):
+    """
+    The pre-pdf_ingest loader: every page serially, all rows in one list.
+    """
+    import pandas as pd
+    import pdfplumber
+    with pdfplumber.open(path) as pdf:
+        data = []
+        for page in pdf.pages:
+            for table in page.extract_tables():
+                for row in table:
+                    if row and len(row) >= 2:
+                        data.append(row)
+    return pd.DataFrame(data[1:], columns=data[0])
+
+def run_mode(mode, path):
+    import pdf_ingest
+    start = time.perf_counter()
+    if mode == "legacy":
+        df = legacy_load(path)
+        header = list(df.columns)
+        df = df[~df.apply(lambda r: list(r) == header, axis=1)].reset_index(drop=True) # Same rows minus repeats
+    else:
+        df = pdf_ingest.load_pdf(path)
+    elapsed = time.perf_counter() - start
+    worker_mb = [worker_peak_mb(pid) for pid in (pdf_ingest._pool._processes if pdf_ingest._pool else {})]
+    pdf_ingest.shutdown_pool()
+    print(json.dumps({
+        "seconds": elapsed, "peak_mb": peak_rss_mb(), "worker_peak_mb": max(worker_mb, default=0),
+        "rows": len(df), "digest": int(df.fillna("").astype(str).apply(lambda c: c.map(hash)).sum().sum() % (1 << 61))
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF statement ingestion")
+    parser.add_argument("--pages", type=int, default=120)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--child", choices=["legacy", "serial", "pool"], help=argparse.SUPPRESS)
+    parser.add_argument("--pdf", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_mode(args.child, args.pdf)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "statement.pdf")
+        start = time.perf_counter()
+        write_pdf(path, args.pages)
+        import pdf_ingest
+        n_pages = pdf_ingest.count_pages(path)
+        print(f"pages: {n_pages}, file: {os.path.getsize(path) / 1024 / 1024:.1f} MB (generated in {time.perf_counter() - start:.1f}s)")
+
+        outputs = {}
+        for mode, workers in (("legacy", 1), ("serial", 1), ("pool", args.workers)):
+            env = dict(os.environ, PDF_WORKERS=str(workers), PDF_PARALLEL_MIN_PAGES="1", PYTHONHASHSEED="0")
+            proc = subprocess.run([sys.executable, __file__, "--child", mode, "--pdf", path],
+                                  capture_output=True, text=True, check=True, env=env)
+            out = outputs[mode] = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(f"{mode:>7} ({workers} worker{'s' if workers > 1 else ''}): {n_pages / out['seconds']:6.1f} pages/s, "
+                  f"{out['rows']} rows, peak RSS {out['peak_mb']:.0f} MB (largest worker {out['worker_peak_mb']:.0f} MB)")
+
+        same = len({(o["rows"], o["digest"]) for o in outputs.values()}) == 1
+        print(f"identical rows (legacy minus repeated headers): {same}")
+        if not same:
+            raise SystemExit("pdf_ingest diverged from the legacy loader")
+
+if __name__ == "__main__":
+    main()
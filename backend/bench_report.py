@@ -0,0 +1,58 @@
+import argparse
+import random
+import time
+
+# Benchmark: PDF report rendering throughput (reports/sec) for 12-, 60- and 240-month histories.
+# Modes: raster (chart cache cleared before every report), raster-cached (same data re-rendered,
+# as on repeat downloads) and vector (native ReportLab charts, no matplotlib).
+# Usage: python bench_report.py --reports 10
+
+def make_report_data(n_months, seed=7):
+    rng = random.Random(seed)
+    charts = []
+    for i in range(n_months):
+        revenue = rng.uniform(80_000, 150_000)
+        opex = rng.uniform(60_000, 140_000)
+        charts.append({
+            "Month": f"{2000 + i // 12}-{i % 12 + 1:02d}",
+            "Revenue": round(revenue, 2),
+            "Operating Expenses": round(opex, 2),
+            "Net Cash Flow": round(revenue - opex, 2)
+        })
+    return {
+        "score": 64,
+        "ai_insights_en": "EXECUTIVE SUMMARY\nMargins are tight; volume growth is essential.\n\nRECOMMENDATIONS\n1. Audit recurring costs.",
+        "metrics": {"net_profit_margin": 8.4, "expense_ratio": 0.82, "debt_burden_ratio": 0.12, "dscr": 1.6, "net_cash_flow": 125000.0},
+        "charts_data": charts
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF report rendering")
+    parser.add_argument("--reports", type=int, default=10, help="Reports rendered per mode and history length")
+    parser.add_argument("--months", type=int, nargs="+", default=[12, 60, 240])
+    args = parser.parse_args()
+
+    import report_generator
+    from report_generator import generate_pdf_report
+
+    generate_pdf_report(make_report_data(12)) # Warm-up: imports, font loading
+    for n_months in args.months:
+        data = make_report_data(n_months)
+        line = []
+        for mode in ("raster", "raster-cached", "vector"):
+            chart_mode = "vector" if mode == "vector" else "raster"
+            if mode == "raster-cached":
+                generate_pdf_report(data, chart_mode) # Prime the chart cache
+            sizes = []
+            start = time.perf_counter()
+            for _ in range(args.reports):
+                if mode == "raster":
+                    report_generator._chart_cache.clear()
+                sizes.append(len(generate_pdf_report(data, chart_mode)))
+            elapsed = time.perf_counter() - start
+            line.append(f"{mode} {args.reports / elapsed:6.2f}/s ({sum(sizes) / len(sizes) / 1024:.0f} KB)")
+        print(f"{n_months:>4} months: " + " | ".join(line))
+    print(f"chart cache: {report_generator.chart_cache_stats}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+# Benchmark: reading + analyzing a bank export without and with the schema inference cache.
+#   untyped: pd.read_csv with no options, then analyze_financials (amount text regex-stripped,
+#            date format guessed), as before schema_inference.py
+#   schema:  schema_cache.schema_for_csv -> read_csv with the schema's options -> confirm ->
+#            analyze_financials with the cached date format (cold = first upload of the header)
+# Run on the same statement with amounts written plainly, with thousands separators and with a
+# currency prefix. The results must match.
+# Usage: python bench_schema_inference.py --rows 1000000 --repeat 3
+
+def median_s(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description="Untyped CSV parsing vs cached header schemas")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    import pandas as pd
+    from bench_categorization import make_statement
+    from engine import analyze_financials
+    from schema_inference import SchemaCache
+
+    df = make_statement(args.rows)
+    df['Date'] = df['Date'].dt.strftime('%Y-%m-%d %H:%M')
+    variants = {
+        "plain": df,
+        "1,234.50": df.assign(Debit=df['Debit'].map("{:,.2f}".format), Credit=df['Credit'].map("{:,.2f}".format)),
+        "Rs 1,234.50": df.assign(Debit=df['Debit'].map("Rs {:,.2f}".format), Credit=df['Credit'].map("Rs {:,.2f}".format)),
+    }
+    tmp = tempfile.mkdtemp()
+    try:
+        print(f"{args.rows} rows, read / read + analyze (median of {args.repeat}):")
+        for name, frame in variants.items():
+            path = os.path.join(tmp, "statement.csv")
+            frame.to_csv(path, index=False)
+            cache = SchemaCache()
+
+            def untyped_read():
+                return pd.read_csv(path)
+            def schema_read():
+                schema = cache.schema_for_csv(path)
+                data = pd.read_csv(path, **schema.read_options())
+                return cache.confirm(schema, data, path), data
+
+            start = time.perf_counter()
+            schema, _ = schema_read()
+            cold_s = time.perf_counter() - start
+
+            untyped = analyze_financials(untyped_read())
+            schema, data = schema_read()
+            typed = analyze_financials(data, date_format=schema.date_format)
+            assert untyped["metrics"] == typed["metrics"] and untyped["anomalies"] == typed["anomalies"]
+
+            untyped_s = median_s(untyped_read, args.repeat)
+            schema_s = median_s(schema_read, args.repeat)
+            untyped_total = median_s(lambda: analyze_financials(untyped_read()), args.repeat)
+            schema_total = median_s(lambda: (lambda s, d: analyze_financials(d, date_format=s.date_format))(*schema_read()), args.repeat)
+            print(f"  {name:<12} untyped {untyped_s:6.3f}s / {untyped_total:6.3f}s | schema {schema_s:6.3f}s / {schema_total:6.3f}s "
+                  f"(cold read {cold_s:.3f}s) | {schema.read_options()}, date {schema.date_format}")
+        print(f"  cache: {cache.stats()}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
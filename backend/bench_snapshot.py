@@ -0,0 +1,69 @@
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+# Benchmark: getting an upload back as a normalized DataFrame from the old latest_upload.csv
+# (read_csv, then chat_frame for numeric columns and parsed dates) vs the columnar snapshot
+# (snapshot_format.load_snapshot), plus write time and size on disk. Cold = first load after writing.
+# Usage: python bench_snapshot.py --rows 1000000 --repeat 5
+
+def median_s(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+def dir_bytes(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path))
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV re-read vs columnar upload snapshot")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    import pandas as pd
+    from bench_categorization import make_statement
+    from pipeline import chat_frame
+    from snapshot_format import write_snapshot, load_snapshot
+
+    df = make_statement(args.rows)
+    df['Date'] = df['Date'].dt.strftime('%d/%m/%Y %H:%M') # As uploaded: text dates
+    tmp = tempfile.mkdtemp()
+    csv_path = os.path.join(tmp, "latest_upload.csv")
+    snapshot_path = os.path.join(tmp, "snapshot")
+    try:
+        start = time.perf_counter()
+        df.to_csv(csv_path, index=False)
+        csv_write_s = time.perf_counter() - start
+        chat_df = chat_frame(df)
+        start = time.perf_counter()
+        write_snapshot(chat_df, snapshot_path)
+        snapshot_write_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        loaded = load_snapshot(snapshot_path)
+        cold_s = time.perf_counter() - start
+        pd.testing.assert_frame_equal(loaded, chat_df)
+
+        csv_s = median_s(lambda: chat_frame(pd.read_csv(csv_path)), args.repeat)
+        csv_raw_s = median_s(lambda: pd.read_csv(csv_path), args.repeat)
+        snapshot_s = median_s(lambda: load_snapshot(snapshot_path), args.repeat)
+        numeric_s = median_s(lambda: load_snapshot(snapshot_path, columns=["Date", "Debit", "Credit"]), args.repeat)
+
+        print(f"{args.rows} rows ({', '.join(f'{c}:{t}' for c, t in chat_df.dtypes.astype(str).items())}):")
+        print(f"  write:  csv {csv_write_s:6.2f}s ({os.path.getsize(csv_path) / 1e6:.0f} MB) | "
+              f"snapshot {snapshot_write_s:6.2f}s ({dir_bytes(snapshot_path) / 1e6:.0f} MB)")
+        print(f"  load:   csv re-read {csv_s:6.3f}s (read_csv alone {csv_raw_s:.3f}s, text dates) | "
+              f"snapshot {snapshot_s:6.3f}s (cold {cold_s:.3f}s) -> {csv_s / snapshot_s:.0f}x")
+        print(f"  load Date/Debit/Credit only: snapshot {numeric_s:.4f}s")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import functools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Benchmark: sustained report saves per second and history-read latency under concurrent writes on
+# SQLite, with the production mode (WAL + pragmas + grouped writes on the writer thread) vs the
+# previous setup (rollback journal, one commit per save through the async session).
+# Each mode runs in its own interpreter, since the mode is fixed at import (SQLITE_PRODUCTION_MODE).
+# Usage: python bench_sqlite_writer.py --seconds 10 --writers 16 --rows 500 --readers 4
+
+async def workload(args):
+    import database
+    from executors import run_in_stage
+    from report_writer import report_writer
+    from bench_async_db import make_result
+    database.init_db()
+    result = make_result(args.rows)
+    transactions = database.transaction_columns_from_records(result["transaction_data"])
+    offload = functools.partial(run_in_stage, "db")
+    deadline = time.perf_counter() + args.seconds
+    saves = 0
+    latencies = []
+
+    async def writer(i):
+        nonlocal saves
+        while time.perf_counter() < deadline:
+            if report_writer is not None:
+                await report_writer.save_async(result, f"bench_{i}.csv", transactions, offload)
+            else:
+                async with database.AsyncSessionLocal() as db:
+                    await database.save_report_async(db, result, f"bench_{i}.csv", transactions, offload)
+            saves += 1
+
+    async def reader():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            async with database.AsyncSessionLocal() as db:
+                await database.list_reports_async(db, 20)
+            latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(max(0.0, args.read_interval - (time.perf_counter() - start)))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(writer(i) for i in range(args.writers)), *(reader() for _ in range(args.readers)))
+    elapsed = time.perf_counter() - start
+    await database.dispose_async_engine()
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000 if latencies else float("nan")
+    return {
+        "saves_per_s": saves / elapsed, "reads": len(latencies),
+        "read_p50_ms": pick(0.5), "read_p95_ms": pick(0.95), "read_p99_ms": pick(0.99),
+        "writer": report_writer.stats() if report_writer is not None else None
+    }
+
+def run_mode(production, args):
+    env = dict(os.environ, SQLITE_PRODUCTION_MODE="1" if production else "0",
+               FINANCIAL_DB_URL=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    command = [sys.executable, os.path.abspath(__file__), "--child", "--seconds", str(args.seconds), "--writers", str(args.writers),
+               "--rows", str(args.rows), "--readers", str(args.readers), "--read-interval", str(args.read_interval)]
+    proc = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite production mode vs per-save commits")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--writers", type=int, default=16, help="Concurrent uploads saving back to back")
+    parser.add_argument("--rows", type=int, default=500, help="Transaction rows per saved report")
+    parser.add_argument("--readers", type=int, default=4, help="History readers during the writes")
+    parser.add_argument("--read-interval", type=float, default=0.05, help="Seconds between one reader's reads")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(workload(args))))
+        return
+
+    print(f"{args.writers} writers x {args.rows} rows, {args.readers} readers every {args.read_interval * 1000:.0f} ms, {args.seconds:.0f}s:")
+    for name, production in (("previous", False), ("production", True)):
+        stats = run_mode(production, args)
+        print(f"  {name:<10}  {stats['saves_per_s']:7.1f} saves/s | reads p50 {stats['read_p50_ms']:6.1f} ms "
+              f"p95 {stats['read_p95_ms']:6.1f} ms p99 {stats['read_p99_ms']:6.1f} ms ({stats['reads']} reads)")
+        if stats["writer"]:
+            print(f"              writer: {stats['writer']}")
+
+if __name__ == "__main__":
+    main()
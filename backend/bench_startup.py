@@ -0,0 +1,121 @@
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+# Startup benchmark: cold import time per backend module, then time from launching the server
+# to its first successful /upload (with and without the background warm-up).
+# Exits non-zero when a budget is exceeded, so it can gate deploys.
+# Usage: python bench_startup.py --import-budget 1.5 --first-upload-budget 15
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MODULES = ["main", "database", "executors", "jobs", "llm_service", "pipeline", "engine", "categorization",
+           "file_loader", "pdf_ingest", "report_generator", "gemini_utils"]
+
+# Must not be loaded by `import main`
+HEAVY_MODULES = ["pandas", "numpy", "sklearn", "scipy", "matplotlib", "reportlab", "pdfplumber", "openai", "google.genai", "thefuzz"]
+
+def import_seconds(module):
+    """
+    Cold import time of one module, in a fresh interpreter.
+    """
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    proc = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    return float(proc.stdout.strip().splitlines()[-1])
+
+def heavy_modules_loaded_by_main():
+    code = f"import sys, main; print('loaded:' + ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    proc = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    loaded = proc.stdout.strip().splitlines()[-1].removeprefix("loaded:")
+    return [m for m in loaded.split(",") if m]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def time_to_first_upload(payload, warmup, delay_s=0.0):
+    """
+    Seconds from process launch to (ready, first /upload answered), plus the /upload latency itself.
+    delay_s: idle time between ready and the upload (the window the background warm-up uses).
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        port = free_port()
+        env = dict(os.environ, PYTHONPATH=BACKEND_DIR, FINANCIAL_DB_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                   STARTUP_WARMUP="1" if warmup else "0")
+        env.pop("GEMINI_API_KEY", None)
+        base = f"http://127.0.0.1:{port}"
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            cwd=tmp, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            while True:
+                try:
+                    httpx.get(f"{base}/metrics", timeout=1)
+                    break
+                except httpx.HTTPError:
+                    if proc.poll() is not None:
+                        raise SystemExit("Server exited during startup")
+                    time.sleep(0.02)
+            ready = time.perf_counter() - start
+            time.sleep(delay_s)
+            sent = time.perf_counter()
+            r = httpx.post(f"{base}/upload", files={"file": ("statement.csv", payload, "text/csv")}, timeout=120)
+            r.raise_for_status()
+            done = time.perf_counter()
+            return ready, done - start, done - sent
+        finally:
+            proc.terminate()
+            proc.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark with budgets")
+    parser.add_argument("--import-budget", type=float, default=float(os.getenv("STARTUP_IMPORT_BUDGET_S", "1.5")),
+                        help="Max seconds for a cold `import main`")
+    parser.add_argument("--first-upload-budget", type=float, default=float(os.getenv("STARTUP_FIRST_UPLOAD_BUDGET_S", "15")),
+                        help="Max seconds from launch to the first /upload response")
+    parser.add_argument("--rows", type=int, default=1000, help="Rows in the first uploaded statement")
+    parser.add_argument("--upload-delay", type=float, nargs="+", default=[0.0, 5.0],
+                        help="Seconds between ready and the first upload (one run per value)")
+    args = parser.parse_args()
+
+    failures = []
+    print("cold import time per module:")
+    for module in MODULES:
+        seconds = import_seconds(module)
+        print(f"  {module:<18} {seconds:6.3f}s")
+        if module == "main" and seconds > args.import_budget:
+            failures.append(f"import main took {seconds:.2f}s (budget {args.import_budget}s)")
+
+    heavy = heavy_modules_loaded_by_main()
+    print(f"heavy modules loaded by `import main`: {heavy or 'none'}")
+    if heavy:
+        failures.append(f"import main loads {heavy}")
+
+    from bench_categorization import make_statement
+    df = make_statement(args.rows)
+    df['Date'] = df['Date'].dt.strftime('%d/%m/%Y %H:%M')
+    payload = df.to_csv(index=False).encode()
+    for delay_s in args.upload_delay:
+        for warmup in (False, True):
+            ready, first_upload, latency = time_to_first_upload(payload, warmup, delay_s)
+            print(f"delay {delay_s:.0f}s, warm-up {'on ' if warmup else 'off'}: ready in {ready:.2f}s, "
+                  f"first /upload answered at {first_upload:.2f}s (request took {latency:.2f}s)")
+            if delay_s == 0 and first_upload > args.first_upload_budget:
+                failures.append(f"first /upload at {first_upload:.2f}s with warm-up {'on' if warmup else 'off'} "
+                                f"(budget {args.first_upload_budget}s)")
+
+    if failures:
+        raise SystemExit("Startup budget exceeded: " + "; ".join(failures))
+    print("within budget")
+
+if __name__ == "__main__":
+    main()
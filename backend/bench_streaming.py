@@ -0,0 +1,88 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+# Benchmark: whole-file vs chunked (streaming) analysis of a large bank statement CSV.
+# Each mode runs in its own process so peak RSS is measured independently.
+# Everything but the anomalies must match; streamed anomalies are flagged chunk by chunk by an engine
+# set up on the first ANOMALY_STREAM_FIT_ROWS rows, so their overlap with the whole-file ones is reported.
+# Usage: python bench_streaming.py --rows 2000000 --chunk-rows 100000
+
+def write_statement(path, n_rows):
+    from bench_categorization import make_statement
+    df = make_statement(n_rows)
+    df['Date'] = df['Date'].dt.strftime('%d/%m/%Y %H:%M')
+    df.to_csv(path, index=False)
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process. VmHWM resets on exec, unlike ru_maxrss.
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_mode(mode, path, chunk_rows):
+    """
+    Runs one analysis inside this (child) process and prints JSON with timing, peak RSS and the result.
+    """
+    import pandas as pd
+    from engine import analyze_financials, analyze_financials_stream
+
+    start = time.perf_counter()
+    if mode == "full":
+        result = analyze_financials(pd.read_csv(path))
+    else:
+        result = analyze_financials_stream(pd.read_csv(path, chunksize=chunk_rows))
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"seconds": elapsed, "peak_mb": peak_rss_mb(), "result": result}, default=str))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming CSV analysis")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--chunk-rows", type=int, default=100_000)
+    parser.add_argument("--child", choices=["full", "stream"], help=argparse.SUPPRESS)
+    parser.add_argument("--csv", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_mode(args.child, args.csv, args.chunk_rows)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "statement.csv")
+        write_statement(path, args.rows)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"rows: {args.rows}, file: {size_mb:.1f} MB, chunk rows: {args.chunk_rows}")
+
+        outputs = {}
+        for mode in ("full", "stream"):
+            proc = subprocess.run(
+                [sys.executable, __file__, "--child", mode, "--csv", path, "--chunk-rows", str(args.chunk_rows)],
+                capture_output=True, text=True, check=True
+            )
+            outputs[mode] = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(f"{mode:>7}: {outputs[mode]['seconds']:.2f}s, peak RSS {outputs[mode]['peak_mb']:.0f} MB")
+
+        full, stream = (dict(outputs[mode]["result"]) for mode in ("full", "stream"))
+        flagged = {mode: {json.dumps(row, sort_keys=True) for row in result.pop("anomalies")} for mode, result in (("full", full), ("stream", stream))}
+        same = json.dumps(full, sort_keys=True) == json.dumps(stream, sort_keys=True)
+        union = flagged["full"] | flagged["stream"]
+        overlap = len(flagged["full"] & flagged["stream"]) / len(union) if union else 1.0
+        print(f"identical output (except anomalies): {same}")
+        print(f"anomalies: full {len(flagged['full'])}, stream {len(flagged['stream'])}, jaccard {overlap:.2f}")
+        if not same:
+            raise SystemExit("Streaming analysis diverged from whole-file analysis")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+# Benchmark: saving and querying statement rows as one JSON blob per report (legacy
+# Report.transaction_data) vs the normalized transactions table, then the blob -> table migration.
+# Queries: one month of rows, and totals per category. "prep" is transaction_columns(df), which runs
+# in the analysis stage (off the db pool) before the insert.
+# Usage: python bench_transactions.py --rows 100000
+
+def make_records(n, seed=5):
+    rng = random.Random(seed)
+    records = []
+    for i in range(n):
+        credit = rng.random() < 0.3
+        amount = round(rng.uniform(100, 50_000), 2)
+        loan = not credit and rng.random() < 0.1
+        records.append({
+            "Date": f"2023-{i * 12 // n + 1:02d}-{i % 28 + 1:02d} 10:00:00",
+            "Description": f"UPI/PAYMENT/{i}/VENDOR{i % 97}",
+            "Debit": 0.0 if credit else amount, "Credit": amount if credit else 0.0,
+            "Revenue": amount if credit else 0.0,
+            "Operating Expenses": 0.0 if credit or loan else amount,
+            "Loan Repayment": amount if loan else 0.0,
+            "Accounts Receivable": 0.0, "Accounts Payable": 0.0
+        })
+    return records
+
+def timed(fn):
+    start = time.perf_counter()
+    value = fn()
+    return time.perf_counter() - start, value
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON blob vs transactions table")
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    os.environ["FINANCIAL_DB_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    from database import (SessionLocal, init_db, save_report, Report, Transaction, get_transactions,
+                          transaction_totals, migrate_transaction_blobs)
+    init_db()
+    records = make_records(args.rows)
+    metrics = {"rev_growth_pct": 4.2, "expense_ratio": 0.82, "net_cash_flow": 125000.0}
+    data = {"score": 64, "metrics": metrics, "flags": [], "transaction_data": records}
+    import pandas as pd
+    from pipeline import transaction_columns
+    df = pd.DataFrame(records)
+    df['Date'] = pd.to_datetime(df['Date'])
+    march, april = datetime(2023, 3, 1), datetime(2023, 4, 1)
+    db = SessionLocal()
+
+    def save_blob():
+        report = Report(filename="blob.csv", score=64, raw_metrics=metrics, risk_flags=[], transaction_data=records)
+        db.add(report)
+        db.commit()
+        return report.id
+    blob_save_s, blob_id = timed(save_blob)
+    prep_s, columns = timed(lambda: transaction_columns(df))
+    table_save_s, table_report = timed(lambda: save_report(db, data, "table.csv", columns))
+
+    def blob_month():
+        db.expire_all()
+        rows = db.get(Report, blob_id).transaction_data
+        return [r for r in rows if "2023-03-01" <= r["Date"] < "2023-04-01"]
+    def blob_totals():
+        db.expire_all()
+        totals = defaultdict(float)
+        for r in db.get(Report, blob_id).transaction_data:
+            category = "Revenue" if r["Revenue"] else "Loan Repayment" if r["Loan Repayment"] else "Operating Expenses"
+            totals[category] += r["Debit"] + r["Credit"]
+        return totals
+    blob_month_s, blob_rows = timed(blob_month)
+    blob_totals_s, _ = timed(blob_totals)
+    table_month_s, table_rows = timed(lambda: get_transactions(db, table_report.id, march, april))
+    table_totals_s, groups = timed(lambda: transaction_totals(db, table_report.id))
+    assert len(blob_rows) == len(table_rows), (len(blob_rows), len(table_rows))
+
+    print(f"{args.rows} rows:")
+    print(f"  save:            blob {blob_save_s:6.2f}s | table {table_save_s:6.2f}s (+ {prep_s:.2f}s prep in the analysis stage)")
+    print(f"  one month:       blob {blob_month_s:6.2f}s | table {table_month_s:6.3f}s ({len(table_rows)} rows)")
+    print(f"  category totals: blob {blob_totals_s:6.2f}s | table {table_totals_s:6.3f}s ({len(groups)} groups)")
+
+    migrate_s, (reports, rows) = timed(lambda: migrate_transaction_blobs(db))
+    migrated = db.query(Transaction).filter(Transaction.report_id == blob_id).count()
+    same = transaction_totals(db, blob_id) == transaction_totals(db, table_report.id)
+    print(f"  migration:       {reports} report(s), {rows} rows in {migrate_s:.2f}s; rows match={migrated == args.rows}, totals match={same}")
+    db.close()
+
+if __name__ == "__main__":
+    main()
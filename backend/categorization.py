@@ -1,7 +1,14 @@
 from thefuzz import process, fuzz
-import openai
+from rapidfuzz import process as rf_process, fuzz as rf_fuzz, utils as rf_utils
+import numpy as np
+import pandas as pd
 import os
 import json
+import hashlib
+import time
+import asyncio
+from categorization_cache import category_cache, llm_category_cache
+from keyword_index import KeywordIndex
 
 # Predefined Categories for SMEs
 CATEGORIES = {
@@ -19,12 +26,41 @@ CATEGORIES = {
     ]
 }
 
-def categorize_transaction_heuristic(description):
+CONFIDENCE_THRESHOLD = 60 # Best fuzzy score must exceed this to trust the category
+
+def categories_fingerprint():
     """
-    Categorizes a transaction string using fuzzy matching against predefined keywords.
+    Hash of the keyword table (order matters: the first category wins ties).
+    Cached categories are only valid for the fingerprint they were computed under.
+    """
+    payload = json.dumps([CATEGORIES, CONFIDENCE_THRESHOLD])
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def normalize_description(description):
+    """
+    Cache key: the exact string the fuzzy scorer sees (lowercased, non-alphanumerics to spaces, trimmed).
+    """
+    return rf_utils.default_process(str(description).lower())
+
+_keyword_index = None
+_keyword_index_fingerprint = None
+
+def get_keyword_index():
+    """
+    Compiled keyword matcher, rebuilt only when CATEGORIES changes.
+    """
+    global _keyword_index, _keyword_index_fingerprint
+    fingerprint = categories_fingerprint()
+    if _keyword_index is None or fingerprint != _keyword_index_fingerprint:
+        _keyword_index = KeywordIndex(CATEGORIES)
+        _keyword_index_fingerprint = fingerprint
+    return _keyword_index
+
+def _score_normalized(description):
+    """
+    Fuzzy matching against predefined keywords. Expects an already normalized description.
+    Returns (category, best score).
     """
-    description = str(description).lower()
-    
     best_category = "Uncategorized"
     highest_score = 0
     
@@ -36,9 +72,269 @@ def categorize_transaction_heuristic(description):
             best_category = category
             
     # Threshold for confidence
-    if highest_score > 60:
-        return best_category
-    return "Operating Expenses" # Default conservative assumption for unknowns (usually expenses)
+    if highest_score > CONFIDENCE_THRESHOLD:
+        return best_category, highest_score
+    return "Operating Expenses", highest_score # Default conservative assumption for unknowns (usually expenses)
+
+def _categorize_normalized(description):
+    return _score_normalized(description)[0]
+
+def categorize_transaction_heuristic(description, return_path=False):
+    """
+    Categorizes a transaction string using fuzzy matching against predefined keywords.
+    Lookup order: cache -> keyword index (exact/substring hits) -> fuzzy scorer (misses only).
+    With return_path=True, returns (category, path) where path is 'cache', 'index' or 'fuzzy'.
+    """
+    key = normalize_description(description)
+    category_cache.sync(categories_fingerprint())
+    
+    path = "cache"
+    entry = category_cache.get(key)
+    if entry is None:
+        path = "index"
+        category = get_keyword_index().match(key)
+        entry = (category, 100)
+        if category is None:
+            path = "fuzzy"
+            entry = _score_normalized(key)
+        category_cache.put(key, *entry)
+    category = entry[0]
+    return (category, path) if return_path else category
+
+# Batch scoring settings (rapidfuzz cdist runs in C++ and releases the GIL)
+BATCH_WORKERS = int(os.getenv("CATEGORIZATION_WORKERS", "-1"))
+BATCH_BLOCK_SIZE = 20000 # Unique descriptions scored per cdist call (bounds the score matrix)
+
+def _score_unique_descriptions(descriptions):
+    """
+    Scores unique normalized descriptions against every keyword in one vectorized pass.
+    Mirrors _score_normalized exactly: per-category best rounded score,
+    first category wins ties, > CONFIDENCE_THRESHOLD required, otherwise Operating Expenses.
+    Returns (categories, best scores).
+    """
+    category_names = list(CATEGORIES.keys())
+    keywords = []
+    keyword_category = []
+    for cat_idx, category in enumerate(category_names):
+        for keyword in CATEGORIES[category]:
+            keywords.append(keyword)
+            keyword_category.append(cat_idx)
+    keyword_category = np.array(keyword_category)
+
+    queries = list(descriptions)
+    results = np.empty(len(queries), dtype=object)
+    result_scores = np.zeros(len(queries))
+
+    for start in range(0, len(queries), BATCH_BLOCK_SIZE):
+        block = queries[start:start + BATCH_BLOCK_SIZE]
+        scores = rf_process.cdist(
+            block, keywords,
+            scorer=rf_fuzz.partial_ratio,
+            processor=rf_utils.default_process,
+            dtype=np.float64,
+            workers=BATCH_WORKERS
+        )
+        # thefuzz rounds each keyword score to an int before comparing categories
+        scores = np.rint(scores)
+        per_category = np.column_stack([
+            scores[:, keyword_category == cat_idx].max(axis=1) for cat_idx in range(len(category_names))
+        ])
+        best_idx = per_category.argmax(axis=1) # argmax keeps the first max, like the strict '>' loop
+        best_score = per_category[np.arange(len(block)), best_idx]
+
+        block_result = np.array(category_names, dtype=object)[best_idx]
+        block_result[best_score <= CONFIDENCE_THRESHOLD] = "Operating Expenses"
+        results[start:start + len(block)] = block_result
+        result_scores[start:start + len(block)] = best_score
+
+    return results, result_scores
+
+def _lookup_or_score(keys):
+    """
+    Resolves unique normalized descriptions: cache, then keyword index, then batch fuzzy scoring.
+    Returns (categories, scores, paths) aligned with keys.
+    """
+    category_cache.sync(categories_fingerprint())
+    resolved = category_cache.get_many(keys)
+    paths = dict.fromkeys(resolved, "cache")
+
+    index = get_keyword_index()
+    fresh = {}
+    unmatched = []
+    for key in keys:
+        if key in resolved:
+            continue
+        category = index.match(key)
+        if category is None:
+            unmatched.append(key)
+        else:
+            fresh[key] = (category, 100)
+            paths[key] = "index"
+
+    if unmatched:
+        unmatched_categories, unmatched_scores = _score_unique_descriptions(unmatched)
+        fresh.update(zip(unmatched, zip(unmatched_categories, unmatched_scores.tolist())))
+        paths.update(dict.fromkeys(unmatched, "fuzzy"))
+
+    category_cache.put_many(fresh)
+    resolved.update(fresh)
+    return (
+        np.array([resolved[k][0] for k in keys], dtype=object),
+        np.array([resolved[k][1] for k in keys], dtype=float),
+        np.array([paths[k] for k in keys], dtype=object)
+    )
+
+def categorize_transactions_batch(descriptions, debits=None, credits=None, return_paths=False, use_llm=None):
+    """
+    Categorizes a whole statement in one call.
+    Returns an object array aligned with descriptions:
+    - 'Revenue' for rows with Credit > 0
+    - heuristic category for rows with Debit > 0 (each unique description is scored once, then cached)
+    - None for rows with neither
+    If debits/credits are omitted, every row is categorized with the heuristic.
+    With use_llm (default: LLM_CATEGORIZATION env), low-confidence descriptions are re-asked in LLM batches.
+    With return_paths=True, also returns which path handled each row
+    ('credit', 'cache', 'index', 'fuzzy', 'llm' or None).
+    """
+    if use_llm is None:
+        use_llm = LLM_CATEGORIZATION_ENABLED
+
+    descriptions = np.array([str(d) for d in descriptions], dtype=object)
+    n = len(descriptions)
+    categories = np.full(n, None, dtype=object)
+    paths = np.full(n, None, dtype=object)
+
+    if debits is None and credits is None:
+        needs_heuristic = np.ones(n, dtype=bool)
+    else:
+        credit_vals = np.zeros(n) if credits is None else np.asarray(credits, dtype=float)
+        debit_vals = np.zeros(n) if debits is None else np.asarray(debits, dtype=float)
+        credit_mask = credit_vals > 0
+        categories[credit_mask] = "Revenue"
+        paths[credit_mask] = "credit"
+        needs_heuristic = ~credit_mask & (debit_vals > 0)
+
+    if needs_heuristic.any():
+        keys = [normalize_description(d) for d in descriptions[needs_heuristic]]
+        codes, uniques = pd.factorize(np.array(keys, dtype=object))
+        unique_keys = list(uniques)
+        unique_categories, unique_scores, unique_paths = _lookup_or_score(unique_keys)
+
+        if use_llm:
+            low_confidence = [k for k, score in zip(unique_keys, unique_scores) if score <= LLM_CONFIDENCE_THRESHOLD]
+            if low_confidence:
+                llm_categories, _ = categorize_transactions_llm_batch(low_confidence)
+                for i, key in enumerate(unique_keys):
+                    if key in llm_categories:
+                        unique_categories[i] = llm_categories[key]
+                        unique_paths[i] = "llm"
+
+        categories[needs_heuristic] = unique_categories[codes]
+        paths[needs_heuristic] = unique_paths[codes]
+
+    return (categories, paths) if return_paths else categories
+
+# LLM Batch Settings
+# LLM_CATEGORIZATION=1 enables the LLM pass inside categorize_transactions_batch (off by default: it costs tokens)
+LLM_CATEGORIZATION_ENABLED = os.getenv("LLM_CATEGORIZATION", "0") == "1"
+LLM_CONFIDENCE_THRESHOLD = int(os.getenv("LLM_CONFIDENCE_THRESHOLD", str(CONFIDENCE_THRESHOLD)))
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "50")) # Descriptions packed per prompt
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4")) # In-flight Gemini requests
+LLM_PROMPT_VERSION = "batch-v1" # Bump to invalidate cached LLM answers
+
+VALID_CATEGORIES = ["Revenue", "Operating Expenses", "Loan Repayment", "Personal/Other"]
+
+# Stats of the most recent LLM batch run (exposed via /metrics)
+last_llm_batch_stats = {}
+
+def _build_llm_batch_prompt(descriptions):
+    lines = "\n".join(f"{i}. {d}" for i, d in enumerate(descriptions, 1))
+    return (
+        "You are a financial classifier. Classify each numbered bank transaction description into one of: "
+        f"{VALID_CATEGORIES}.\n"
+        "Return ONLY a JSON array of category names, one per transaction, in the same order.\n\n"
+        f"Transactions:\n{lines}"
+    )
+
+def _parse_llm_batch_response(text, expected):
+    """
+    Returns the list of categories, or None if the reply is not a JSON array of the expected length.
+    Individual invalid labels come back as None.
+    """
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.find("["):] if "[" in text else text
+    try:
+        parsed = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(parsed, list) or len(parsed) != expected:
+        return None
+    return [c if c in VALID_CATEGORIES else None for c in parsed]
+
+async def _categorize_llm_chunks(client, model_name, chunks, stats):
+    semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    results = {}
+
+    async def run_chunk(chunk):
+        async with semaphore:
+            stats["calls"] += 1
+            try:
+                response = await client.aio.models.generate_content(
+                    model=model_name,
+                    contents=_build_llm_batch_prompt(chunk),
+                    config={"response_mime_type": "application/json"}
+                )
+                labels = _parse_llm_batch_response(response.text or "", len(chunk))
+            except Exception as e:
+                print(f"LLM Batch Categorization Failed: {e}")
+                labels = None
+            if labels is None:
+                stats["failed_calls"] += 1
+                return
+            for description, label in zip(chunk, labels):
+                if label is not None:
+                    results[description] = label
+
+    await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+    return results
+
+def categorize_transactions_llm_batch(descriptions):
+    """
+    Categorizes descriptions with Gemini, many per prompt, with bounded concurrency.
+    Descriptions are normalized and deduplicated; answers are cached (llm_category_cache).
+    Returns ({normalized description: category}, stats). Descriptions the model could not
+    label are left out so callers keep their heuristic category.
+    """
+    start = time.perf_counter()
+    keys = list(dict.fromkeys(normalize_description(d) for d in descriptions))
+    stats = {"descriptions": len(keys), "cached": 0, "calls": 0, "failed_calls": 0, "rows_per_call": 0.0, "latency_s": 0.0}
+
+    llm_category_cache.sync(f"{LLM_PROMPT_VERSION}:{VALID_CATEGORIES}")
+    results = {k: entry[0] for k, entry in llm_category_cache.get_many(keys).items()}
+    stats["cached"] = len(results)
+    pending = [k for k in keys if k not in results]
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if pending and api_key:
+        from gemini_utils import get_gemini_client, get_gemini_model_name, run_gemini_coroutine
+        client = get_gemini_client()
+        model_name = get_gemini_model_name()
+        chunks = [pending[i:i + LLM_BATCH_SIZE] for i in range(0, len(pending), LLM_BATCH_SIZE)]
+
+        # On the shared Gemini loop, so batches reuse the pooled async connections
+        answered = run_gemini_coroutine(_categorize_llm_chunks(client, model_name, chunks, stats))
+
+        llm_category_cache.put_many({k: (category, None) for k, category in answered.items()})
+        results.update(answered)
+        stats["rows_per_call"] = round(len(pending) / stats["calls"], 2) if stats["calls"] else 0.0
+
+    stats["latency_s"] = round(time.perf_counter() - start, 3)
+    last_llm_batch_stats.clear()
+    last_llm_batch_stats.update(stats)
+    print(f"LLM batch categorization: {stats}")
+    return results, stats
 
 def categorize_transaction_llm(description):
     """
@@ -49,8 +345,8 @@ def categorize_transaction_llm(description):
         return None
 
     try:
-        from google import genai
-        client = genai.Client(api_key=api_key)
+        from gemini_utils import get_gemini_client
+        client = get_gemini_client()
 
         full_prompt = (
             "You are a financial classifier. Classify the transaction description into one of: "
@@ -100,28 +396,16 @@ def enrich_financial_data(df):
         # Logic: Credit is Revenue. Debit is Expense (need to split into Opex vs Loan)
         df['Revenue'] = df['Credit']
         
-        # For Debits, classify into Opex or Loan
-        def classify_debit(row):
-            if row['Debit'] == 0: return 0, 0
-            
-            # Hybrid approach: Try LLM first if key exists (simulated here as we might not want to burn tokens on every row in a loop for this demo. 
-            # Ideally, batch processing. For now, let's use Heuristic for speed/demo safety).
-            category = categorize_transaction_heuristic(row['Description'])
-            
-            if category == 'Loan Repayment':
-                return 0, row['Debit']
-            else:
-                return row['Debit'], 0 # Default to Opex
-        
-        # Apply classification
-        # Zip to iterate faster or use apply
-        classifications = df.apply(classify_debit, axis=1, result_type='expand')
-        df['Operating Expenses'] = classifications[0]
-        df['Loan Repayment'] = classifications[1]
+        # For Debits, classify into Opex or Loan (one batch call instead of a per-row apply)
+        categories = pd.Series(categorize_transactions_batch(df['Description']), index=df.index)
+        is_debit = df['Debit'] != 0
+        is_loan = is_debit & (categories == 'Loan Repayment')
+        df['Operating Expenses'] = df['Debit'].where(is_debit & ~is_loan, 0)
+        df['Loan Repayment'] = df['Debit'].where(is_loan, 0)
         
     # Case 2: Only Description and Amount exist (sign determines in/out) but usually bank statements have Debit/Credit.
     # Let's handle the specific case where user asks for "Zero-Shot Transaction Categorization" implies we create a "Category" column.
     
-    df['Category_AI'] = df['Description'].apply(categorize_transaction_heuristic)
+    df['Category_AI'] = categorize_transactions_batch(df['Description'])
     
     return df
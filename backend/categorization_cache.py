@@ -0,0 +1,151 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# Cache Settings
+# CATEGORY_CACHE_SIZE: max descriptions held in memory (LRU)
+# CATEGORY_CACHE_PATH: optional SQLite file shared across uploads/processes (e.g. ./category_cache.db)
+DEFAULT_MAX_ENTRIES = int(os.getenv("CATEGORY_CACHE_SIZE", "100000"))
+DEFAULT_DB_PATH = os.getenv("CATEGORY_CACHE_PATH")
+
+SQLITE_BATCH = 500 # Max bound parameters per IN (...) lookup
+
+class CategorizationCache:
+    """
+    Memoizes description -> (category, score).
+    Two tiers: a bounded in-memory LRU and an optional on-disk SQLite store that survives restarts.
+    Every entry belongs to a keyword-table fingerprint; a new fingerprint drops stale entries.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, db_path=DEFAULT_DB_PATH, table="category_cache"):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.table = table
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._fingerprint = None
+        self._conn = None
+
+        # Counters
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            columns = [row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")]
+            if columns and "score" not in columns:
+                self._conn.execute(f"DROP TABLE {table}") # Older layout without scores; it's only a cache
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "fingerprint TEXT NOT NULL, description TEXT NOT NULL, category TEXT NOT NULL, score REAL, "
+                "PRIMARY KEY (fingerprint, description))"
+            )
+            self._conn.commit()
+
+    def sync(self, fingerprint):
+        """
+        Binds the cache to the current keyword table. If it changed, cached categories are invalid.
+        """
+        with self._lock:
+            if fingerprint == self._fingerprint:
+                return
+            if self._fingerprint is not None:
+                self.invalidations += 1
+            self._memory.clear()
+            self._fingerprint = fingerprint
+            if self._conn:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE fingerprint != ?", (fingerprint,))
+                self._conn.commit()
+
+    def get_many(self, keys):
+        """
+        Returns {key: (category, score)} for every cached key. Disk hits are promoted into memory.
+        """
+        found = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                entry = self._memory.get(key)
+                if entry is None:
+                    missing.append(key)
+                else:
+                    self._memory.move_to_end(key)
+                    found[key] = entry
+            self.hits += len(found)
+
+            if missing and self._conn:
+                for start in range(0, len(missing), SQLITE_BATCH):
+                    batch = missing[start:start + SQLITE_BATCH]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._conn.execute(
+                        f"SELECT description, category, score FROM {self.table} "
+                        f"WHERE fingerprint = ? AND description IN ({placeholders})",
+                        [self._fingerprint, *batch]
+                    ).fetchall()
+                    for key, category, score in rows:
+                        found[key] = (category, score)
+                        self._remember(key, (category, score))
+                    self.disk_hits += len(rows)
+
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items):
+        """
+        Stores {key: (category, score)} in memory and, if enabled, on disk.
+        """
+        if not items:
+            return
+        with self._lock:
+            for key, entry in items.items():
+                self._remember(key, entry)
+            if self._conn:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO {self.table} (fingerprint, description, category, score) VALUES (?, ?, ?, ?)",
+                    [(self._fingerprint, key, category, score) for key, (category, score) in items.items()]
+                )
+                self._conn.commit()
+
+    def put(self, key, category, score=None):
+        self.put_many({key: (category, score)})
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._conn:
+                self._conn.execute(f"DELETE FROM {self.table}")
+                self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "persistent": self._conn is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+            }
+
+# Shared process-wide instances
+category_cache = CategorizationCache()
+llm_category_cache = CategorizationCache(table="llm_category_cache") # LLM answers for low-confidence descriptions
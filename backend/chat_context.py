@@ -0,0 +1,126 @@
+import os
+import threading
+from collections import OrderedDict
+
+# Chat Context Cache
+# /chat explains the latest report from a summary of it (score, ratios, risks, insights). Building
+# that summary and the system prompt around it is the same work for every question, so both are
+# kept per report id. Saving a report clears the cache (SQLite can hand out an old id again after
+# a reset, and a new upload is when the next question will ask about a different report anyway).
+#   CHAT_CONTEXT_CACHE_SIZE - reports whose context is kept
+CHAT_CONTEXT_CACHE_SIZE = int(os.getenv("CHAT_CONTEXT_CACHE_SIZE", "16"))
+
+def build_context_summary(report):
+    # This is the "computed financial summary" the user requested
+    return {
+        "Health Score": f"{report.score}/100",
+        "Revenue Growth": f"{report.revenue_growth}%",
+        "Expense Ratio": f"{report.expense_ratio}",
+        "Net Cash Flow": f"{report.net_cash_flow}",
+        "Identified Risks": report.risk_flags, # List of strings
+        "Tax Status": report.tax_status,
+        "Credit Score Est": report.credit_score,
+        "AI Insights": report.ai_insights
+    }
+
+def build_prompt_prefix(context_summary):
+    """
+    The system prompt up to the user's question.
+    """
+    return f"""
+        You are a **Financial Analysis Assistant** for SMEs.
+        Your role is to explain the user's financial health based ONLY on the provided summary.
+
+        ### 📊 Financial Context (ALREADY COMPUTED):
+        {context_summary}
+
+        ### 👑 Guidelines:
+        1. **Explain, Don't Calculate**: The numbers are already there. Explain WHAT they mean.
+        2. **Be Insightful**: If the score is low, explain why (look at risks). If high, congratulate them.
+        3. **Simple Business Language**: Avoid jargon. Speak to a business owner.
+        4. **Safety & Compliance**:
+           - Do NOT give legal, tax, or investment advice.
+           - Always imply these are "indicative insights".
+        5. **Scope**: Answer questions about the score, cash flow, risks, and improvements.
+
+        ### 🚫 Restrictions:
+        - Do not analyze raw CSV rows (you don't have them).
+        - Do not output Python code.
+        - Do not make up numbers not in the context.
+        """
+
+class ChatContext:
+    """
+    Everything /chat needs from one report. The score is kept for the offline fallback answer.
+    """
+
+    def __init__(self, report_id, score, summary, prompt_prefix):
+        self.report_id = report_id
+        self.score = score
+        self.summary = summary
+        self.prompt_prefix = prompt_prefix
+
+    def prompt(self, message):
+        return f"""{self.prompt_prefix}
+        User Question: "{message}"
+
+        Answer (Short, Professional, Helpful):
+        """
+
+class ChatContextCache:
+    """
+    report_id -> ChatContext, LRU. Reports don't change after they are saved, so entries only go
+    away through eviction or invalidate().
+    """
+
+    def __init__(self, max_entries=CHAT_CONTEXT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_or_build(self, report_id, load_report):
+        """
+        Cached context for report_id; on a miss load_report(report_id) fetches the summary columns.
+        Returns None if the report is gone.
+        """
+        with self._lock:
+            context = self._entries.get(report_id)
+            if context is not None:
+                self._entries.move_to_end(report_id)
+                self.hits += 1
+                return context
+            self.misses += 1
+
+        report = load_report(report_id)
+        if report is None:
+            return None
+        summary = build_context_summary(report)
+        context = ChatContext(report_id, report.score, summary, build_prompt_prefix(summary))
+        with self._lock:
+            self._entries[report_id] = context
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return context
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations
+            }
+
+# Shared process-wide instance
+chat_context_cache = ChatContextCache()
@@ -1,7 +1,8 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Text, DateTime, JSON, text
+from sqlalchemy import create_engine, Column, Integer, String, Float, Text, DateTime, JSON, ForeignKey, Index, text, func, null
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, deferred, load_only
 from datetime import datetime
+import asyncio
 import json
 import os
 from dotenv import load_dotenv
@@ -33,8 +34,34 @@ else:
     engine_args["pool_size"] = 10        # Maximum number of connections in the pool
     engine_args["max_overflow"] = 20     # Max extra connections if pool is full
 
+# SQLite Production Mode
+# WAL journaling, so readers never wait for a writer (and a writer never waits for readers), plus
+# pragmas for a server workload, applied to every connection of both engines. Saves go through
+# one writer thread that groups them into shared transactions (report_writer.py).
+#   SQLITE_PRODUCTION_MODE - 0 keeps SQLite's defaults (rollback journal, a commit per save)
+#   SQLITE_CACHE_MB        - page cache per connection
+#   SQLITE_MMAP_MB         - memory-mapped I/O window
+SQLITE_PRODUCTION_MODE = "sqlite" in DATABASE_URL and os.getenv("SQLITE_PRODUCTION_MODE", "1") == "1"
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL", # Durable across application crashes; a power loss can drop the last commits
+    "busy_timeout": "5000",
+    "temp_store": "MEMORY",
+    "cache_size": str(-int(float(os.getenv("SQLITE_CACHE_MB", "64")) * 1024)), # Negative = KiB
+    "mmap_size": str(int(float(os.getenv("SQLITE_MMAP_MB", "256")) * 1024 * 1024)),
+}
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
 engine = create_engine(DATABASE_URL, **engine_args)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+if SQLITE_PRODUCTION_MODE:
+    from sqlalchemy import event
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
 
 Base = declarative_base()
 
@@ -44,6 +71,7 @@ class Report(Base):
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, index=True)
     upload_date = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow) # Uploaded, or served again from the result cache
     score = Column(Float)
     revenue_growth = Column(Float)
     expense_ratio = Column(Float)
@@ -52,12 +80,61 @@ class Report(Base):
     risk_flags = Column(JSON)
     ai_insights = Column(Text)
     language = Column(String, default="en")
+    industry = Column(String) # As given at upload; groups reports for the anomaly models (anomaly_models.py)
 
     # New Fields for Advanced Features
     credit_score = Column(Integer) # Simulated 300-900 score
     tax_status = Column(String) # Compliant / Non-Compliant
     forecast_next_month = Column(Float) # Predicted Revenue
-    transaction_data = Column(JSON) # Persistence for Chatbot (New)
+    # Legacy per-report JSON copy of the rows (see Transaction). Deferred: it can be megabytes
+    transaction_data = deferred(Column(JSON))
+
+    __table_args__ = (
+        # Newest-first listings: latest report, history pages (keyset on (upload_date, id))
+        Index("ix_reports_upload_date_id", "upload_date", "id"),
+        # The latest report (/chat's context) is the one last used
+        Index("ix_reports_last_used_at_id", "last_used_at", "id"),
+    )
+
+class Transaction(Base):
+    """
+    One uploaded statement row, normalized. Replaces the Report.transaction_data JSON blob so rows
+    can be range-queried and aggregated in the database.
+    """
+    __tablename__ = "transactions"
+
+    id = Column(Integer, primary_key=True)
+    report_id = Column(Integer, ForeignKey("reports.id", ondelete="CASCADE"), nullable=False)
+    row_index = Column(Integer, nullable=False) # Position in the uploaded file
+    date = Column(DateTime)
+    description = Column(String)
+    category = Column(String) # Revenue / Operating Expenses / Loan Repayment, from the analysis split
+    debit = Column(Float)
+    credit = Column(Float)
+    revenue = Column(Float)
+    operating_expenses = Column(Float)
+    loan_repayment = Column(Float)
+    accounts_receivable = Column(Float)
+    accounts_payable = Column(Float)
+    extra = Column(JSON) # Uploaded columns with no field above
+
+    __table_args__ = (
+        Index("ix_transactions_report_date", "report_id", "date"),
+        Index("ix_transactions_category", "category"),
+    )
+
+# Statement column (as normalize_columns names it) -> Transaction field
+TRANSACTION_FIELDS = {
+    'Date': 'date', 'Description': 'description', 'Debit': 'debit', 'Credit': 'credit',
+    'Revenue': 'revenue', 'Operating Expenses': 'operating_expenses', 'Loan Repayment': 'loan_repayment',
+    'Accounts Receivable': 'accounts_receivable', 'Accounts Payable': 'accounts_payable'
+}
+TRANSACTION_COLUMNS = ['report_id', 'row_index', 'category', 'extra'] + list(TRANSACTION_FIELDS.values())
+TRANSACTION_INSERT_BATCH = int(os.getenv("TRANSACTION_INSERT_BATCH", "10000")) # Rows per executemany / COPY
+
+# What /chat needs from a report; everything except the transaction rows
+CHAT_SUMMARY_COLUMNS = (Report.id, Report.score, Report.revenue_growth, Report.expense_ratio, Report.net_cash_flow,
+                        Report.risk_flags, Report.tax_status, Report.credit_score, Report.ai_insights)
 
 def init_db():
     Base.metadata.create_all(bind=engine)
@@ -82,10 +159,197 @@ def init_db():
                     print("Schema is up to date.")
     except Exception as e:
         print(f"Migration Warning: {e}")
+
+    try:
+        with engine.connect() as connection:
+            # Databases created before (upload_date, id) was indexed (latest report / history pages sort on it)
+            connection.execute(text("CREATE INDEX IF NOT EXISTS ix_reports_upload_date_id ON reports (upload_date, id)"))
+            # The single-column index it replaces only adds cost to writes
+            connection.execute(text("DROP INDEX IF EXISTS ix_reports_upload_date"))
+            connection.commit()
+    except Exception as e:
+        print(f"Migration Warning: {e}")
+
+    try:
+        from sqlalchemy import inspect
+        if 'industry' not in {column['name'] for column in inspect(engine).get_columns('reports')}:
+            with engine.connect() as connection:
+                # Databases from before reports recorded their industry
+                connection.execute(text("ALTER TABLE reports ADD COLUMN industry VARCHAR"))
+                connection.commit()
+    except Exception as e:
+        print(f"Migration Warning: {e}")
+
+    try:
+        from sqlalchemy import inspect
+        if 'last_used_at' not in {column['name'] for column in inspect(engine).get_columns('reports')}:
+            with engine.connect() as connection:
+                # Databases from before cache hits counted as use: a report was last used when uploaded
+                connection.execute(text("ALTER TABLE reports ADD COLUMN last_used_at TIMESTAMP"))
+                connection.execute(text("UPDATE reports SET last_used_at = upload_date"))
+                connection.commit()
+        with engine.connect() as connection:
+            connection.execute(text("CREATE INDEX IF NOT EXISTS ix_reports_last_used_at_id ON reports (last_used_at, id)"))
+            connection.commit()
+    except Exception as e:
+        print(f"Migration Warning: {e}")
     # --------------------------------------------------
 
-def save_report(db, data, filename):
-    db_report = Report(
+def _parse_date(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None # 'NaT' and unparseable dates
+
+def _to_float(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def transaction_columns_from_records(records):
+    """
+    Statement records (pipeline.transaction_records, or a legacy transaction_data blob) in the
+    column-wise form pipeline.transaction_columns produces: statement column -> values, plus
+    'category', 'extra' and 'row_count'.
+    """
+    columns = {key: [] for key in TRANSACTION_FIELDS}
+    categories, extras = [], []
+    for record in records:
+        extra = None
+        for key, values in columns.items():
+            value = record.get(key)
+            if key == 'Date':
+                value = _parse_date(value)
+            elif key == 'Description':
+                value = None if value is None else str(value)
+            else:
+                value = _to_float(value)
+            values.append(value)
+        for key, value in record.items():
+            if key not in TRANSACTION_FIELDS:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        extras.append(extra)
+        if columns['Revenue'][-1]:
+            categories.append('Revenue')
+        elif columns['Loan Repayment'][-1]:
+            categories.append('Loan Repayment')
+        elif columns['Operating Expenses'][-1]:
+            categories.append('Operating Expenses')
+        else:
+            categories.append(None)
+    columns.update(category=categories, extra=extras, row_count=len(records))
+    return columns
+
+def _table_columns(report_id, columns):
+    """
+    Statement columns -> one value list per TRANSACTION_COLUMNS entry (missing columns are NULL).
+    """
+    n = columns['row_count']
+    first = columns.get('first_row', 0) # Chunks of a streamed upload continue the row numbering
+    by_field = {field: columns.get(key) for key, field in TRANSACTION_FIELDS.items()}
+    by_field.update(report_id=[report_id] * n, row_index=range(first, first + n), category=columns.get('category'), extra=columns.get('extra'))
+    return [list(by_field[c]) if by_field[c] is not None else [None] * n for c in TRANSACTION_COLUMNS]
+
+def _copy_transactions(db, table):
+    """
+    Postgres bulk path: COPY ... FROM STDIN (CSV), on the session's own connection and transaction.
+    """
+    import csv
+    import io
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    extra_position = TRANSACTION_COLUMNS.index('extra')
+    for row in zip(*table):
+        writer.writerow([
+            '' if value is None else json.dumps(value) if i == extra_position else value.isoformat() if isinstance(value, datetime) else value
+            for i, value in enumerate(row)
+        ])
+    sql = f"COPY transactions ({', '.join(TRANSACTION_COLUMNS)}) FROM STDIN WITH (FORMAT csv, NULL '')"
+    dbapi_connection = db.connection().connection.driver_connection
+    with dbapi_connection.cursor() as cursor:
+        if hasattr(cursor, "copy_expert"): # psycopg2
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+        else: # psycopg 3
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+
+def _isoformat(value):
+    return value.isoformat(" ", "microseconds")
+
+def _bound_rows(table, dialect, columns=TRANSACTION_COLUMNS):
+    """
+    Column lists (one per entry of columns) -> executemany parameter rows, with values converted
+    by the columns' own bind processors (so dates and JSON are stored exactly as the ORM would).
+    """
+    for i, column in enumerate(columns):
+        processor = Transaction.__table__.c[column].type._cached_bind_processor(dialect)
+        if processor is None:
+            continue
+        sample = next((value for value in table[i] if value is not None), None)
+        if isinstance(sample, datetime) and processor(sample) == sample.isoformat(" ", "microseconds"):
+            processor = _isoformat # Same text as SQLite's DATETIME processor, without the Python-level formatting
+        table[i] = [None if value is None else processor(value) for value in table[i]]
+    return list(zip(*table))
+
+def transaction_insert_sql(dialect, report_id=None):
+    """
+    executemany INSERT for transactions; with report_id, the id is inlined and left out of the rows.
+    """
+    marker = "?" if dialect.paramstyle == "qmark" else "%s"
+    if report_id is None:
+        return f"INSERT INTO transactions ({', '.join(TRANSACTION_COLUMNS)}) VALUES ({', '.join([marker] * len(TRANSACTION_COLUMNS))})"
+    values = [str(int(report_id))] + [marker] * (len(TRANSACTION_COLUMNS) - 1)
+    return f"INSERT INTO transactions ({', '.join(TRANSACTION_COLUMNS)}) VALUES ({', '.join(values)})"
+
+def prepare_transaction_rows(columns, dialect=None):
+    """
+    Bound executemany rows of every TRANSACTION_COLUMNS value except report_id (for
+    transaction_insert_sql(dialect, report_id)), so they can be built before the report has an id.
+    """
+    dialect = dialect or engine.dialect
+    return _bound_rows(_table_columns(None, columns)[1:], dialect, TRANSACTION_COLUMNS[1:])
+
+def _executemany_transactions(db, table):
+    """
+    Other databases: one DBAPI executemany (see _bound_rows).
+    """
+    connection = db.connection()
+    connection.exec_driver_sql(transaction_insert_sql(connection.dialect), _bound_rows(table, connection.dialect))
+
+def transaction_chunks(transactions):
+    """
+    The column dicts to insert for a save's transactions: one for a whole upload, or the chunks of a
+    streamed one (pipeline.TransactionSpool, read back one chunk at a time).
+    """
+    return [transactions] if isinstance(transactions, dict) else transactions
+
+def save_transactions(db, report_id, columns):
+    """
+    Bulk-inserts a report's rows into transactions (COPY on Postgres, executemany elsewhere).
+    columns: pipeline.transaction_columns(df) or transaction_columns_from_records(records).
+    Does not commit.
+    """
+    table = _table_columns(report_id, columns)
+    n = columns['row_count']
+    for start in range(0, n, TRANSACTION_INSERT_BATCH):
+        batch = [values[start:start + TRANSACTION_INSERT_BATCH] for values in table]
+        if engine.dialect.name == "postgresql":
+            _copy_transactions(db, batch)
+        else:
+            _executemany_transactions(db, batch)
+    return n
+
+def build_report(data, filename):
+    """
+    An unsaved Report for an analysis result.
+    """
+    return Report(
         filename=filename,
         score=data['score'],
         revenue_growth=data['metrics']['rev_growth_pct'],
@@ -97,13 +361,313 @@ def save_report(db, data, filename):
         credit_score=data.get('credit_score', 0),
         tax_status=data.get('tax_status', 'Pending'),
         forecast_next_month=data.get('forecast_next_month', 0.0),
-        transaction_data=data.get('transaction_data', []) # New field
+        industry=data.get('industry')
     )
+
+def save_report(db, data, filename, transactions=None):
+    """
+    Saves a report and its rows. transactions: pipeline.transaction_columns output (or a
+    pipeline.TransactionSpool for streamed uploads); without it the rows come from
+    data['transaction_data'] records (slower, row by row conversion).
+    """
+    db_report = build_report(data, filename)
     db.add(db_report)
+    db.flush() # Assigns db_report.id for the transaction rows
+    if transactions is None:
+        transactions = transaction_columns_from_records(data.get('transaction_data') or [])
+    for columns in transaction_chunks(transactions):
+        save_transactions(db, db_report.id, columns)
     db.commit()
     db.refresh(db_report)
     print(f"Report saved to DB with ID: {db_report.id}")
     return db_report
 
+def get_latest_report_id(db):
+    row = db.query(Report.id).order_by(Report.last_used_at.desc(), Report.id.desc()).first()
+    return row[0] if row else None
+
+def get_report_summary(db, report_id):
+    """
+    A report with only CHAT_SUMMARY_COLUMNS loaded (transaction_data stays in the database).
+    """
+    return db.query(Report).options(load_only(*CHAT_SUMMARY_COLUMNS)).filter(Report.id == report_id).first()
+
+def get_transactions(db, report_id, start=None, end=None, category=None, limit=None, offset=0):
+    """
+    A report's rows in file order, optionally within [start, end) and / or of one category.
+    Uses ix_transactions_report_date for date ranges.
+    """
+    query = db.query(Transaction).filter(Transaction.report_id == report_id)
+    if start is not None:
+        query = query.filter(Transaction.date >= start)
+    if end is not None:
+        query = query.filter(Transaction.date < end)
+    if category is not None:
+        query = query.filter(Transaction.category == category)
+    query = query.order_by(Transaction.row_index).offset(offset)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+def _month(column):
+    if engine.dialect.name == "postgresql":
+        return func.to_char(column, 'YYYY-MM')
+    return func.strftime('%Y-%m', column)
+
+def transaction_totals(db, report_id, group_by="category", start=None, end=None):
+    """
+    Row count and column sums per category or per month ('YYYY-MM'), computed in the database.
+    """
+    key = Transaction.category if group_by == "category" else _month(Transaction.date)
+    query = db.query(
+        key.label("key"),
+        func.count(Transaction.id),
+        func.sum(Transaction.debit),
+        func.sum(Transaction.credit),
+        func.sum(Transaction.revenue),
+        func.sum(Transaction.operating_expenses),
+        func.sum(Transaction.loan_repayment)
+    ).filter(Transaction.report_id == report_id)
+    if start is not None:
+        query = query.filter(Transaction.date >= start)
+    if end is not None:
+        query = query.filter(Transaction.date < end)
+    rows = query.group_by(key).order_by(key).all()
+    names = ["count", "debit", "credit", "revenue", "operating_expenses", "loan_repayment"]
+    return [{group_by: row[0], **{name: (value or 0) for name, value in zip(names, row[1:])}} for row in rows]
+
+def migrate_transaction_blobs(db, batch_reports=20):
+    """
+    One-off: moves rows from the legacy Report.transaction_data column into transactions, one report
+    per commit, and clears the blob. Reports that already have rows are skipped (safe to re-run).
+    Returns (reports migrated, rows inserted).
+    """
+    migrated = rows = 0
+    while True:
+        pending = (db.query(Report.id)
+                   .filter(Report.transaction_data.isnot(None))
+                   .filter(~db.query(Transaction.id).filter(Transaction.report_id == Report.id).exists())
+                   .order_by(Report.id).limit(batch_reports).all())
+        if not pending:
+            break
+        for (report_id,) in pending:
+            report = db.get(Report, report_id)
+            records = report.transaction_data
+            if isinstance(records, str):
+                records = json.loads(records)
+            if records:
+                rows += save_transactions(db, report_id, transaction_columns_from_records(records))
+            report.transaction_data = null() # SQL NULL; None would be stored as the JSON text 'null'
+            db.commit()
+            migrated += 1
+    return migrated, rows
+
+# Report History
+# Newest-first pages of report summaries. Pages are keyset-paginated on (upload_date, id): the cursor
+# is the last row's key, so every page is an index range scan however deep it is (OFFSET would
+# re-read all the skipped rows). Only HISTORY_COLUMNS are selected; insights, metrics JSON and
+# transaction rows are never read.
+HISTORY_COLUMNS = (Report.id, Report.filename, Report.upload_date, Report.score, Report.revenue_growth,
+                   Report.expense_ratio, Report.net_cash_flow, Report.credit_score, Report.tax_status,
+                   Report.forecast_next_month, Report.language)
+
+def encode_history_cursor(upload_date, report_id):
+    import base64
+    key = json.dumps([upload_date.isoformat(), report_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(key).decode("ascii").rstrip("=")
+
+def decode_history_cursor(cursor):
+    """
+    (upload_date, id) from encode_history_cursor. Raises ValueError for anything else.
+    """
+    import base64
+    try:
+        upload_date, report_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(upload_date), int(report_id)
+    except (TypeError, ValueError) as e: # binascii.Error and json errors are ValueErrors
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+def history_query(limit, cursor=None, filename=None, min_score=None, max_score=None, start=None, end=None):
+    """
+    SELECT for one history page (limit + 1 rows, the extra one tells whether there is a next page).
+    start / end bound upload_date (end exclusive).
+    """
+    from sqlalchemy import select, tuple_
+    query = select(*HISTORY_COLUMNS)
+    if cursor is not None:
+        upload_date, report_id = decode_history_cursor(cursor)
+        query = query.where(tuple_(Report.upload_date, Report.id) < tuple_(upload_date, report_id))
+    if filename is not None:
+        query = query.where(Report.filename == filename)
+    if min_score is not None:
+        query = query.where(Report.score >= min_score)
+    if max_score is not None:
+        query = query.where(Report.score <= max_score)
+    if start is not None:
+        query = query.where(Report.upload_date >= start)
+    if end is not None:
+        query = query.where(Report.upload_date < end)
+    return query.order_by(Report.upload_date.desc(), Report.id.desc()).limit(limit + 1)
+
+def history_page(rows, limit):
+    """
+    Rows of history_query -> {"reports": [...], "next_cursor": str or None}.
+    """
+    rows = list(rows)
+    reports = [row._asdict() for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = reports[-1]
+        next_cursor = encode_history_cursor(last["upload_date"], last["id"])
+    for report in reports:
+        report["upload_date"] = report["upload_date"].isoformat() if report["upload_date"] else None
+    return {"reports": reports, "next_cursor": next_cursor}
+
+def list_reports(db, limit=50, cursor=None, **filters):
+    """
+    One history page (see history_query for the filters).
+    """
+    return history_page(db.execute(history_query(limit, cursor, **filters)), limit)
+
 def get_recent_reports(db, limit=5):
-    return db.query(Report).order_by(Report.upload_date.desc()).limit(limit).all()
+    return db.query(Report).order_by(Report.upload_date.desc(), Report.id.desc()).limit(limit).all()
+
+# Async Database Access
+# Endpoints use an AsyncSession (aiosqlite locally, asyncpg on Postgres), so a request waiting on
+# the database holds neither the event loop nor a "db" pool thread. The sync engine / SessionLocal
+# above stay for scripts (force_reset_db.py, migrate_transactions.py, ...) and the sync helpers.
+# Both engines point at the same database; the async one is created on first use.
+# SQLite takes one writer at a time, and writers that find it locked back off by sleeping, so async
+# saves wait for a write slot in the event loop instead (ASYNC_DB_WRITERS).
+#   FINANCIAL_ASYNC_DB_URL - async driver URL (default: the sync URL with sqlite+aiosqlite / postgresql+asyncpg)
+#   ASYNC_DB_WRITERS       - concurrent save_report_async transactions (default 1 on SQLite, 0 = unlimited)
+def async_database_url(url):
+    """
+    The async-driver form of a sync database URL (drivers already given are kept).
+    """
+    scheme, rest = url.split("://", 1)
+    if "+" in scheme and scheme.split("+", 1)[1] in ("aiosqlite", "asyncpg", "psycopg_async"):
+        return url
+    dialect = scheme.split("+", 1)[0]
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    if dialect == "postgresql":
+        return f"postgresql+asyncpg://{rest}"
+    raise ValueError(f"No async driver known for {dialect!r}; set FINANCIAL_ASYNC_DB_URL")
+
+ASYNC_DATABASE_URL = os.getenv("FINANCIAL_ASYNC_DB_URL") or async_database_url(DATABASE_URL)
+ASYNC_DB_WRITERS = int(os.getenv("ASYNC_DB_WRITERS", "1" if ASYNC_DATABASE_URL.startswith("sqlite") else "0"))
+
+_async_engine = None
+_async_sessionmaker = None
+_write_slots = None
+
+def get_async_engine():
+    global _async_engine, _async_sessionmaker, _write_slots
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        args = {key: value for key, value in engine_args.items() if key != "connect_args"}
+        _async_engine = create_async_engine(ASYNC_DATABASE_URL, **args)
+        if SQLITE_PRODUCTION_MODE:
+            from sqlalchemy import event
+            event.listen(_async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+        _async_sessionmaker = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+        _write_slots = asyncio.Semaphore(ASYNC_DB_WRITERS) if ASYNC_DB_WRITERS > 0 else None
+    return _async_engine
+
+def AsyncSessionLocal():
+    """
+    A new AsyncSession (use as `async with AsyncSessionLocal() as db:`).
+    """
+    get_async_engine()
+    return _async_sessionmaker()
+
+async def dispose_async_engine():
+    global _async_engine, _async_sessionmaker, _write_slots
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = _async_sessionmaker = _write_slots = None
+
+def _copy_records(table):
+    # asyncpg COPY takes Python values; JSON columns go in as text
+    extra_position = TRANSACTION_COLUMNS.index('extra')
+    table[extra_position] = [None if value is None else json.dumps(value) for value in table[extra_position]]
+    return list(zip(*table))
+
+async def save_transactions_async(db, report_id, columns, offload=None):
+    """
+    save_transactions for an AsyncSession. Building the parameter rows is CPU work, so it runs
+    through offload(fn, *args) (default asyncio.to_thread), off the event loop. Does not commit.
+    """
+    offload = offload or asyncio.to_thread
+    connection = await db.connection()
+    dialect = connection.dialect
+    table = await offload(_table_columns, report_id, columns)
+    n = columns['row_count']
+    for start in range(0, n, TRANSACTION_INSERT_BATCH):
+        batch = [values[start:start + TRANSACTION_INSERT_BATCH] for values in table]
+        if dialect.driver == "asyncpg":
+            records = await offload(_copy_records, batch)
+            raw = await connection.get_raw_connection()
+            await raw.driver_connection.copy_records_to_table("transactions", records=records, columns=TRANSACTION_COLUMNS)
+        else:
+            rows = await offload(_bound_rows, batch, dialect)
+            await connection.exec_driver_sql(transaction_insert_sql(dialect), rows)
+    return n
+
+async def save_report_async(db, data, filename, transactions=None, offload=None):
+    """
+    save_report for an AsyncSession; row conversion runs through offload (see save_transactions_async),
+    as does reading back the chunks of a streamed upload's TransactionSpool.
+    """
+    offload = offload or asyncio.to_thread
+    db_report = build_report(data, filename)
+    if transactions is None:
+        transactions = await offload(transaction_columns_from_records, data.get('transaction_data') or [])
+    get_async_engine()
+    if _write_slots is not None:
+        await _write_slots.acquire()
+    try:
+        db.add(db_report)
+        await db.flush() # Assigns db_report.id for the transaction rows
+        chunks = iter(transaction_chunks(transactions))
+        while (columns := await offload(next, chunks, None)) is not None:
+            await save_transactions_async(db, db_report.id, columns, offload)
+        await db.commit()
+    except BaseException:
+        await db.rollback() # Release the database write lock before the slot
+        raise
+    finally:
+        if _write_slots is not None:
+            _write_slots.release()
+    print(f"Report saved to DB with ID: {db_report.id}")
+    return db_report
+
+async def touch_report_async(db, report_id):
+    """
+    Marks a report as used now (last_used_at), so it is the latest report again (get_latest_report_id,
+    which /chat answers about); upload_date is left as it was. For uploads answered from the result
+    cache. Returns False if the report is gone.
+    """
+    from sqlalchemy import update
+    get_async_engine()
+    if _write_slots is not None:
+        await _write_slots.acquire()
+    try:
+        result = await db.execute(update(Report).where(Report.id == report_id).values(last_used_at=datetime.utcnow()))
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+    finally:
+        if _write_slots is not None:
+            _write_slots.release()
+    return result.rowcount > 0
+
+async def list_reports_async(db, limit=50, cursor=None, **filters):
+    return history_page(await db.execute(history_query(limit, cursor, **filters)), limit)
+
+async def get_recent_reports_async(db, limit=5):
+    from sqlalchemy import select
+    result = await db.execute(select(Report).order_by(Report.upload_date.desc(), Report.id.desc()).limit(limit))
+    return result.scalars().all()
@@ -1,18 +1,22 @@
 import pandas as pd
 import io
+import sys
 import traceback
 import os
 from engine import analyze_financials
+from file_loader import load_statement
 
+# Single-file debug run. For directories of statements use batch_analyze.py.
 try:
     print("CWD:", os.getcwd())
-    path = 'sample_data.csv'
+    path = sys.argv[1] if len(sys.argv) > 1 else 'sample_data.csv'
     if not os.path.exists(path):
         print(f"File not found at {path}, trying ../sample_data.csv")
         path = '../sample_data.csv'
         
     print(f"Loading sample data from {path}...")
-    df = pd.read_csv(path)
+    with open(path, "rb") as f:
+        df = load_statement(f, path.lower())
     print("Columns:", df.columns.tolist())
     
     print("Running analysis...")
@@ -1,34 +1,35 @@
+import functools
 import pandas as pd
 import numpy as np
 
-from categorization import categorize_transaction_heuristic # Import the new logic
+from categorization import categorize_transactions_batch # Batch categorization logic
+from anomaly_detectors import ANOMALY_FEATURES, ANOMALY_STREAM_FIT_ROWS, get_detector
 
-def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+# Target column -> header keywords, longest first (so 'total sales' wins over 'sales')
+COLUMN_ALIASES = {target: sorted(aliases, key=len, reverse=True) for target, aliases in {
+    'Date': ['date', 'period', 'month', 'year', 'time', 'order date', 'invoice date', 'transaction date', 'purchase date', 'billing date', 'value date'],
+    'Revenue': ['revenue', 'sales', 'gross sales', 'income', 'turnover', 'top line', 'total sales', 'net sales', 'amount', 'total amount'],
+    'Operating Expenses': ['operating expenses', 'expenses', 'opex', 'costs', 'expenditure', 'cogs', 'total expenses', 'manufacturing price'],
+    'Loan Repayment': ['loan', 'repayment', 'emi', 'debt', 'interest', 'liabilities'],
+    'Accounts Receivable': ['receivable', 'ar', 'debtors', 'due from'],
+    'Accounts Payable': ['payable', 'ap', 'creditors', 'due to', 'owed'],
+    # New Raw Bank Columns
+    'Description': ['description', 'narration', 'particulars', 'transaction details', 'details', 'memo'],
+    'Debit': ['debit', 'withdrawal', 'dr', 'paid out', 'money out'],
+    'Credit': ['credit', 'deposit', 'cr', 'money in', 'received']
+}.items()}
+
+@functools.lru_cache(maxsize=256)
+def column_renames(columns: tuple) -> tuple:
     """
-    Smartly rename columns to match expected schema based on keywords.
-    Expected: Date, Revenue, Operating Expenses, Loan Repayment, Accounts Receivable, Accounts Payable
-    Also handles Raw Bank formats: Debit, Credit, Withdrawal, Deposit, Description, Narration
+    The (original, target) renames normalize_columns applies to a header of stripped column names.
+    Depends on the header only, so it is worked out once per distinct header.
     """
-    df.columns = [str(c).strip() for c in df.columns]
-    
-    mappings = {
-        'Date': ['date', 'period', 'month', 'year', 'time', 'order date', 'invoice date', 'transaction date', 'purchase date', 'billing date', 'value date'],
-        'Revenue': ['revenue', 'sales', 'gross sales', 'income', 'turnover', 'top line', 'total sales', 'net sales', 'amount', 'total amount'],
-        'Operating Expenses': ['operating expenses', 'expenses', 'opex', 'costs', 'expenditure', 'cogs', 'total expenses', 'manufacturing price'],
-        'Loan Repayment': ['loan', 'repayment', 'emi', 'debt', 'interest', 'liabilities'],
-        'Accounts Receivable': ['receivable', 'ar', 'debtors', 'due from'],
-        'Accounts Payable': ['payable', 'ap', 'creditors', 'due to', 'owed'],
-        # New Raw Bank Columns
-        'Description': ['description', 'narration', 'particulars', 'transaction details', 'details', 'memo'],
-        'Debit': ['debit', 'withdrawal', 'dr', 'paid out', 'money out'],
-        'Credit': ['credit', 'deposit', 'cr', 'money in', 'received']
-    }
-    
     rename_map = {}
-    lower_cols = {c.lower(): c for c in df.columns}
+    lower_cols = {c.lower(): c for c in columns}
     
-    for target, aliases in mappings.items():
-        if target in df.columns: continue
+    for target, aliases in COLUMN_ALIASES.items():
+        if target in columns: continue
         
         # 1. Exact match check
         if target.lower() in lower_cols:
@@ -36,7 +37,6 @@ def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
             continue 
         
         # 2. Alias match check
-        aliases.sort(key=len, reverse=True)
         for alias in aliases:
             match_found = False
             for col_name_lower, col_name_original in lower_cols.items():
@@ -46,143 +46,264 @@ def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
                          match_found = True
                          break
             if match_found: break
-                
+    return tuple(rename_map.items())
+
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Smartly rename columns to match expected schema based on keywords.
+    Expected: Date, Revenue, Operating Expenses, Loan Repayment, Accounts Receivable, Accounts Payable
+    Also handles Raw Bank formats: Debit, Credit, Withdrawal, Deposit, Description, Narration
+    """
+    df.columns = [str(c).strip() for c in df.columns]
+    rename_map = dict(column_renames(tuple(df.columns)))
     if rename_map:
         df = df.rename(columns=rename_map)
         
     return df
 
-def analyze_financials(df: pd.DataFrame):
-    try:
-        # Phase 1: Intelligent Normalization
-        df = normalize_columns(df)
+def apply_bank_categories(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Splits numeric Debit/Credit columns into Revenue, Operating Expenses and Loan Repayment
+    using one batch categorization call and column-wise masks. Modifies df in place.
+    """
+    categories = pd.Series(
+        categorize_transactions_batch(df['Description'], df['Debit'], df['Credit']),
+        index=df.index
+    )
+    credit_mask = df['Credit'] > 0 # 1. Income (Credit)
+    debit_mask = ~credit_mask & (df['Debit'] > 0) # 2. Expense (Debit)
+    loan_mask = debit_mask & (categories == 'Loan Repayment')
+    opex_mask = debit_mask & ~loan_mask # Default to OpEx
+    
+    df.loc[credit_mask, 'Revenue'] += df.loc[credit_mask, 'Credit']
+    df.loc[loan_mask, 'Loan Repayment'] += df.loc[loan_mask, 'Debit']
+    df.loc[opex_mask, 'Operating Expenses'] += df.loc[opex_mask, 'Debit']
+    return df
+
+CORE_COLUMNS = ['Revenue', 'Operating Expenses', 'Loan Repayment', 'Accounts Receivable', 'Accounts Payable']
+
+# Strings pd.to_datetime skips when picking the element to infer a format from
+_SKIPPED_DATE_STRINGS = {"", "NaT", "nat", "NAT", "nan", "NaN", "NAN", "now", "today"}
+
+def infer_date_format(dates: pd.Series):
+    """
+    Guesses the strftime format the way pd.to_datetime does: from the first non-null string.
+    Returns None if there is nothing to guess from.
+    """
+    from pandas.tseries.api import guess_datetime_format
+    for value in dates:
+        if value is None or (not isinstance(value, str) and pd.isna(value)):
+            continue
+        if isinstance(value, str) and value in _SKIPPED_DATE_STRINGS:
+            continue
+        return guess_datetime_format(value) if isinstance(value, str) else None
+    return None
+
+def parse_amounts(values: pd.Series) -> pd.Series:
+    """
+    Numbers from an amount column, missing as 0. Text columns (amounts with currency symbols,
+    thousands separators, ...) are stripped to digits first; that check is on any non-numeric
+    dtype, since pandas 3 reads text as the str dtype rather than object.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values.fillna(0)
+    values = values.astype(str).str.replace(r'[^\d.-]', '', regex=True)
+    return pd.to_numeric(values, errors='coerce').fillna(0)
+
+def prepare_frame(df: pd.DataFrame, date_format=None):
+    """
+    Phases 1-3 of the analysis on one frame (a whole file or one chunk of it):
+    normalization, bank statement categorization, derivation, validation and type parsing.
+    Returns (frame, None) with Date + core columns + Net Cash Flow, or (None, error message).
+    Rows are kept in file order; sorting happens once, in FinancialAccumulator.finalize.
+    """
+    # Phase 1: Intelligent Normalization
+    df = normalize_columns(df)
+    
+    # Phase 1.5: Raw Bank Statement Enrichment (Zero-Shot Categorization)
+    # If we have 'Description' + ('Debit'/'Credit' OR 'Amount'), parse it.
+    if 'Description' in df.columns and ('Debit' in df.columns or 'Credit' in df.columns):
+        print("Detected Raw Bank Statement. Running AI Categorization...")
         
-        # Phase 1.5: Raw Bank Statement Enrichment (Zero-Shot Categorization)
-        # If we have 'Description' + ('Debit'/'Credit' OR 'Amount'), parse it.
-        if 'Description' in df.columns and ('Debit' in df.columns or 'Credit' in df.columns):
-            print("Detected Raw Bank Statement. Running AI Categorization...")
-            
-            # Ensure numeric
-            if 'Debit' in df.columns:
-                df['Debit'] = pd.to_numeric(df['Debit'], errors='coerce').fillna(0)
-            else:
-                df['Debit'] = 0
-                
-            if 'Credit' in df.columns:
-                df['Credit'] = pd.to_numeric(df['Credit'], errors='coerce').fillna(0)
-            else:
-                df['Credit'] = 0
-                
-            # Logic: If Credit exists > 0 -> Revenue. If Debit exists > 0 -> Expense or Loan
-            # Initialize core columns if missing
-            if 'Revenue' not in df.columns: df['Revenue'] = 0.0
-            if 'Operating Expenses' not in df.columns: df['Operating Expenses'] = 0.0
-            if 'Loan Repayment' not in df.columns: df['Loan Repayment'] = 0.0
-            
-            # Iterate and categorize
-            # Using simple iteration for clarity and control
-            for idx, row in df.iterrows():
-                # 1. Handle Income (Credit)
-                credit_val = row['Credit']
-                if credit_val > 0:
-                    df.at[idx, 'Revenue'] += credit_val
-                    continue # It's income
-                
-                # 2. Handle Expense (Debit)
-                debit_val = row['Debit']
-                if debit_val > 0:
-                    description = str(row['Description'])
-                    category = categorize_transaction_heuristic(description) # Use Hybrid Heuristic
-                    
-                    if category == 'Loan Repayment':
-                         df.at[idx, 'Loan Repayment'] += debit_val
-                    else:
-                         # Default to OpEx
-                         df.at[idx, 'Operating Expenses'] += debit_val
-
-        # Phase 2: Logic Derivation (if standard cols missing)
-        # Fallback: Revenue = Quantity * Unit Price 
-        if 'Revenue' not in df.columns:
-            # Look for quantity and price candidates
-            lower_cols = {c.lower(): c for c in df.columns}
-            qty_col = next((c for c in df.columns if 'quantity' in c.lower() or 'units' in c.lower() or 'qty' in c.lower()), None)
-            price_col = next((c for c in df.columns if 'price' in c.lower() or 'rate' in c.lower() or 'unit cost' in c.lower()), None)
-            
-            if qty_col and price_col:
-                print(f"Deriving Revenue from {qty_col} * {price_col}")
-                # Ensure numeric
-                df[qty_col] = pd.to_numeric(df[qty_col], errors='coerce').fillna(0)
-                df[price_col] = pd.to_numeric(df[price_col], errors='coerce').fillna(0)
-                df['Revenue'] = df[qty_col] * df[price_col]
-
-        # Phase 3: Semantic Validation
-        if 'Date' not in df.columns or 'Revenue' not in df.columns:
-            # Check if it looks like a credit file (contains 'CreditScore' or 'Customer')
-            cols_str = " ".join(df.columns.astype(str))
-            
-            is_credit_file = 'credit' in cols_str.lower() or 'customer' in cols_str.lower()
-            
-            msg = "This dataset appears to be a credit or customer profile file." if is_credit_file else "This dataset does not seem to contain time-series financial data."
+        # Ensure numeric
+        if 'Debit' in df.columns:
+            df['Debit'] = parse_amounts(df['Debit'])
+        else:
+            df['Debit'] = 0
             
-            return {
-                "error": (
-                    f"{msg}\n"
-                    "FinHealth AI’s financial analysis requires time-based revenue or sales data.\n"
-                    "Please upload a dataset containing at least: Date + Revenue (or Sales)."
-                )
-            }
+        if 'Credit' in df.columns:
+            df['Credit'] = parse_amounts(df['Credit'])
+        else:
+            df['Credit'] = 0
             
-        optional_defaults = {
-            'Operating Expenses': 0.0,
-            'Loan Repayment': 0.0,
-            'Accounts Receivable': 0.0,
-            'Accounts Payable': 0.0
-        }
+        # Logic: If Credit exists > 0 -> Revenue. If Debit exists > 0 -> Expense or Loan
+        # Initialize core columns if missing
+        if 'Revenue' not in df.columns: df['Revenue'] = 0.0
+        if 'Operating Expenses' not in df.columns: df['Operating Expenses'] = 0.0
+        if 'Loan Repayment' not in df.columns: df['Loan Repayment'] = 0.0
         
-        for col, default_val in optional_defaults.items():
-            if col not in df.columns:
-                df[col] = default_val
-        
-        # Parsing data types
-        cols_to_parse = ['Revenue', 'Operating Expenses', 'Loan Repayment', 'Accounts Receivable', 'Accounts Payable']
-        for col in cols_to_parse:
-            if df[col].dtype == object:
-                df[col] = df[col].astype(str).str.replace(r'[^\d.-]', '', regex=True)
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-            else:
-                 df[col] = df[col].fillna(0)
+        # Categorize the whole statement in one batch call
+        apply_bank_categories(df)
+
+    # Phase 2: Logic Derivation (if standard cols missing)
+    # Fallback: Revenue = Quantity * Unit Price 
+    if 'Revenue' not in df.columns:
+        # Look for quantity and price candidates
+        qty_col = next((c for c in df.columns if 'quantity' in c.lower() or 'units' in c.lower() or 'qty' in c.lower()), None)
+        price_col = next((c for c in df.columns if 'price' in c.lower() or 'rate' in c.lower() or 'unit cost' in c.lower()), None)
         
-        # Ensure date sorting
-        df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-        df = df.dropna(subset=['Date']) 
-        df = df.sort_values(by='Date')
+        if qty_col and price_col:
+            print(f"Deriving Revenue from {qty_col} * {price_col}")
+            # Ensure numeric
+            df[qty_col] = pd.to_numeric(df[qty_col], errors='coerce').fillna(0)
+            df[price_col] = pd.to_numeric(df[price_col], errors='coerce').fillna(0)
+            df['Revenue'] = df[qty_col] * df[price_col]
+
+    # Phase 3: Semantic Validation
+    if 'Date' not in df.columns or 'Revenue' not in df.columns:
+        # Check if it looks like a credit file (contains 'CreditScore' or 'Customer')
+        cols_str = " ".join(df.columns.astype(str))
         
-        if len(df) == 0:
-             return {"error": "No valid rows with dates found."}
+        is_credit_file = 'credit' in cols_str.lower() or 'customer' in cols_str.lower()
         
-        # calculate derived columns
-        df['Net Cash Flow'] = df['Revenue'] - df['Operating Expenses'] - df['Loan Repayment']
+        msg = "This dataset appears to be a credit or customer profile file." if is_credit_file else "This dataset does not seem to contain time-series financial data."
         
-        # 1. Metrics Computation
-        total_revenue = df['Revenue'].sum()
-        total_expenses = df['Operating Expenses'].sum()
-        total_loan_repayment = df['Loan Repayment'].sum()
+        return None, (
+            f"{msg}\n"
+            "FinHealth AI’s financial analysis requires time-based revenue or sales data.\n"
+            "Please upload a dataset containing at least: Date + Revenue (or Sales)."
+        )
         
+    optional_defaults = {
+        'Operating Expenses': 0.0,
+        'Loan Repayment': 0.0,
+        'Accounts Receivable': 0.0,
+        'Accounts Payable': 0.0
+    }
+    
+    for col, default_val in optional_defaults.items():
+        if col not in df.columns:
+            df[col] = default_val
+    
+    # Parsing data types
+    for col in CORE_COLUMNS:
+        df[col] = parse_amounts(df[col])
+    
+    df['Date'] = pd.to_datetime(df['Date'], errors='coerce', format=date_format)
+    df = df.dropna(subset=['Date']) 
+    
+    # calculate derived columns
+    df['Net Cash Flow'] = df['Revenue'] - df['Operating Expenses'] - df['Loan Repayment']
+    return df[['Date', *CORE_COLUMNS, 'Net Cash Flow']], None
+
+class FinancialAccumulator:
+    """
+    Mergeable running state for the metrics in analyze_financials.
+    Sums, monthly totals, mean/variance (Chan's parallel update), burn rate and the
+    first/last rows by date are combined per chunk; no rows are retained. Anomalies come
+    from the AnomalyStream passed in, which update() feeds every prepared chunk.
+    """
+
+    MONTHLY_COLUMNS = ['Revenue', 'Operating Expenses', 'Net Cash Flow']
+    TAIL_ROWS = 3 # Forecast uses the last 3 periods
+
+    def __init__(self, anomalies=None):
+        self.rows = 0
+        self.sums = dict.fromkeys(CORE_COLUMNS + ['Net Cash Flow'], 0.0)
+        self.ncf_mean = 0.0
+        self.ncf_m2 = 0.0
+        self.negative_ncf_sum = 0.0
+        self.negative_ncf_count = 0
+        self.monthly = None
+        self.edges = None # Rows with the earliest/latest dates seen so far, with arrival order
+        self.anomalies = anomalies
+
+    def update(self, df: pd.DataFrame):
+        """
+        Folds one prepared frame (output of prepare_frame) into the running state.
+        """
+        if len(df) == 0:
+            return self
+        chunk = FinancialAccumulator()
+        chunk.rows = len(df)
+        for col in chunk.sums:
+            chunk.sums[col] = df[col].sum()
+
+        ncf = df['Net Cash Flow']
+        chunk.ncf_mean = ncf.mean()
+        chunk.ncf_m2 = ((ncf - chunk.ncf_mean) ** 2).sum()
+        negative = ncf[ncf < 0]
+        chunk.negative_ncf_sum = negative.sum()
+        chunk.negative_ncf_count = len(negative)
+
+        months = df['Date'].dt.to_period('M').rename('Month') # Formatted as YYYY-MM in finalize
+        chunk.monthly = df[self.MONTHLY_COLUMNS].groupby(months).sum()
+
+        seq = pd.RangeIndex(len(df)) # Arrival order within the chunk; merge shifts it
+        ordered = df[['Date', 'Revenue']].set_axis(seq).sort_values(by='Date', kind='stable')
+        chunk.edges = pd.concat([ordered.head(1), ordered.tail(self.TAIL_ROWS)])
+
+        if self.anomalies is not None:
+            self.anomalies.update(df)
+        return self.merge(chunk)
+
+    def merge(self, other):
+        """
+        Combines another accumulator whose rows come after this one's in file order.
+        """
+        if other.rows == 0:
+            return self
+        offset = self.rows
+
+        total = self.rows + other.rows
+        delta = other.ncf_mean - self.ncf_mean
+        self.ncf_m2 = self.ncf_m2 + other.ncf_m2 + delta ** 2 * self.rows * other.rows / total
+        self.ncf_mean = self.ncf_mean + delta * other.rows / total
+
+        for col in self.sums:
+            self.sums[col] += other.sums[col]
+        self.negative_ncf_sum += other.negative_ncf_sum
+        self.negative_ncf_count += other.negative_ncf_count
+
+        self.monthly = other.monthly if self.monthly is None else self.monthly.add(other.monthly, fill_value=0)
+
+        other_edges = other.edges.set_axis(other.edges.index + offset)
+        edges = other_edges if self.edges is None else pd.concat([self.edges, other_edges])
+        edges = edges[~edges.index.duplicated()].sort_index().sort_values(by='Date', kind='stable')
+        self.edges = pd.concat([edges.head(1), edges.tail(self.TAIL_ROWS)])
+
+        self.rows = total
+        return self
+
+    def finalize(self):
+        """
+        Computes score, metrics, flags and charts exactly as analyze_financials reports them.
+        """
+        if self.rows == 0:
+            return {"error": "No valid rows with dates found."}
+
+        total_revenue = self.sums['Revenue']
+        total_expenses = self.sums['Operating Expenses']
+        total_loan_repayment = self.sums['Loan Repayment']
+
+        # Rows in date order (ties keep file order)
+        edges = self.edges[~self.edges.index.duplicated()].sort_index().sort_values(by='Date', kind='stable')
+
         # Revenue Growth (CAGR or Simple Growth)
-        if len(df) > 1:
-            start_rev = df['Revenue'].iloc[0]
-            end_rev = df['Revenue'].iloc[-1]
+        if self.rows > 1:
+            start_rev = edges['Revenue'].iloc[0]
+            end_rev = edges['Revenue'].iloc[-1]
             rev_growth_pct = ((end_rev - start_rev) / start_rev) * 100 if start_rev != 0 else 0.0
         else:
             rev_growth_pct = 0.0
             
         expense_ratio = total_expenses / total_revenue if total_revenue != 0 else 0.0
-        total_net_cash_flow = df['Net Cash Flow'].sum()
-        avg_ar = df['Accounts Receivable'].mean()
-        avg_ap = df['Accounts Payable'].mean()
+        total_net_cash_flow = self.sums['Net Cash Flow']
+        avg_ar = self.sums['Accounts Receivable'] / self.rows
+        avg_ap = self.sums['Accounts Payable'] / self.rows
         working_capital = avg_ar - avg_ap
         debt_burden_ratio = total_loan_repayment / total_revenue if total_revenue != 0 else 0.0
-        cash_flow_volatility = df['Net Cash Flow'].std()
+        cash_flow_volatility = np.sqrt(self.ncf_m2 / (self.rows - 1)) if self.rows > 1 else 0.0
         if pd.isna(cash_flow_volatility): cash_flow_volatility = 0.0
         
         # 2. Score Calculation (0-100)
@@ -226,19 +347,13 @@ def analyze_financials(df: pd.DataFrame):
         
         # 3. Forecasting (Simple Moving Average for next month)
         # Predict next month revenue based on last 3 months average
-        if len(df) >= 3:
-            forecast_next_month = df['Revenue'].iloc[-3:].mean()
-        elif len(df) > 0:
-            forecast_next_month = df['Revenue'].mean()
-        else:
-            forecast_next_month = 0.0
+        forecast_next_month = edges['Revenue'].iloc[-self.TAIL_ROWS:].mean()
         
         # Advanced Metric Calculations
         net_profit_margin = ((total_revenue - total_expenses) / total_revenue) * 100 if total_revenue != 0 else 0.0
         
         # Burn Rate Calculation (Mean of negative cash flow months)
-        negative_months = df[df['Net Cash Flow'] < 0]
-        burn_rate = abs(negative_months['Net Cash Flow'].mean()) if not negative_months.empty else 0.0
+        burn_rate = abs(self.negative_ncf_sum / self.negative_ncf_count) if self.negative_ncf_count else 0.0
         
         # DSCR (Debt Service Coverage Ratio)
         # NOI approximation: Revenue - Expenses (excluding debt repayment which is usually below line, but here 'Operating Expenses' might vary. 
@@ -258,9 +373,10 @@ def analyze_financials(df: pd.DataFrame):
             "cash_flow_volatility": float(round(cash_flow_volatility, 2))
         }
         
-        df['Month'] = df['Date'].dt.strftime('%Y-%m')
-        monthly_data = df.groupby('Month')[['Revenue', 'Operating Expenses', 'Net Cash Flow']].sum().reset_index().to_dict('records')
-        monthly_data.sort(key=lambda x: x['Month'])
+        # Rounded to paise so chunked and whole-file sums report the same figures
+        monthly = self.monthly.sort_index().round(2)
+        monthly.index = monthly.index.strftime('%Y-%m').rename('Month')
+        monthly_data = monthly.reset_index().to_dict('records')
         
         return {
             "score": score,
@@ -273,44 +389,142 @@ def analyze_financials(df: pd.DataFrame):
             "credit_score": int(credit_score),
             "tax_status": tax_status,
             "forecast_next_month": float(round(forecast_next_month, 2)),
-            "anomalies": detect_anomalies(df)
+            "anomalies": self.anomalies.finalize() if self.anomalies is not None else []
         }
+
+def analyze_financials(df: pd.DataFrame, anomaly_engine=None, industry=None, date_format=None):
+    """
+    anomaly_engine names the anomaly detector (anomaly_detectors.py; None = ANOMALY_ENGINE);
+    industry picks the model of the pretrained engine. date_format (e.g. from schema_inference)
+    parses the Date column instead of a guessed format.
+    """
+    try:
+        prepared, error = prepare_frame(df, date_format=date_format)
+        if error:
+            return {"error": error}
+        anomalies = AnomalyStream(anomaly_engine, industry, fit_rows=None) # One chunk: the whole statement
+        return FinancialAccumulator(anomalies).update(prepared).finalize()
         
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return {"error": f"Analysis failed: {str(e)}"}
+
+def analyze_financials_stream(chunks, anomaly_engine=None, industry=None, date_format=None, on_chunk=None):
+    """
+    Same output as analyze_financials, computed chunk by chunk (e.g. pd.read_csv(..., chunksize=N)).
+    Raw chunks are released after they are folded into the accumulator, so the text of the
+    file is never held in memory at once. Anomalies are flagged chunk by chunk (see AnomalyStream),
+    so they can differ slightly from the whole-file ones. The date format is pinned from the first chunk,
+    matching what pd.to_datetime infers for the whole column, unless date_format is given.
+    on_chunk(chunk), if given, is called with each chunk once it has been analyzed (as the
+    whole-file path leaves the frame it analyzed), e.g. to store its rows.
+    """
+    try:
+        accumulator = FinancialAccumulator(AnomalyStream(anomaly_engine, industry))
+        format_pinned = date_format is not None
+        for chunk in chunks:
+            if not format_pinned:
+                normalized_dates = normalize_columns(chunk.copy(deep=False)).get('Date')
+                if normalized_dates is not None and normalized_dates.notna().any():
+                    date_format = infer_date_format(normalized_dates)
+                    format_pinned = True
+            prepared, error = prepare_frame(chunk, date_format=date_format)
+            if error:
+                return {"error": error}
+            accumulator.update(prepared)
+            if on_chunk is not None:
+                on_chunk(chunk)
+        return accumulator.finalize()
         
     except Exception as e:
         import traceback
         traceback.print_exc()
         return {"error": f"Analysis failed: {str(e)}"}
 
-from sklearn.ensemble import IsolationForest
+ANOMALY_COLUMNS = ['Date', 'Revenue', 'Operating Expenses', 'Net Cash Flow']
+
+def _anomaly_records(anomalies):
+    anomalies = anomalies.copy()
+    anomalies['Date'] = anomalies['Date'].dt.strftime('%Y-%m-%d')
+    return anomalies.to_dict('records')
+
+class AnomalyStream:
+    """
+    detect_anomalies over a statement that arrives in prepared chunks, holding at most about
+    fit_rows rows: chunks wait until fit_rows rows have come in, the engine is set up on them
+    (AnomalyDetector.flagger, e.g. the forest is fitted), and from then on each chunk is flagged
+    as it arrives, in date order. Only flagged rows are kept. fit_rows=None waits for the whole
+    statement, which gives exactly detect_anomalies' result.
+    """
+
+    def __init__(self, engine=None, industry=None, fit_rows=ANOMALY_STREAM_FIT_ROWS):
+        self.detector = get_detector(engine) # Unknown names fail the analysis rather than silently skipping detection
+        self.industry = industry
+        self.fit_rows = fit_rows
+        self.pending = []
+        self.pending_rows = 0
+        self.flag_rows = None
+        self.flagged = []
+        self.failed = False
 
-def detect_anomalies(df):
+    def update(self, df):
+        if self.failed or len(df) == 0:
+            return
+        self.pending.append(df[ANOMALY_COLUMNS])
+        self.pending_rows += len(df)
+        if self.flag_rows is not None or (self.fit_rows is not None and self.pending_rows >= self.fit_rows):
+            self._flush()
+
+    def _flush(self):
+        try:
+            if self.flag_rows is None:
+                sample = pd.concat(self.pending).sort_values(by='Date', kind='stable')
+                self.pending = [sample]
+                if len(sample) < 5: # Too few rows for detection to mean anything
+                    self.failed = True
+                    return
+                self.flag_rows = self.detector.flagger(sample[ANOMALY_FEATURES].fillna(0).to_numpy(dtype=np.float64), self.industry)
+            for part in self.pending:
+                part = part.sort_values(by='Date', kind='stable')
+                flagged = self.flag_rows(part[ANOMALY_FEATURES].fillna(0).to_numpy(dtype=np.float64))
+                self.flagged.append(part[flagged])
+        except Exception as e:
+            print(f"Anomaly detection failed: {e}")
+            self.failed = True
+        finally:
+            self.pending = []
+            self.pending_rows = 0
+
+    def finalize(self):
+        """
+        The flagged rows as detect_anomalies returns them, in date order.
+        """
+        if self.pending and not self.failed:
+            self._flush()
+        if self.failed or not self.flagged:
+            return []
+        return _anomaly_records(pd.concat(self.flagged).sort_values(by='Date', kind='stable'))
+
+def detect_anomalies(df, engine=None, industry=None):
     """
-    Detects anomalies in financial transactions using Isolation Forest.
+    Detects anomalies in financial transactions with the named engine (anomaly_detectors.py;
+    None = ANOMALY_ENGINE, IsolationForest by default). industry selects the pretrained engine's model.
     Focuses on 'Net Cash Flow' and 'Operating Expenses'.
     """
+    detector = get_detector(engine) # Unknown names fail the analysis rather than silently skipping detection
     try:
         # Select numeric columns for anomaly detection
-        # We use a copy to avoid SettingWithCopyWarning on the original df if not needed
-        data = df[['Net Cash Flow', 'Operating Expenses']].fillna(0)
+        data = df[ANOMALY_FEATURES].fillna(0).to_numpy(dtype=np.float64)
         
         # If dataset is too small, anomaly detection might not be meaningful or could error
         if len(data) < 5:
             return []
 
-        # Train model
-        # contamination=0.05 assumes ~5% of data is anomalous
-        model = IsolationForest(contamination=0.05, random_state=42) 
-        df['anomaly'] = model.fit_predict(data)
-        
-        # -1 indicates anomaly
-        anomalies_df = df[df['anomaly'] == -1]
+        flagged = detector.flag(data, industry)
         
         # Convert to list of dicts for JSON serialization
-        anomalies = anomalies_df[['Date', 'Revenue', 'Operating Expenses', 'Net Cash Flow']].copy()
-        anomalies['Date'] = anomalies['Date'].dt.strftime('%Y-%m-%d')
-        
-        return anomalies.to_dict('records')
+        return _anomaly_records(df.loc[flagged, ANOMALY_COLUMNS])
         
     except Exception as e:
         print(f"Anomaly detection failed: {e}")
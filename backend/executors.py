@@ -0,0 +1,119 @@
+import asyncio
+import functools
+import importlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from fastapi import HTTPException
+
+# Worker Pools per Pipeline Stage
+# Blocking work never runs on the event loop; each stage gets its own pool so one slow stage
+# (e.g. PDF rendering) cannot starve another (e.g. /chat's DB read).
+#   ANALYSIS_WORKERS - parsing, normalization, categorization, anomaly detection (pandas/sklearn)
+#   LLM_WORKERS      - blocking Gemini HTTP calls
+#   RENDER_WORKERS   - ReportLab/matplotlib PDF rendering
+#   DB_WORKERS       - synchronous SQLAlchemy sessions
+#   IO_WORKERS       - spooling uploads to disk, encoding large JSON responses
+# {STAGE}_EXECUTOR=process runs a stage on a process pool (only for stages whose work is picklable:
+# analysis via pipeline.analyze_upload, render via generate_pdf_report).
+STAGE_DEFAULTS = {
+    "analysis": 2,
+    "llm": 8,
+    "render": 2,
+    "db": 4,
+    "io": 4,
+}
+
+# Niceness added to process-pool workers (POOL_PROCESS_NICE=0 disables)
+PROCESS_NICE = int(os.getenv("POOL_PROCESS_NICE", "10"))
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+def stage_workers(stage):
+    return int(os.getenv(f"{stage.upper()}_WORKERS", str(STAGE_DEFAULTS[stage])))
+
+def get_executor(stage):
+    with _executors_lock:
+        if stage not in _executors:
+            workers = stage_workers(stage)
+            if os.getenv(f"{stage.upper()}_EXECUTOR", "thread") == "process":
+                # Worker processes run at a lower priority so interactive requests win the CPU
+                _executors[stage] = ProcessPoolExecutor(max_workers=workers, initializer=os.nice, initargs=(PROCESS_NICE,))
+            else:
+                _executors[stage] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{stage}-worker")
+        return _executors[stage]
+
+async def run_in_stage(stage, fn, *args, **kwargs):
+    """
+    Runs a blocking function on the stage's pool and awaits the result.
+    For process pools, fn and its arguments must be picklable.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(stage), functools.partial(fn, *args, **kwargs))
+
+def import_modules(names):
+    """
+    Imports modules in whichever worker runs it, so the first real request doesn't pay for them.
+    """
+    for name in names:
+        importlib.import_module(name)
+    return names
+
+def shutdown_executors():
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=True, cancel_futures=True) # Queued work is dropped, running work finishes
+        _executors.clear()
+
+class AdmissionController:
+    """
+    Bounded admission for expensive requests: at most max_active run at once and at most
+    max_waiting queue behind them. Anything beyond that is rejected immediately with 503
+    (and a Retry-After hint) instead of piling up and stalling every client.
+    """
+
+    def __init__(self, name, max_active, max_waiting, retry_after_s=5):
+        self.name = name
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self.retry_after_s = retry_after_s
+        self._semaphore = None # Created on first use, inside the server's event loop
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    async def __aenter__(self):
+        if self.active + self.waiting >= self.max_active + self.max_waiting:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail=f"Server busy: too many {self.name} requests in progress. Please retry shortly.",
+                headers={"Retry-After": str(self.retry_after_s)}
+            )
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_active)
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        self.admitted += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.active -= 1
+        self._semaphore.release()
+        return False
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_active": self.max_active,
+            "max_waiting": self.max_waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected
+        }
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Local stand-in for the Gemini REST API, for benchmarks and offline runs.
+# Point the backend at it with: GEMINI_BASE_URL=http://127.0.0.1:8765 GEMINI_API_KEY=fake
+# Run standalone: python fake_gemini.py  (FAKE_GEMINI_LATENCY=0.5 simulates model latency in seconds)
+# Streaming calls (:streamGenerateContent) send a chat answer word by word, FAKE_GEMINI_TOKEN_DELAY apart.
+
+FAKE_MODEL = "gemini-2.5-flash"
+LATENCY_S = float(os.getenv("FAKE_GEMINI_LATENCY", "0.2"))
+TOKEN_DELAY_S = float(os.getenv("FAKE_GEMINI_TOKEN_DELAY", "0.05"))
+STREAM_WORDS = 60
+SIMULATE_GENERATION = False # True: non-streamed chat answers also take STREAM_WORDS * TOKEN_DELAY_S, like a real model
+
+app = FastAPI()
+
+# Request counters
+stats = {"list_calls": 0, "generate_calls": 0, "rows_classified": 0, "stream_calls": 0, "streams_completed": 0, "streams_cancelled": 0}
+
+def _prompt_text(body):
+    parts = []
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            parts.append(part.get("text", ""))
+    return "\n".join(parts)
+
+def _classify(description):
+    """
+    Deterministic toy classifier so batch answers are predictable.
+    """
+    d = description.lower()
+    if any(k in d for k in ("loan", "emi", "nach", "ach")):
+        return "Loan Repayment"
+    if any(k in d for k in ("neft cr", "refund", "dep")):
+        return "Revenue"
+    if any(k in d for k in ("atm", "self", "cash")):
+        return "Personal/Other"
+    return "Operating Expenses"
+
+def _answer(prompt):
+    if "Transactions:" in prompt:
+        lines = re.findall(r"^\s*\d+\.\s(.*)$", prompt.split("Transactions:", 1)[1], flags=re.MULTILINE)
+        stats["rows_classified"] += len(lines)
+        return json.dumps([_classify(line) for line in lines])
+    return "This is a simulated answer from the local Gemini stand-in."
+
+def _response(text):
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}],
+        "modelVersion": FAKE_MODEL
+    }
+
+@app.get("/{api_version}/models")
+async def list_models(api_version: str):
+    stats["list_calls"] += 1
+    return {"models": [{"name": f"models/{FAKE_MODEL}", "supportedGenerationMethods": ["generateContent"]}]}
+
+async def _stream(prompt):
+    words = (_answer(prompt) + " ") * (STREAM_WORDS // 10)
+    words = words.split()[:STREAM_WORDS]
+    stats["stream_calls"] += 1
+    try:
+        await asyncio.sleep(LATENCY_S)
+        for i, word in enumerate(words):
+            yield f"data: {json.dumps(_response(word + (' ' if i < len(words) - 1 else '')))}\r\n\r\n"
+            await asyncio.sleep(TOKEN_DELAY_S)
+        stats["streams_completed"] += 1
+    except asyncio.CancelledError:
+        stats["streams_cancelled"] += 1 # The caller hung up mid-answer
+        raise
+
+@app.post("/{api_version}/models/{model_action}")
+async def generate(api_version: str, model_action: str, request: Request):
+    body = await request.json()
+    if model_action.endswith(":streamGenerateContent"):
+        return StreamingResponse(_stream(_prompt_text(body)), media_type="text/event-stream")
+    stats["generate_calls"] += 1
+    prompt = _prompt_text(body)
+    await asyncio.sleep(LATENCY_S)
+    if SIMULATE_GENERATION and "Transactions:" not in prompt:
+        await asyncio.sleep(STREAM_WORDS * TOKEN_DELAY_S)
+    return JSONResponse(content=_response(_answer(prompt)))
+
+def start_in_thread(port=8765):
+    """
+    Starts the fake server on a daemon thread and returns its base URL once it accepts requests.
+    """
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("FAKE_GEMINI_PORT", "8765")))
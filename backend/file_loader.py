@@ -0,0 +1,27 @@
+SUPPORTED_EXTENSIONS = ('.csv', '.xls', '.xlsx', '.pdf')
+
+class UnsupportedFileError(ValueError):
+    """
+    Raised when an upload cannot be turned into a dataframe (unknown extension, unreadable PDF).
+    The message is safe to show to the user.
+    """
+
+def load_statement(source, filename, csv_options=None):
+    """
+    Parses an uploaded statement into a dataframe.
+    source: a path or a binary file object. filename decides the parser.
+    csv_options: extra pd.read_csv arguments for CSVs (schema_inference.StatementSchema.read_options).
+    Returns None if a PDF contains no usable tables.
+    """
+    import pandas as pd
+    if filename.endswith('.csv'):
+        return pd.read_csv(source, **(csv_options or {}))
+    if filename.endswith(('.xls', '.xlsx')):
+        return pd.read_excel(source)
+    if filename.endswith('.pdf'):
+        try:
+            from pdf_ingest import load_pdf
+            return load_pdf(source)
+        except Exception:
+            raise UnsupportedFileError("PDF Error")
+    raise UnsupportedFileError("Invalid Format")
@@ -1,56 +1,308 @@
-
+import asyncio
+import json
 import os
-from google import genai
+import threading
+import time
+from collections import deque
 from dotenv import load_dotenv
 
 load_dotenv()
 
-_CACHED_MODEL_NAME = None
+# Gemini Client Settings
+# One long-lived client per process: its HTTP connections are pooled and kept alive across calls.
+#   GEMINI_BASE_URL          - endpoint override, e.g. a local stand-in server like fake_gemini.py
+#   GEMINI_MODEL             - use this model and skip discovery entirely
+#   GEMINI_MODEL_CACHE_PATH  - file the discovered model name is persisted to, so new workers skip
+#                              models.list() ('' disables)
+#   GEMINI_MODEL_TTL_S       - how long a discovered model name stays valid
+#   GEMINI_MAX_CONNECTIONS   - connection pool size (per process, per sync/async client)
+#   GEMINI_KEEPALIVE_S       - idle connections are closed after this
+#   GEMINI_TIMEOUT_S         - per-request timeout
+GEMINI_MODEL = os.getenv("GEMINI_MODEL")
+GEMINI_MODEL_CACHE_PATH = os.getenv("GEMINI_MODEL_CACHE_PATH", "./gemini_model.json")
+GEMINI_MODEL_TTL_S = float(os.getenv("GEMINI_MODEL_TTL_S", "86400"))
+GEMINI_MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "20"))
+GEMINI_KEEPALIVE_S = float(os.getenv("GEMINI_KEEPALIVE_S", "60"))
+GEMINI_TIMEOUT_S = float(os.getenv("GEMINI_TIMEOUT_S", "60"))
 
-def get_gemini_model_name():
-    global _CACHED_MODEL_NAME
-    if _CACHED_MODEL_NAME:
-        return _CACHED_MODEL_NAME
-    
+DEFAULT_MODEL = "gemini-1.5-flash"
+LATENCY_SAMPLES = 1000
+
+_lock = threading.Lock()
+_client = None # (pid, api_key, base_url, genai.Client)
+_loop = None # (pid, event loop running on a daemon thread)
+_model = None # (name, resolved_at, source)
+
+class _ClientStats:
+    """
+    Per-process counters for the shared client, fed by httpx event hooks.
+    A request that did not open a TCP connection was served on a pooled (reused) one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clients_created = 0
+        self.requests = 0
+        self.errors = 0
+        self.new_connections = 0
+        self.model_list_calls = 0
+        self.streams_started = 0
+        self.streams_completed = 0
+        self.streams_cancelled = 0
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def add(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def record(self, latency_s, status_code):
+        with self._lock:
+            self.requests += 1
+            if status_code >= 400:
+                self.errors += 1
+            self._latencies.append(latency_s)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            reused = max(0, self.requests - self.new_connections)
+            return {
+                "clients_created": self.clients_created,
+                "requests": self.requests,
+                "errors": self.errors,
+                "new_connections": self.new_connections,
+                "reused_connections": reused,
+                "reuse_rate": round(reused / self.requests, 4) if self.requests else 0.0,
+                "latency_ms_p50": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+                "latency_ms_p95": round(latencies[int(len(latencies) * 0.95)] * 1000, 1) if latencies else None,
+                "model_list_calls": self.model_list_calls,
+                "streams_started": self.streams_started,
+                "streams_completed": self.streams_completed,
+                "streams_cancelled": self.streams_cancelled,
+            }
+
+client_stats = _ClientStats()
+
+def _on_trace(event, info):
+    if event == "connection.connect_tcp.complete":
+        client_stats.add("new_connections")
+
+async def _on_trace_async(event, info):
+    _on_trace(event, info)
+
+def _on_request(request):
+    request.extensions["trace"] = _on_trace
+    request.extensions["started_at"] = time.perf_counter()
+
+async def _on_request_async(request):
+    request.extensions["trace"] = _on_trace_async
+    request.extensions["started_at"] = time.perf_counter()
+
+def _on_response(response):
+    started_at = response.request.extensions.get("started_at")
+    if started_at is not None:
+        client_stats.record(time.perf_counter() - started_at, response.status_code)
+
+async def _on_response_async(response):
+    _on_response(response)
+
+def gemini_http_options():
+    """
+    HttpOptions for a genai.Client: pooled, instrumented httpx clients and the optional GEMINI_BASE_URL.
+    """
+    import httpx
+    from google.genai import types
+    limits = httpx.Limits(max_connections=GEMINI_MAX_CONNECTIONS, max_keepalive_connections=GEMINI_MAX_CONNECTIONS,
+                          keepalive_expiry=GEMINI_KEEPALIVE_S)
+    timeout = httpx.Timeout(GEMINI_TIMEOUT_S)
+    return types.HttpOptions(
+        base_url=os.getenv("GEMINI_BASE_URL") or None,
+        httpx_client=httpx.Client(limits=limits, timeout=timeout,
+                                  event_hooks={"request": [_on_request], "response": [_on_response]}),
+        httpx_async_client=httpx.AsyncClient(limits=limits, timeout=timeout,
+                                             event_hooks={"request": [_on_request_async], "response": [_on_response_async]})
+    )
+
+def get_gemini_client():
+    """
+    The process-wide genai.Client, or None without GEMINI_API_KEY. Re-created after a fork
+    (connections can't be shared across processes) or when the key / endpoint changes.
+    """
+    global _client
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
-        return "gemini-1.5-flash" # Default fallback
-    
+        return None
+    base_url = os.getenv("GEMINI_BASE_URL")
+    current = _client
+    if current and current[:3] == (os.getpid(), api_key, base_url):
+        return current[3]
+    with _lock:
+        if _client and _client[:3] == (os.getpid(), api_key, base_url):
+            return _client[3]
+        from google import genai
+        client = genai.Client(api_key=api_key, http_options=gemini_http_options())
+        client_stats.add("clients_created")
+        _client = (os.getpid(), api_key, base_url, client)
+        return client
+
+def _gemini_loop():
+    global _loop
+    with _lock:
+        if _loop is None or _loop[0] != os.getpid():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="gemini-loop", daemon=True).start()
+            _loop = (os.getpid(), loop)
+        return _loop[1]
+
+def run_gemini_coroutine(coro):
+    """
+    Runs a coroutine that uses get_gemini_client().aio on the process's Gemini event loop and waits
+    for it. The async httpx pool is bound to one loop, so every async call goes through this one.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _gemini_loop()).result()
+
+async def stream_gemini_text(model, contents):
+    """
+    Async generator of text chunks from generate_content_stream, usable from any event loop.
+    The upstream request runs on the Gemini loop; closing or cancelling this generator (e.g. the
+    HTTP client went away) cancels it there, which closes the connection to the model.
+    """
+    client = get_gemini_client()
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    client_stats.add("streams_started")
+
+    async def pump():
+        try:
+            async for chunk in await client.aio.models.generate_content_stream(model=model, contents=contents):
+                if chunk.text:
+                    loop.call_soon_threadsafe(queue.put_nowait, ("text", chunk.text))
+            loop.call_soon_threadsafe(queue.put_nowait, ("done", None))
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, ("error", e))
+
+    upstream = asyncio.run_coroutine_threadsafe(pump(), _gemini_loop())
+    finished = False
+    try:
+        while True:
+            kind, value = await queue.get()
+            if kind == "error":
+                raise value
+            if kind == "done":
+                finished = True
+                client_stats.add("streams_completed")
+                return
+            yield value
+    finally:
+        if not finished and not upstream.done():
+            upstream.cancel()
+            client_stats.add("streams_cancelled")
+
+def close_gemini_client():
+    global _client
+    with _lock:
+        current, _client = _client, None
+    if current and current[0] == os.getpid():
+        try:
+            current[3].close()
+        except Exception as e:
+            print(f"Warning: Could not close Gemini client: {e}")
+
+def _read_persisted_model(base_url):
+    if not GEMINI_MODEL_CACHE_PATH:
+        return None
+    try:
+        with open(GEMINI_MODEL_CACHE_PATH) as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if saved.get("base_url") != base_url or time.time() - saved.get("resolved_at", 0) > GEMINI_MODEL_TTL_S:
+        return None
+    return saved.get("model"), saved["resolved_at"]
+
+def _persist_model(name, base_url):
+    if not GEMINI_MODEL_CACHE_PATH:
+        return
+    tmp = f"{GEMINI_MODEL_CACHE_PATH}.{os.getpid()}.tmp"
     try:
-        client = genai.Client(api_key=api_key)
-        # Priority list
-        preferred = ["gemini-2.5-flash", "gemini-2.0-flash-exp", "gemini-1.5-pro", "gemini-pro"]
-        
-        available_models = []
-        # Fetch available models
-        for m in client.models.list():
-            name = m.name.split("/")[-1] # remove 'models/' prefix
-            available_models.append(name)
-            
-        print(f"DEBUG: Available Gemini Models: {available_models}")
-        
-        # Check priority
-        for p in preferred:
-            if p in available_models:
-                print(f"DEBUG: Selected Model: {p}")
-                _CACHED_MODEL_NAME = p
-                return p
-        
-        # If none of preferred found, pick first gemini model
-        for m in available_models:
-            if "gemini" in m and "flash" in m:
-                print(f"DEBUG: Fallback Selected Model: {m}")
-                _CACHED_MODEL_NAME = m
-                return m
-        
-        # Absolute fallback
-        if available_models:
-             fallback = available_models[0]
-             print(f"DEBUG: Absolute Fallback Model: {fallback}")
-             _CACHED_MODEL_NAME = fallback
-             return fallback
-             
+        with open(tmp, "w") as f:
+            json.dump({"model": name, "resolved_at": time.time(), "base_url": base_url}, f)
+        os.replace(tmp, GEMINI_MODEL_CACHE_PATH)
+    except OSError as e:
+        print(f"Warning: Could not persist Gemini model name: {e}")
+
+def _list_and_pick_model(client):
+    # Priority list
+    preferred = ["gemini-2.5-flash", "gemini-2.0-flash-exp", "gemini-1.5-pro", "gemini-pro"]
+
+    available_models = []
+    # Fetch available models
+    client_stats.add("model_list_calls")
+    for m in client.models.list():
+        name = m.name.split("/")[-1] # remove 'models/' prefix
+        available_models.append(name)
+
+    print(f"DEBUG: Available Gemini Models: {available_models}")
+
+    # Check priority
+    for p in preferred:
+        if p in available_models:
+            print(f"DEBUG: Selected Model: {p}")
+            return p
+
+    # If none of preferred found, pick first gemini model
+    for m in available_models:
+        if "gemini" in m and "flash" in m:
+            print(f"DEBUG: Fallback Selected Model: {m}")
+            return m
+
+    # Absolute fallback
+    if available_models:
+        print(f"DEBUG: Absolute Fallback Model: {available_models[0]}")
+        return available_models[0]
+    return None
+
+def get_gemini_model_name():
+    """
+    Model to call: GEMINI_MODEL, else the name discovered via models.list(). Discovery results are
+    kept in memory and in GEMINI_MODEL_CACHE_PATH for GEMINI_MODEL_TTL_S.
+    """
+    global _model
+    if GEMINI_MODEL:
+        return GEMINI_MODEL
+    if _model and time.time() - _model[1] <= GEMINI_MODEL_TTL_S:
+        return _model[0]
+
+    if not os.getenv("GEMINI_API_KEY"):
+        return DEFAULT_MODEL # Default fallback
+
+    base_url = os.getenv("GEMINI_BASE_URL")
+    persisted = _read_persisted_model(base_url)
+    if persisted and persisted[0]:
+        _model = (persisted[0], persisted[1], "persisted")
+        return persisted[0]
+
+    try:
+        name = _list_and_pick_model(get_gemini_client())
+        if name:
+            _model = (name, time.time(), "listed")
+            _persist_model(name, base_url)
+            return name
     except Exception as e:
         print(f"Warning: Could not list models: {e}")
-    
-    return "gemini-1.5-flash" # Ultimate fallback
+
+    return DEFAULT_MODEL # Ultimate fallback
+
+def gemini_stats():
+    stats = client_stats.snapshot()
+    stats["model"] = GEMINI_MODEL or (_model[0] if _model else None)
+    stats["model_source"] = "env" if GEMINI_MODEL else (_model[2] if _model else None)
+    return stats
+
+def reset_gemini_state():
+    """
+    Drops the shared client and in-memory model name (benchmarks, or after changing settings).
+    """
+    global _model
+    close_gemini_client()
+    _model = None
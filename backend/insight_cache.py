@@ -0,0 +1,178 @@
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# LLM Insight Cache
+# The insight prompt only depends on industry, language, score, risk flags and three ratios, so
+# statements with similar numbers get near-identical answers. Opt-in per request (use_insight_cache),
+# because a cached narrative may quote figures from a statement in the same bucket, not this one.
+# Key: industry + language + model + prompt version + score band + flag set + quantized metrics.
+#   INSIGHT_CACHE_PATH   - SQLite file, so entries survive restarts ('' keeps them in memory only)
+#   INSIGHT_CACHE_SIZE   - max entries (memory and disk)
+#   INSIGHT_CACHE_TTL_S  - entries older than this go back to the live model
+#   INSIGHT_SCORE_BAND   - width of a score bucket (points out of 100)
+#   INSIGHT_RATIO_STEP   - bucket width for expense and debt ratios
+# Net cash flow is bucketed by sign and quarter-decade of magnitude (e.g. 1.0-1.8 lakh share a bucket).
+DEFAULT_DB_PATH = os.getenv("INSIGHT_CACHE_PATH", "./insight_cache.db")
+DEFAULT_MAX_ENTRIES = int(os.getenv("INSIGHT_CACHE_SIZE", "1000"))
+DEFAULT_TTL_S = float(os.getenv("INSIGHT_CACHE_TTL_S", str(7 * 24 * 3600)))
+INSIGHT_SCORE_BAND = int(os.getenv("INSIGHT_SCORE_BAND", "5"))
+INSIGHT_RATIO_STEP = float(os.getenv("INSIGHT_RATIO_STEP", "0.05"))
+
+def _bucket_ratio(value):
+    try:
+        return round(float(value) / INSIGHT_RATIO_STEP)
+    except (TypeError, ValueError):
+        return None
+
+def _bucket_amount(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(value):
+        return None
+    if abs(value) < 1:
+        return 0
+    return int(math.copysign(round(math.log10(abs(value)) * 4), value))
+
+def _flag_set(flags):
+    labels = []
+    for flag in flags or []:
+        if isinstance(flag, dict):
+            labels.append(f"{flag.get('type')}:{flag.get('severity')}")
+        else:
+            labels.append(str(flag))
+    return sorted(set(labels))
+
+def insight_cache_key(score, flags, industry, metrics, lang, model, prompt_version):
+    parts = {
+        "industry": industry,
+        "lang": lang,
+        "model": model,
+        "prompt": prompt_version,
+        "score_band": int(score or 0) // INSIGHT_SCORE_BAND,
+        "flags": _flag_set(flags),
+        "expense_ratio": _bucket_ratio(metrics.get('expense_ratio')),
+        "debt_burden_ratio": _bucket_ratio(metrics.get('debt_burden_ratio')),
+        "net_cash_flow": _bucket_amount(metrics.get('net_cash_flow')),
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+class InsightCache:
+    """
+    key -> generated insight text. In-memory LRU in front of an optional SQLite table; both are
+    bounded by entry count and age. Entries remember how long the model took, so hits report the
+    latency they saved.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, max_entries=DEFAULT_MAX_ENTRIES, ttl_s=DEFAULT_TTL_S):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._memory = OrderedDict() # key -> (text, created_at, compute_s)
+        self._lock = threading.Lock()
+        self._conn = None
+
+        # Counters
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.time_saved_s = 0.0
+
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS insight_cache ("
+                "key TEXT PRIMARY KEY, text TEXT NOT NULL, created_at REAL NOT NULL, compute_s REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_insight_cache_created ON insight_cache (created_at)")
+            self._conn.commit()
+
+    def get(self, key):
+        """
+        Cached insight text, or None on a miss / expired entry.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            from_disk = False
+            if entry is None and self._conn is not None:
+                row = self._conn.execute("SELECT text, created_at, compute_s FROM insight_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    entry, from_disk = (row[0], row[1], row[2] or 0.0), True
+            if entry is not None and now - entry[1] > self.ttl_s:
+                self._forget(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            if from_disk:
+                self.disk_hits += 1
+                self._remember(key, entry)
+            else:
+                self._memory.move_to_end(key)
+            self.hits += 1
+            self.time_saved_s += entry[2]
+            return entry[0]
+
+    def put(self, key, text, compute_s):
+        entry = (text, time.time(), compute_s)
+        with self._lock:
+            self._remember(key, entry)
+            if self._conn is not None:
+                self._conn.execute("INSERT OR REPLACE INTO insight_cache (key, text, created_at, compute_s) VALUES (?, ?, ?, ?)",
+                                   (key, *entry))
+                self._conn.execute(
+                    "DELETE FROM insight_cache WHERE created_at < ? OR key NOT IN "
+                    "(SELECT key FROM insight_cache ORDER BY created_at DESC LIMIT ?)",
+                    (entry[1] - self.ttl_s, self.max_entries)
+                )
+                self._conn.commit()
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _forget(self, key):
+        self._memory.pop(key, None)
+        if self._conn is not None:
+            self._conn.execute("DELETE FROM insight_cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM insight_cache")
+                self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            disk_entries = self._conn.execute("SELECT COUNT(*) FROM insight_cache").fetchone()[0] if self._conn else None
+            return {
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "time_saved_s": round(self.time_saved_s, 3)
+            }
+
+# Shared process-wide instance
+insight_cache = InsightCache()
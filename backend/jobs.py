@@ -0,0 +1,278 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+from executors import run_in_stage
+
+# Background Analysis Jobs
+# POST /jobs queues an upload and returns at once; JOB_WORKERS runners pull jobs and run the same
+# pipeline as /upload on the stage pools (so per-stage concurrency is still {STAGE}_WORKERS).
+# The queue lives in SQLite (JOB_DB_PATH) and uploads are kept in JOB_UPLOAD_DIR until the job ends,
+# so queued and interrupted jobs resume after a restart.
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "./jobs.db")
+JOB_UPLOAD_DIR = os.getenv("JOB_UPLOAD_DIR", "./job_uploads")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "100")) # Queued jobs beyond this are rejected with 503
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3")) # A job that keeps dying with the server is failed
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "24")) # Finished jobs (and results) kept this long
+JOB_POLL_INTERVAL_S = 1.0 # Idle runners re-check the queue (other processes may have queued work)
+
+TERMINAL_STATUSES = ("done", "error")
+
+class JobStore:
+    """
+    SQLite-backed job queue. Jobs go queued -> running -> done / error, with per-stage progress.
+    Claiming is a single IMMEDIATE transaction, so several server processes can share one file.
+    """
+
+    def __init__(self, db_path=JOB_DB_PATH, stages=()):
+        self.stages = list(stages)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analysis_jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, stage TEXT, stages TEXT NOT NULL, "
+            "filename TEXT, industry TEXT, language TEXT, upload_path TEXT, attempts INTEGER DEFAULT 0, "
+            "error TEXT, error_status INTEGER, result TEXT, "
+            "created_at REAL, started_at REAL, finished_at REAL, cache_key TEXT, use_insight_cache INTEGER DEFAULT 0, "
+            "anomaly_engine TEXT)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(analysis_jobs)")]
+        if "cache_key" not in columns:
+            self._conn.execute("ALTER TABLE analysis_jobs ADD COLUMN cache_key TEXT") # Queue files from before the result cache
+        if "use_insight_cache" not in columns:
+            self._conn.execute("ALTER TABLE analysis_jobs ADD COLUMN use_insight_cache INTEGER DEFAULT 0")
+        if "anomaly_engine" not in columns:
+            self._conn.execute("ALTER TABLE analysis_jobs ADD COLUMN anomaly_engine TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_analysis_jobs_status ON analysis_jobs (status, created_at)")
+
+    def submit(self, filename, industry, language, upload_path, cache_key=None, use_insight_cache=False, job_id=None,
+               anomaly_engine=None):
+        """
+        Queues a job. cache_key (optional) is where the runner stores the finished result.
+        """
+        job_id = job_id or uuid.uuid4().hex
+        stages = {stage: {"status": "pending"} for stage in self.stages}
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO analysis_jobs (id, status, stages, filename, industry, language, upload_path, cache_key, "
+                "use_insight_cache, anomaly_engine, created_at) VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, json.dumps(stages), filename, industry, language, upload_path, cache_key, int(use_insight_cache),
+                 anomaly_engine, time.time())
+            )
+        return job_id
+
+    def submit_finished(self, filename, industry, language, result_json, job_id=None):
+        """
+        Records a job that is already done (its result came from the result cache).
+        """
+        job_id = job_id or uuid.uuid4().hex
+        now = time.time()
+        stages = {stage: {"status": "done", "cached": True} for stage in self.stages}
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO analysis_jobs (id, status, stages, filename, industry, language, result, created_at, started_at, finished_at) "
+                "VALUES (?, 'done', ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, json.dumps(stages), filename, industry, language, result_json, now, now, now)
+            )
+        return job_id
+
+    def claim_next(self):
+        """
+        Marks the oldest queued job as running and returns it, or None if the queue is empty.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT * FROM analysis_jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE analysis_jobs SET status = 'running', attempts = attempts + 1, started_at = ? WHERE id = ?",
+                        (time.time(), row["id"])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return None if row is None else self._to_dict(row)
+
+    def set_stage(self, job_id, stage):
+        """
+        Marks stage as running and every earlier stage as done.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT stages FROM analysis_jobs WHERE id = ?", (job_id,)).fetchone()
+            stages = json.loads(row["stages"])
+            for name, info in stages.items():
+                if name == stage:
+                    info.update(status="running", started_at=now)
+                    break
+                if info["status"] != "done":
+                    info.update(status="done", finished_at=now)
+            self._conn.execute(
+                "UPDATE analysis_jobs SET stage = ?, stages = ? WHERE id = ?", (stage, json.dumps(stages), job_id)
+            )
+
+    def finish(self, job_id, result_json):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT stages FROM analysis_jobs WHERE id = ?", (job_id,)).fetchone()
+            stages = json.loads(row["stages"])
+            for info in stages.values():
+                if info["status"] != "done":
+                    info.update(status="done", finished_at=now)
+            self._conn.execute(
+                "UPDATE analysis_jobs SET status = 'done', stage = NULL, stages = ?, result = ?, finished_at = ? WHERE id = ?",
+                (json.dumps(stages), result_json, now, job_id)
+            )
+
+    def fail(self, job_id, error, error_status=500):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT stage, stages FROM analysis_jobs WHERE id = ?", (job_id,)).fetchone()
+            stages = json.loads(row["stages"])
+            if row["stage"] in stages:
+                stages[row["stage"]].update(status="error", finished_at=now)
+            self._conn.execute(
+                "UPDATE analysis_jobs SET status = 'error', stages = ?, error = ?, error_status = ?, finished_at = ? WHERE id = ?",
+                (json.dumps(stages), error, error_status, now, job_id)
+            )
+
+    def get(self, job_id):
+        """
+        Job status without the result payload, or None.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM analysis_jobs WHERE id = ?", (job_id,)).fetchone()
+        return None if row is None else self._to_dict(row)
+
+    def get_result(self, job_id):
+        """
+        The stored result as a JSON string (None until the job is done).
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM analysis_jobs WHERE id = ?", (job_id,)).fetchone()
+        return None if row is None else row["result"]
+
+    def recover(self, max_attempts=JOB_MAX_ATTEMPTS):
+        """
+        Startup: jobs left 'running' by a previous process are queued again (or failed after
+        max_attempts). Returns the number requeued.
+        Assumes the servers sharing JOB_DB_PATH restart together (the usual single-instance deploy).
+        """
+        pending = json.dumps({stage: {"status": "pending"} for stage in self.stages})
+        with self._lock:
+            self._conn.execute(
+                "UPDATE analysis_jobs SET status = 'error', error = 'Job interrupted too many times', error_status = 500, "
+                "finished_at = ? WHERE status = 'running' AND attempts >= ?", (time.time(), max_attempts)
+            )
+            return self._conn.execute(
+                "UPDATE analysis_jobs SET status = 'queued', stage = NULL, stages = ? WHERE status = 'running'", (pending,)
+            ).rowcount
+
+    def purge(self, older_than_s=JOB_RETENTION_HOURS * 3600):
+        """
+        Deletes finished jobs older than the retention window. Returns their leftover upload paths.
+        """
+        cutoff = time.time() - older_than_s
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT upload_path FROM analysis_jobs WHERE status IN ('done', 'error') AND finished_at < ?", (cutoff,)
+            ).fetchall()
+            self._conn.execute("DELETE FROM analysis_jobs WHERE status IN ('done', 'error') AND finished_at < ?", (cutoff,))
+        return [row["upload_path"] for row in rows if row["upload_path"]]
+
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM analysis_jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def _to_dict(self, row):
+        job = {key: row[key] for key in row.keys() if key != "result"}
+        job["stages"] = json.loads(job["stages"])
+        return job
+
+class JobRunner:
+    """
+    Runs JOB_WORKERS asyncio tasks inside the server's event loop. Each claims a job and awaits
+    pipeline(job, on_stage), which does the real work on the stage pools and returns the result
+    as a JSON string. pipeline signals a user-facing failure by raising an exception with
+    .status_code and .detail (HTTPException); anything else is recorded as a 500.
+    """
+
+    def __init__(self, store, pipeline, workers=JOB_WORKERS):
+        self.store = store
+        self.pipeline = pipeline
+        self.workers = workers
+        self._tasks = []
+        self._wakeup = None
+        self.completed = 0
+        self.failed = 0
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        requeued = self.store.recover()
+        for path in self.store.purge():
+            if os.path.exists(path):
+                os.remove(path)
+        if requeued:
+            print(f"Job queue: resumed {requeued} interrupted job(s)")
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """
+        Wakes an idle runner after a submit.
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _work(self):
+        while True:
+            job = await run_in_stage("db", self.store.claim_next)
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_INTERVAL_S)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+            await self._run(job)
+
+    async def _run(self, job):
+        async def on_stage(stage):
+            await run_in_stage("db", self.store.set_stage, job["id"], stage)
+
+        try:
+            result_json = await self.pipeline(job, on_stage)
+            await run_in_stage("db", self.store.finish, job["id"], result_json)
+            self.completed += 1
+        except asyncio.CancelledError:
+            raise # Server shutting down: the job stays 'running' and is resumed on the next start
+        except Exception as e:
+            if not hasattr(e, "status_code"):
+                traceback.print_exc()
+            status = getattr(e, "status_code", 500)
+            detail = getattr(e, "detail", None) or f"Server error: {e}"
+            await run_in_stage("db", self.store.fail, job["id"], str(detail), status)
+            self.failed += 1
+        if job["upload_path"] and os.path.exists(job["upload_path"]):
+            os.remove(job["upload_path"])
+
+    def stats(self):
+        return {"workers": self.workers, "completed": self.completed, "failed": self.failed, "jobs": self.store.counts()}
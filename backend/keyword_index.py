@@ -0,0 +1,56 @@
+import re
+from rapidfuzz import utils as rf_utils
+
+class KeywordIndex:
+    """
+    Precompiled matcher over the CATEGORIES keyword table.
+    Resolves descriptions that score a perfect 100 with fuzz.partial_ratio without any fuzzy scoring:
+    - a keyword occurs inside the description (one regex scan over the description), or
+    - the description occurs inside a keyword (hash lookup of every keyword substring).
+    The fuzzy loop picks the first category reaching the best score, so on a hit the answer
+    is the lowest-ordered category with any perfect match. Anything else is a miss.
+    """
+
+    def __init__(self, categories):
+        self.category_names = list(categories.keys())
+        keyword_rank = {}
+        self._substring_rank = {}
+
+        for rank, category in enumerate(self.category_names):
+            for keyword in categories[category]:
+                keyword = rf_utils.default_process(keyword)
+                if not keyword:
+                    continue
+                keyword_rank.setdefault(keyword, rank)
+                for start in range(len(keyword)):
+                    for end in range(start + 1, len(keyword) + 1):
+                        self._substring_rank.setdefault(keyword[start:end], rank)
+
+        # Alternatives in category order: at each position the regex reports the lowest-ranked keyword starting there
+        ordered = sorted(keyword_rank, key=lambda k: keyword_rank[k])
+        self._keyword_rank = keyword_rank
+        self._pattern = re.compile("(?=(" + "|".join(re.escape(k) for k in ordered) + "))")
+        self._max_keyword_len = max((len(k) for k in keyword_rank), default=0)
+
+    def match(self, description):
+        """
+        Returns the category for a normalized description, or None if it needs fuzzy scoring.
+        """
+        if not description:
+            return None
+
+        best_rank = None
+        if len(description) < self._max_keyword_len:
+            best_rank = self._substring_rank.get(description)
+
+        for m in self._pattern.finditer(description):
+            rank = self._keyword_rank[m.group(1)]
+            if best_rank is None or rank < best_rank:
+                best_rank = rank
+            if best_rank == 0:
+                break
+
+        return None if best_rank is None else self.category_names[best_rank]
+
+    def match_many(self, descriptions):
+        return [self.match(d) for d in descriptions]
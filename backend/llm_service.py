@@ -1,5 +1,5 @@
 import os
-import openai
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -7,12 +7,18 @@ load_dotenv()
 # Check for API key
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if OPENAI_API_KEY:
+    import openai # Only worth its import time when it is actually configured
     openai.api_key = OPENAI_API_KEY
 
-def generate_llm_insight(score, flags, industry, metrics, lang="en"):
+# Bump when the insight prompt changes, so cached insights from the old prompt are not served
+INSIGHT_PROMPT_VERSION = "1"
+
+def generate_llm_insight(score, flags, industry, metrics, lang="en", use_cache=False):
     """
     Calls OpenAI to generate a sophisticated financial insight.
     Falls back to mock if no key or error.
+    use_cache: answer from the insight cache when a statement with similar numbers was seen
+    (see insight_cache.py); misses call the live model and store its answer.
     """
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
     if not GEMINI_API_KEY:
@@ -20,8 +26,8 @@ def generate_llm_insight(score, flags, industry, metrics, lang="en"):
         return None 
         
     try:
-        from google import genai
-        client = genai.Client(api_key=GEMINI_API_KEY)
+        from gemini_utils import get_gemini_client
+        client = get_gemini_client()
 
         prompt = f"""
         You are an expert financial consultant for a {industry} SME. 
@@ -48,12 +54,22 @@ def generate_llm_insight(score, flags, industry, metrics, lang="en"):
         from gemini_utils import get_gemini_model_name
         model_name = get_gemini_model_name()
 
+        if use_cache:
+            from insight_cache import insight_cache, insight_cache_key
+            cache_key = insight_cache_key(score, flags, industry, metrics, lang, model_name, INSIGHT_PROMPT_VERSION)
+            cached = insight_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        start = time.perf_counter()
         response = client.models.generate_content(
             model=model_name,
             contents=prompt
         )
-        
-        return response.text.strip()
+        insight = response.text.strip()
+        if use_cache and insight:
+            insight_cache.put(cache_key, insight, time.perf_counter() - start)
+        return insight
         
     except Exception as e:
         print(f"Gemini Call Failed: {e}")
@@ -1,16 +1,33 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Depends
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, Response
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
 from sqlalchemy.orm import Session
-import pandas as pd
-import io
-from engine import analyze_financials
+from sqlalchemy.ext.asyncio import AsyncSession
+from file_loader import UnsupportedFileError
 import os
+import sys
+import asyncio
+import functools
+import hashlib
+import tempfile
+import time
 import traceback
-from database import SessionLocal, init_db, save_report
-from report_generator import generate_pdf_report
+from database import SessionLocal, AsyncSessionLocal, init_db, save_report_async, touch_report_async, dispose_async_engine, list_reports_async, get_latest_report_id, get_report_summary, get_transactions, transaction_totals, TRANSACTION_COLUMNS
 from llm_service import generate_llm_insight
+from executors import run_in_stage, AdmissionController, shutdown_executors, import_modules
+from result_cache import result_cache, result_cache_key
+from insight_cache import insight_cache
+from chat_context import chat_context_cache
+from report_store import report_store, new_report_id
+from snapshot_store import snapshot_store
+from anomaly_detectors import PretrainedDetector, resolve_engine as resolve_anomaly_engine
+from anomaly_models import model_registry
+from schema_inference import schema_cache
+from report_writer import report_writer
+from jobs import JobStore, JobRunner, JOB_DB_PATH, JOB_UPLOAD_DIR, JOB_QUEUE_LIMIT, TERMINAL_STATUSES
 # New Imports
 import json
 
@@ -27,6 +44,10 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -36,8 +57,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Store report buffers in memory
-report_cache = {}
+# Reports being rendered right now (report_id -> Future), so concurrent first downloads render once
+_rendering = {}
 
 # SINGLE USER SESSION CACHE FOR RAG CHAT
 active_df = None 
@@ -45,210 +66,551 @@ active_df = None
 class ChatRequest(BaseModel):
     message: str
 
-# ... (Upload Endpoint remains mostly the same, but updates active_df)
+# Admission control for /upload: UPLOAD_MAX_ACTIVE run at once, UPLOAD_MAX_WAITING queue, the rest get 503
+upload_admission = AdmissionController(
+    "upload",
+    max_active=int(os.getenv("UPLOAD_MAX_ACTIVE", "2")),
+    max_waiting=int(os.getenv("UPLOAD_MAX_WAITING", "8"))
+)
 
-@app.post("/upload")
-async def upload_file(
-    file: UploadFile = File(...), 
-    language: str = Form("en"),
-    industry: str = Form("Retail"),
-    db: Session = Depends(get_db)
-):
-    global active_df
-    # ... (File parsing logic remains the same)
-    # ... (Dataframe loading logic remains the same)
-    
-    # ... (File parsing logic) ...
+# --- Blocking pipeline stages (run on executors.py pools, never on the event loop) ---
+
+def _spool_upload(fileobj, filename, directory=None):
+    """
+    Copies the upload to a named temp file so the analysis stage (possibly another process) can open it by path.
+    Returns (path, sha256 of the bytes) - the digest keys the result cache.
+    """
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1], dir=directory) as tmp:
+        while True:
+            block = fileobj.read(1024 * 1024)
+            if not block:
+                break
+            digest.update(block)
+            tmp.write(block)
+        return tmp.name, digest.hexdigest()
+
+def _anomaly_engine(name):
+    """
+    Canonical anomaly engine name for a request (None = the ANOMALY_ENGINE default); 400 for unknown names.
+    """
     try:
-        # Use file.file directly...
-        df = None
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(file.file)
-        elif file.filename.endswith(('.xls', '.xlsx')):
-            df = pd.read_excel(file.file)
-        elif file.filename.endswith('.pdf'):
-            # ... (PDF logic) ...
-            try:
-                import pdfplumber
-                with pdfplumber.open(file.file) as pdf:
-                    all_text = ""
-                    data = []
-                    for page in pdf.pages:
-                        tables = page.extract_tables()
-                        for table in tables:
-                            for row in table:
-                                if row and len(row) >= 2:
-                                    data.append(row)
-                if data:
-                    df = pd.DataFrame(data[1:], columns=data[0])
-            except Exception:
-                raise HTTPException(status_code=400, detail="PDF Error")
+        return resolve_anomaly_engine(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _result_cache_key(digest, filename, industry, language, anomaly_engine, use_insight_cache):
+    """
+    result_cache_key for an upload. For the pretrained engine it includes the version of the model that
+    will score it (loading the model, so off the event loop): after a retrain, re-uploads are analyzed again.
+    """
+    model_version = ""
+    if anomaly_engine == PretrainedDetector.name:
+        model_version = await run_in_stage("io", model_registry.version_tag, industry)
+    return result_cache_key(digest, filename, industry, language, anomaly_engine, model_version, use_insight_cache)
+
+async def _cached_response(cache_key, filename):
+    """
+    The cached /upload body for cache_key (an upload of filename), or None. The cached report becomes the latest one again (so
+    /chat answers about it, as after a fresh upload); a report deleted from the database counts as a miss.
+    Re-registers the report under filename if it has left the report store.
+    """
+    cached = result_cache.get(cache_key)
+    if cached is None:
+        return None
+    body, report_id, report_db_id = cached
+    if report_db_id is not None:
+        async with AsyncSessionLocal() as db:
+            if not await touch_report_async(db, report_db_id):
+                return None
+        chat_context_cache.invalidate()
+    if report_id and not report_store.has(report_id):
+        result = await run_in_stage("io", json.loads, body)
+        await run_in_stage("io", report_store.put_source, report_id, result, filename)
+    return body
+
+def _build_insights(result, industry, language, use_insight_cache=False):
+    """
+    3. AI Insights: real LLM if configured, otherwise the rule-based narrative. Mutates result.
+    """
+    score = result['score']
+    flags = result['flags']
+    metrics = result['metrics']
+    
+    # Try Real LLM
+    real_insight_en = generate_llm_insight(score, flags, industry, metrics, "en", use_cache=use_insight_cache)
+    
+    if real_insight_en:
+        result['ai_insights'] = real_insight_en
+        result['ai_insights_en'] = real_insight_en
+        result['ai_insights_hi'] = "Hindi translation pending real API support." 
+    else:
+        # Fallback
+        narrative_data = generate_narrative(score, flags, metrics, "en")
+        if isinstance(narrative_data, dict) and "summary" in narrative_data:
+            full_text = f"EXECUTIVE SUMMARY\n{narrative_data['summary']}\n\nSTRATEGIC DIAGNOSIS\n{narrative_data['diagnosis']}\n\nRECOMMENDATIONS\n"
+            for i, rec in enumerate(narrative_data['recommendations'], 1):
+                full_text += f"{i}. {rec}\n"
+            result['ai_insights'] = full_text
         else:
-             raise HTTPException(status_code=400, detail="Invalid Format")
+             result['ai_insights'] = str(narrative_data)
 
-        # SAVE TO DISK FOR CHAT PERSISTENCE
-        if df is not None:
-             save_path = os.path.abspath("latest_upload.csv")
-             df.to_csv(save_path, index=False)
-             print(f"DEBUG: Successfully saved dataframe to {save_path}")
-             print(f"DEBUG: File exists check: {os.path.exists(save_path)}")
+        narrative_hi = generate_narrative(score, flags, metrics, "hi")
+        result['ai_insights_hi'] = narrative_hi.get('full_text', '')
+        result['ai_insights_en'] = result['ai_insights']
 
+    if language == 'hi':
+        result['ai_insights'] = result['ai_insights_hi']
+    return result
 
-        # 2. Analysis
-        result = analyze_financials(df)
-        
-        # --- RAG PREPARATION ---
-        # Update the global dataframe for chat
-        from engine import normalize_columns
-        active_df = normalize_columns(df.copy())
-        # Ensure we have numeric types for calculation
-        cols_to_parse = ['Revenue', 'Operating Expenses', 'Loan Repayment', 'Accounts Receivable', 'Accounts Payable']
-        for col in cols_to_parse:
-            if col in active_df.columns:
-                 active_df[col] = pd.to_numeric(active_df[col], errors='coerce').fillna(0)
-        print("Initialized Chat Context in Memory")
-        # -----------------------
+# Progress stages reported by the job API, in pipeline order
+PIPELINE_STAGES = ["parse", "insights", "report", "save"]
 
+async def run_analysis_pipeline(upload_path, filename, industry, language, db, on_stage=None, use_insight_cache=False,
+                                anomaly_engine=None):
+    """
+    Parse -> analyze -> insights -> PDF -> DB for an upload spooled to upload_path.
+    Shared by /upload and the job runner; on_stage(name) is awaited as each stage starts.
+    db is an AsyncSession (the save goes through report_writer instead in SQLite production mode).
+    use_insight_cache lets the insights stage answer from the LLM insight cache.
+    anomaly_engine names the anomaly detector (anomaly_detectors.py; None = ANOMALY_ENGINE).
+    Raises HTTPException(400) for unreadable or unusable statements.
+    """
+    global active_df
+    from pipeline import analyze_upload, TransactionSpool # pandas / scikit-learn load on the first upload, not at startup
+
+    async def enter(stage):
+        if on_stage is not None:
+            await on_stage(stage)
+
+    # 1-2. Parse + Analysis (CPU bound); the upload's snapshot is keyed by its report id
+    await enter("parse")
+    report_id = new_report_id()
+    try:
+        chat_df, result, records, transactions = await run_in_stage(
+            "analysis", analyze_upload, upload_path, filename, os.path.abspath(snapshot_store.path_for(report_id)), anomaly_engine,
+            industry
+        )
+    except UnsupportedFileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
         if "error" in result:
              raise HTTPException(status_code=400, detail=result["error"])
 
-        # ... (Rest of Analysis logic) ...
-
+        # --- RAG PREPARATION ---
+        # Update the global dataframe for chat
+        if chat_df is not None:
+            active_df = chat_df
+            print("Initialized Chat Context in Memory")
 
-        # ... (Rest of Analysis/mock logic remains same)
-        # 3. AI Insights
-        score = result['score']
-        flags = result['flags']
-        metrics = result['metrics']
+        # 3. AI Insights (blocking HTTP)
+        await enter("insights")
+        await run_in_stage("llm", _build_insights, result, industry, language, use_insight_cache)
         
-        # Try Real LLM
-        real_insight_en = generate_llm_insight(score, flags, industry, metrics, "en")
+        # 4. Register the PDF Report (rendered lazily on first download)
+        await enter("report")
+        await run_in_stage("io", report_store.put_source, report_id, result, filename)
+        await run_in_stage("io", snapshot_store.collect_garbage, (report_id,))
+        result['report_id'] = report_id
         
-        if real_insight_en:
-            result['ai_insights'] = real_insight_en
-            result['ai_insights_en'] = real_insight_en
-            result['ai_insights_hi'] = "Hindi translation pending real API support." 
+        # 5. Save to DB with Transaction Data
+        await enter("save")
+        result['industry'] = industry # Stored with the report; groups training data for anomaly_models.py
+        if records is not None:
+             result['transaction_data'] = records
+    
+        offload = functools.partial(run_in_stage, "db")
+        if report_writer is not None: # SQLite production mode: grouped writes on the writer thread
+            saved = await report_writer.save_async(result, filename, transactions, offload)
         else:
-            # Fallback
-            narrative_data = generate_narrative(score, flags, metrics, "en")
-            if isinstance(narrative_data, dict) and "summary" in narrative_data:
-                full_text = f"EXECUTIVE SUMMARY\n{narrative_data['summary']}\n\nSTRATEGIC DIAGNOSIS\n{narrative_data['diagnosis']}\n\nRECOMMENDATIONS\n"
-                for i, rec in enumerate(narrative_data['recommendations'], 1):
-                    full_text += f"{i}. {rec}\n"
-                result['ai_insights'] = full_text
-            else:
-                 result['ai_insights'] = str(narrative_data)
+            saved = await save_report_async(db, result, filename, transactions, offload)
+    finally:
+        if isinstance(transactions, TransactionSpool): # Streamed upload: its rows were spilled to disk
+            transactions.discard()
+    result['report_db_id'] = saved.id # Key for /reports/{id}/transactions
+    chat_context_cache.invalidate()
+    return result
 
-            narrative_hi = generate_narrative(score, flags, metrics, "hi")
-            result['ai_insights_hi'] = narrative_hi.get('full_text', '')
-            result['ai_insights_en'] = result['ai_insights']
+@app.post("/upload")
+async def upload_file(
+    file: UploadFile = File(...), 
+    language: str = Form("en"),
+    industry: str = Form("Retail"),
+    use_cache: bool = Form(True),
+    use_insight_cache: bool = Form(False),
+    anomaly_engine: Optional[str] = Form(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    use_cache=false forces a fresh analysis (the fresh result still replaces the cached one).
+    The X-Result-Cache response header says hit / miss / bypass.
+    use_insight_cache=true lets the AI insight come from a statement with similar numbers (insight_cache.py).
+    anomaly_engine picks the anomaly detector (isolation_forest / robust_zscore / pretrained; default ANOMALY_ENGINE).
+    """
+    anomaly_engine = _anomaly_engine(anomaly_engine)
+    async with upload_admission:
+        try:
+            upload_path, digest = await run_in_stage("io", _spool_upload, file.file, file.filename)
+            cache_key = await _result_cache_key(digest, file.filename, industry, language, anomaly_engine, use_insight_cache)
+            if use_cache:
+                body = await _cached_response(cache_key, file.filename)
+                if body is not None:
+                    os.remove(upload_path)
+                    return Response(content=body, media_type="application/json", headers={"X-Result-Cache": "hit"})
+            else:
+                result_cache.record_bypass()
 
-        if language == 'hi':
-            result['ai_insights'] = result['ai_insights_hi']
-            
-        # 4. Generate PDF Report
-        pdf_bytes = generate_pdf_report(result)
-        report_id = f"{file.filename}_{score}" 
-        if len(report_cache) > 50: report_cache.clear() 
-        report_cache[report_id] = pdf_bytes
-        result['report_id'] = report_id
-            
-        # 5. Save to DB with Transaction Data
-        if df is not None:
-             # handle NaNs for JSON (Postgres doesn't like NaN)
-             # Fix: Convert ALL Timestamp columns to string for JSON serialization
-             df_json = df.copy()
-             for col in df_json.columns:
-                 if pd.api.types.is_datetime64_any_dtype(df_json[col]):
-                     df_json[col] = df_json[col].astype(str)
-                 
-             result['transaction_data'] = df_json.where(pd.notnull(df_json), None).to_dict(orient='records')
-        
-        save_report(db, result, file.filename)
+            start = time.perf_counter()
+            try:
+                result = await run_analysis_pipeline(upload_path, file.filename, industry, language, db,
+                                                     use_insight_cache=use_insight_cache, anomaly_engine=anomaly_engine)
+            finally:
+                os.remove(upload_path)
+                
+            # Encoding the response (transaction rows included) is too big a job for the event loop
+            response = await run_in_stage("io", JSONResponse, content=result)
+            result_cache.put(cache_key, response.body, time.perf_counter() - start, result.get('report_id'), result.get('report_db_id'))
+            response.headers["X-Result-Cache"] = "miss" if use_cache else "bypass"
+            return response
             
-        return JSONResponse(content=result)
-        
-    except HTTPException:
-        raise
+        except HTTPException:
+            raise
+        except Exception as e:
+            traceback.print_exc()
+            raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
+
+# --- Background job variant of /upload (see jobs.py) ---
+
+job_store = JobStore(JOB_DB_PATH, PIPELINE_STAGES)
+
+async def _run_job(job, on_stage):
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        result = await run_analysis_pipeline(job["upload_path"], job["filename"], job["industry"], job["language"], db, on_stage,
+                                             bool(job["use_insight_cache"]), job["anomaly_engine"])
+    result_json = await run_in_stage("io", json.dumps, result, ensure_ascii=False, allow_nan=False)
+    if job["cache_key"]:
+        result_cache.put(job["cache_key"], result_json.encode("utf-8"), time.perf_counter() - start, result.get('report_id'),
+                         result.get('report_db_id'))
+    return result_json
+
+job_runner = JobRunner(job_store, _run_job)
+
+def _job_status(job_id):
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job.pop("upload_path", None)
+    job["result_url"] = f"/jobs/{job_id}/result" if job["status"] == "done" else None
+    return job
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    file: UploadFile = File(...), 
+    language: str = Form("en"),
+    industry: str = Form("Retail"),
+    use_cache: bool = Form(True),
+    use_insight_cache: bool = Form(False),
+    anomaly_engine: Optional[str] = Form(None)
+):
+    """
+    Queues an analysis and returns immediately. Poll GET /jobs/{id} (or stream /jobs/{id}/events),
+    then fetch GET /jobs/{id}/result. A result-cache hit creates the job already finished.
+    """
+    anomaly_engine = _anomaly_engine(anomaly_engine)
+    queued = (await run_in_stage("db", job_store.counts)).get("queued", 0)
+    if queued >= JOB_QUEUE_LIMIT:
+        raise HTTPException(status_code=503, detail="Job queue is full. Please retry shortly.", headers={"Retry-After": "30"})
+    upload_path, digest = await run_in_stage("io", _spool_upload, file.file, file.filename, JOB_UPLOAD_DIR)
+    cache_key = await _result_cache_key(digest, file.filename, industry, language, anomaly_engine, use_insight_cache)
+    if use_cache:
+        body = await _cached_response(cache_key, file.filename)
+        if body is not None:
+            os.remove(upload_path)
+            job_id = await run_in_stage("db", job_store.submit_finished, file.filename, industry, language, body.decode("utf-8"))
+            return {"job_id": job_id, "status": "done", "status_url": f"/jobs/{job_id}", "result_url": f"/jobs/{job_id}/result"}
+    else:
+        result_cache.record_bypass()
+    job_id = await run_in_stage("db", job_store.submit, file.filename, industry, language, upload_path, cache_key, use_insight_cache,
+                                anomaly_engine=anomaly_engine)
+    job_runner.notify()
+    return {"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}", "events_url": f"/jobs/{job_id}/events"}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    return await run_in_stage("db", _job_status, job_id)
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    job = await run_in_stage("db", _job_status, job_id)
+    if job["status"] == "error":
+        raise HTTPException(status_code=job["error_status"] or 500, detail=job["error"])
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}", headers={"Retry-After": "2"})
+    result_json = await run_in_stage("db", job_store.get_result, job_id)
+    return Response(content=result_json, media_type="application/json")
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Server-Sent Events: one 'data:' line with the job status whenever it changes, until it finishes.
+    """
+    job = await run_in_stage("db", _job_status, job_id)
+
+    async def events():
+        last = None
+        current = job
+        while True:
+            payload = json.dumps(current)
+            if payload != last:
+                yield f"data: {payload}\n\n"
+                last = payload
+            if current["status"] in TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(0.5)
+            current = await run_in_stage("db", _job_status, job_id)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+# Background Warm-up
+# Heavy libraries load lazily on first use. With STARTUP_WARMUP=1 (default) they are imported on the
+# stage pools right after startup, while the server is already accepting requests.
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1") == "1"
+WARMUP_MODULES = {
+    "analysis": ["pipeline", "sklearn.ensemble", "pdf_ingest", "pdfplumber"],
+    "render": ["report_generator", "matplotlib.figure", "matplotlib.backends.backend_agg"],
+    "llm": ["google.genai"],
+}
+_warmup_task = None
+
+async def _warm_up():
+    start = time.perf_counter()
+    for stage, modules in WARMUP_MODULES.items():
+        try:
+            await run_in_stage(stage, import_modules, modules)
+        except Exception as e:
+            print(f"Warm-up of {stage} stage failed: {e}")
+    print(f"Warm-up finished in {time.perf_counter() - start:.2f}s")
+
+@app.on_event("startup")
+async def _start_background_work():
+    global _warmup_task
+    job_runner.start()
+    if STARTUP_WARMUP:
+        _warmup_task = asyncio.create_task(_warm_up())
+
+async def _render_report(report_id, source):
+    """
+    Renders a report's PDF once, even if several downloads ask for it at the same time.
+    """
+    from report_generator import generate_pdf_report
+    pending = _rendering.get(report_id)
+    if pending is not None:
+        try:
+            return await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            if not pending.cancelled() or asyncio.current_task().cancelling():
+                raise # This download was cancelled itself
+            # The download rendering it went away (disconnect / shutdown) before it finished: render here
+            return await _render_report(report_id, source)
+    future = asyncio.get_running_loop().create_future()
+    _rendering[report_id] = future
+    try:
+        pdf_bytes = await run_in_stage("render", generate_pdf_report, source)
+        await run_in_stage("io", report_store.put_pdf, report_id, pdf_bytes)
+        future.set_result(pdf_bytes)
+        return pdf_bytes
     except Exception as e:
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
+        future.set_exception(e)
+        future.exception() # Mark retrieved; waiters (if any) still get it
+        raise
+    finally:
+        if not future.done(): # Cancelled: wake the waiters so they can render it themselves
+            future.cancel()
+        del _rendering[report_id]
 
 @app.get("/report/{report_id}")
 async def get_report(report_id: str):
-    if report_id in report_cache:
-        return Response(content=report_cache[report_id], media_type="application/pdf", headers={"Content-Disposition": f"attachment; filename=report_{report_id}.pdf"})
-    return HTTPException(status_code=404, detail="Report not found")
+    pdf_bytes = await run_in_stage("io", report_store.get_pdf, report_id)
+    source = await run_in_stage("io", report_store.get_source, report_id)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    if pdf_bytes is None:
+        pdf_bytes = await _render_report(report_id, source)
+    download_name = os.path.splitext(source.get('filename') or report_id)[0]
+    return Response(content=pdf_bytes, media_type="application/pdf", headers={"Content-Disposition": f"attachment; filename=report_{download_name}.pdf"})
+
+# Report history (database.history_query)
+MAX_HISTORY_PAGE = 500
+
+@app.get("/reports")
+async def list_report_history(limit: int = 50, cursor: Optional[str] = None, filename: Optional[str] = None,
+                              min_score: Optional[float] = None, max_score: Optional[float] = None,
+                              start: Optional[datetime] = None, end: Optional[datetime] = None,
+                              db: AsyncSession = Depends(get_async_db)):
+    """
+    Saved report summaries, newest first. Pass next_cursor back as cursor for the following page
+    (with the same filters); start / end bound the upload date (end exclusive).
+    """
+    limit = max(1, min(limit, MAX_HISTORY_PAGE))
+    try:
+        return await list_reports_async(db, limit, cursor, filename=filename, min_score=min_score, max_score=max_score,
+                                        start=start, end=end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Transaction queries (rows live in the transactions table, see database.Transaction)
+MAX_TRANSACTIONS_PAGE = 5000
+
+def _transaction_dict(row):
+    item = {column: getattr(row, column) for column in TRANSACTION_COLUMNS}
+    item['date'] = row.date.isoformat() if row.date else None
+    return item
+
+@app.get("/reports/{report_id}/transactions")
+async def list_transactions(report_id: int, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                            category: Optional[str] = None, limit: int = 500, offset: int = 0,
+                            db: Session = Depends(get_db)):
+    """
+    Rows of a saved report (report_db_id from /upload) in file order; start / end bound the date (end exclusive).
+    """
+    limit = max(1, min(limit, MAX_TRANSACTIONS_PAGE))
+    rows = await run_in_stage("db", get_transactions, db, report_id, start, end, category, limit, max(0, offset))
+    return {"report_id": report_id, "offset": offset, "transactions": [_transaction_dict(row) for row in rows]}
+
+@app.get("/reports/{report_id}/transactions/summary")
+async def summarize_transactions(report_id: int, group_by: str = "category", start: Optional[datetime] = None,
+                                 end: Optional[datetime] = None, db: Session = Depends(get_db)):
+    """
+    Count and sums of a report's rows per category or per month, aggregated in the database.
+    """
+    if group_by not in ("category", "month"):
+        raise HTTPException(status_code=400, detail="group_by must be 'category' or 'month'")
+    groups = await run_in_stage("db", transaction_totals, db, report_id, group_by, start, end)
+    return {"report_id": report_id, "group_by": group_by, "groups": groups}
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Cache and pipeline counters for monitoring.
+    """
+    from categorization_cache import category_cache, llm_category_cache
+    from categorization import last_llm_batch_stats
+    return {
+        "categorization_cache": category_cache.stats(),
+        "llm_categorization_cache": llm_category_cache.stats(),
+        "llm_categorization_last_batch": last_llm_batch_stats,
+        "upload_admission": upload_admission.stats(),
+        "result_cache": result_cache.stats(),
+        "insight_cache": insight_cache.stats(),
+        "chat_context_cache": chat_context_cache.stats(),
+        "report_store": report_store.stats(),
+        "snapshots": await run_in_stage("io", snapshot_store.stats),
+        "sqlite_writer": report_writer.stats() if report_writer is not None else None,
+        "anomaly_models": model_registry.stats(),
+        "schemas": schema_cache.stats(),
+        "gemini": sys.modules["gemini_utils"].gemini_stats() if "gemini_utils" in sys.modules else None,
+        "jobs": await run_in_stage("db", job_runner.stats)
+    }
+
+@app.on_event("shutdown")
+async def _shutdown_workers():
+    await job_runner.stop()
+    if report_writer is not None:
+        await run_in_stage("db", report_writer.stop)
+    await dispose_async_engine()
+    shutdown_executors()
+    if "pdf_ingest" in sys.modules:
+        sys.modules["pdf_ingest"].shutdown_pool()
+    if "gemini_utils" in sys.modules:
+        sys.modules["gemini_utils"].close_gemini_client()
+
+# Chat Streaming
+# Clients that send `Accept: text/event-stream` to /chat get the answer as Server-Sent Events while
+# the model writes it: 'data: {"delta": "..."}' per chunk, then 'event: done' with the full answer
+# ('event: error' with a fallback answer if the model call fails). Other clients get the original
+# single JSON {"answer": ...}. CHAT_STREAMING=0 turns streaming off for everyone.
+CHAT_STREAMING = os.getenv("CHAT_STREAMING", "1") == "1"
+
+def _sse(data, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _chat_reply(answer, stream):
+    """
+    A fixed answer (no model call) in whichever format the client asked for.
+    """
+    if not stream:
+        return JSONResponse(content={"answer": answer})
+    async def events():
+        yield _sse({"delta": answer})
+        yield _sse({"answer": answer}, "done")
+    return StreamingResponse(events(), media_type="text/event-stream")
 
 @app.post("/chat")
-async def chat_with_data(request: ChatRequest, db: Session = Depends(get_db)):
+async def chat_with_data(request: ChatRequest, http_request: Request, db: Session = Depends(get_db)):
     """
     Financial Copilot Endpoint
     Role: Explainer & Advisor (No raw data calculation)
+    Streams the answer when the client accepts text/event-stream (see CHAT_STREAMING).
     """
-    from database import Report
-    from gemini_utils import get_gemini_model_name
-    from google import genai
+    from gemini_utils import get_gemini_client, get_gemini_model_name, stream_gemini_text
+    stream = CHAT_STREAMING and "text/event-stream" in http_request.headers.get("accept", "")
     
-    # 1. Fetch Latest Context from DB
-    last_report = db.query(Report).order_by(Report.upload_date.desc()).first()
+    # 1. Fetch Latest Context (on the db pool, so a busy upload can't delay it). Only the report id
+    # is queried per question; the summary columns and the prompt built from them are cached per report.
+    def load_context():
+        report_id = get_latest_report_id(db)
+        if report_id is None:
+            return None
+        return chat_context_cache.get_or_build(report_id, lambda rid: get_report_summary(db, rid))
+
+    context = await run_in_stage("db", load_context)
     
-    if not last_report:
-        return JSONResponse(content={"answer": "I don't have any financial analysis yet. Please upload a Bank Statement on the dashboard first!"})
-
-    # 2. Build Knowledge Base (Context)
-    # This is the "computed financial summary" the user requested
-    context_summary = {
-        "Health Score": f"{last_report.score}/100",
-        "Revenue Growth": f"{last_report.revenue_growth}%",
-        "Expense Ratio": f"{last_report.expense_ratio}",
-        "Net Cash Flow": f"{last_report.net_cash_flow}",
-        "Identified Risks": last_report.risk_flags, # List of strings
-        "Tax Status": last_report.tax_status,
-        "Credit Score Est": last_report.credit_score,
-        "AI Insights": last_report.ai_insights
-    }
+    if not context:
+        return _chat_reply("I don't have any financial analysis yet. Please upload a Bank Statement on the dashboard first!", stream)
 
-    print(f"DEBUG: Chat Context Loaded: {context_summary}")
+    # 2. Build Knowledge Base (Context): see chat_context.py
+    print(f"DEBUG: Chat Context Loaded: {context.summary}")
     
     # 3. Setup GenAI Client
     api_key = os.getenv("GEMINI_API_KEY") # Prioritize Gemini as per recent setup
     if not api_key:
-        return JSONResponse(content={"answer": "Offline Mode: API Key missing."})
+        return _chat_reply("Offline Mode: API Key missing.", stream)
+
+    def fallback_answer(e):
+        # MOCK FALLBACK for Demo Resilience
+        return f"I can see your Financial Score is {context.score}/100. (API Connection Issue: {str(e)})"
 
     try:
-        client = genai.Client(api_key=api_key)
-        model_name = get_gemini_model_name()
-        
-        # 4. Construct System Prompt (The "Brain")
-        system_prompt = f"""
-        You are a **Financial Analysis Assistant** for SMEs.
-        Your role is to explain the user's financial health based ONLY on the provided summary.
-        
-        ### 📊 Financial Context (ALREADY COMPUTED):
-        {context_summary}
-        
-        ### 👑 Guidelines:
-        1. **Explain, Don't Calculate**: The numbers are already there. Explain WHAT they mean.
-        2. **Be Insightful**: If the score is low, explain why (look at risks). If high, congratulate them.
-        3. **Simple Business Language**: Avoid jargon. Speak to a business owner.
-        4. **Safety & Compliance**: 
-           - Do NOT give legal, tax, or investment advice.
-           - Always imply these are "indicative insights".
-        5. **Scope**: Answer questions about the score, cash flow, risks, and improvements.
+        client = get_gemini_client()
+        model_name = await run_in_stage("llm", get_gemini_model_name)
         
-        ### 🚫 Restrictions:
-        - Do not analyze raw CSV rows (you don't have them).
-        - Do not output Python code.
-        - Do not make up numbers not in the context.
-        
-        User Question: "{request.message}"
-        
-        Answer (Short, Professional, Helpful):
-        """
+        # 4. Construct System Prompt (The "Brain"): cached prefix + the question
+        system_prompt = context.prompt(request.message)
+
+        if stream:
+            # 5a. Stream the Answer. If the client disconnects, Starlette cancels this generator
+            # and stream_gemini_text cancels the upstream request with it.
+            async def events():
+                parts = []
+                try:
+                    async for text in stream_gemini_text(model_name, system_prompt):
+                        parts.append(text)
+                        yield _sse({"delta": text})
+                    yield _sse({"answer": "".join(parts).strip()}, "done")
+                except Exception as e:
+                    print(f"Chat Consultant Error: {e}")
+                    yield _sse({"detail": str(e), "answer": fallback_answer(e)}, "error")
+            return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
         
         # 5. Generate Answer (Text Only)
-        response = client.models.generate_content(
+        response = await run_in_stage(
+            "llm",
+            client.models.generate_content,
             model=model_name, 
             contents=system_prompt
         )
@@ -258,8 +620,7 @@ async def chat_with_data(request: ChatRequest, db: Session = Depends(get_db)):
         
     except Exception as e:
         print(f"Chat Consultant Error: {e}")
-        # MOCK FALLBACK for Demo Resilience
-        return JSONResponse(content={"answer": f"I can see your Financial Score is {last_report.score}/100. (API Connection Issue: {str(e)})"})
+        return _chat_reply(fallback_answer(e), stream)
 
 def generate_narrative(score, flags, metrics, lang):
     if lang == 'hi':
@@ -0,0 +1,17 @@
+from database import SessionLocal, init_db, migrate_transaction_blobs
+
+# One-off migration: moves rows stored in the legacy reports.transaction_data JSON column into the
+# transactions table and clears the column. Safe to re-run; already migrated reports are skipped.
+# Usage: python migrate_transactions.py
+
+if __name__ == "__main__":
+    init_db() # Creates the transactions table if it doesn't exist yet
+    db = SessionLocal()
+    try:
+        reports, rows = migrate_transaction_blobs(db)
+        print(f"✅ Migrated {rows} rows from {reports} reports into the transactions table.")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ ERROR: {e}")
+    finally:
+        db.close()
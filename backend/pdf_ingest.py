@@ -0,0 +1,149 @@
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+# PDF Statement Ingestion
+# Page ranges are extracted on a process pool (pdfplumber is pure Python, so threads would not help)
+# and rows are streamed back in page order into dataframe blocks; no process ever holds every page.
+# Header rows repeated at the top of each page are recognised and dropped.
+#   PDF_WORKERS          - extraction processes (default: CPU count)
+#   PDF_PAGES_PER_TASK   - pages per pool task
+#   PDF_PARALLEL_MIN_PAGES - shorter PDFs are extracted in-process (pool overhead isn't worth it)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16"))
+PDF_BLOCK_ROWS = 5000 # Rows per dataframe block handed to the builder
+
+_pool = None
+
+def _new_pool():
+    methods = multiprocessing.get_all_start_methods()
+    ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    return ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=ctx)
+
+def _get_pool():
+    """
+    The server process keeps one pool for its lifetime. Inside a worker process (ANALYSIS_EXECUTOR=process)
+    a pool is made per PDF instead: a worker exits without running atexit hooks and would hang joining it.
+    """
+    global _pool
+    if multiprocessing.parent_process() is not None:
+        return _new_pool()
+    if _pool is None:
+        _pool = _new_pool()
+    return _pool
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+def _page_rows(page):
+    rows = []
+    for table in page.extract_tables():
+        for row in table:
+            if row and len(row) >= 2:
+                rows.append(row)
+    return rows
+
+def extract_page_range(path, start, end):
+    """
+    Worker: table rows of pages [start, end), in order. Each page's parsed objects are released
+    as soon as it is done, so memory stays at one page plus its rows.
+    """
+    import pdfplumber
+    rows = []
+    with pdfplumber.open(path, pages=list(range(start + 1, end + 1))) as pdf:
+        for page in pdf.pages:
+            rows.extend(_page_rows(page))
+            page.close()
+    return rows
+
+def count_pages(path):
+    import pdfplumber
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+def _use_pool(n_pages):
+    # Pool workers (batch_analyze, ANALYSIS_EXECUTOR=process) are daemonic and cannot start their own pool
+    return (PDF_WORKERS > 1 and n_pages >= PDF_PARALLEL_MIN_PAGES
+            and not multiprocessing.current_process().daemon)
+
+def iter_pdf_rows(path):
+    """
+    Yields raw table rows (lists of cell strings) page by page, in document order.
+    """
+    n_pages = count_pages(path)
+    ranges = [(start, min(start + PDF_PAGES_PER_TASK, n_pages)) for start in range(0, n_pages, PDF_PAGES_PER_TASK)]
+    if not _use_pool(n_pages):
+        for start, end in ranges:
+            yield from extract_page_range(path, start, end)
+        return
+
+    pool = _get_pool()
+    # Keep at most two tasks per worker in flight: results arrive in order and are consumed as they come
+    window = PDF_WORKERS * 2
+    futures = [pool.submit(extract_page_range, path, start, end) for start, end in ranges[:window]]
+    next_range = len(futures)
+    try:
+        while futures:
+            rows = futures.pop(0).result()
+            if next_range < len(ranges):
+                futures.append(pool.submit(extract_page_range, path, *ranges[next_range]))
+                next_range += 1
+            yield from rows
+    finally:
+        for future in futures:
+            future.cancel()
+        if pool is not _pool:
+            pool.shutdown(wait=True)
+
+def _header_key(row):
+    return tuple(re.sub(r"\s+", " ", str(cell or "")).strip().lower() for cell in row)
+
+def iter_pdf_frames(path, block_rows=PDF_BLOCK_ROWS):
+    """
+    Yields dataframes of up to block_rows data rows. The first row is the header; later rows
+    identical to it (up to case/whitespace) are page-header repeats and are dropped.
+    """
+    header = None
+    header_key = None
+    block = []
+    yielded = False
+    for row in iter_pdf_rows(path):
+        if header is None:
+            header = row
+            header_key = _header_key(row)
+            continue
+        if _header_key(row) == header_key:
+            continue
+        block.append(row)
+        if len(block) >= block_rows:
+            yield pd.DataFrame(block, columns=header)
+            yielded = True
+            block = []
+    if header is not None and (block or not yielded):
+        yield pd.DataFrame(block, columns=header)
+
+def load_pdf(source):
+    """
+    Parses a PDF statement (path or binary file object) into one dataframe.
+    Returns None if it contains no usable tables.
+    """
+    if not isinstance(source, (str, os.PathLike)):
+        # Workers open the file by path
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+            shutil.copyfileobj(source, tmp)
+            tmp.flush()
+            return load_pdf(tmp.name)
+
+    frames = list(iter_pdf_frames(os.fspath(source)))
+    if not frames:
+        return None
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
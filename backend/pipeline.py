@@ -0,0 +1,204 @@
+import os
+import pickle
+import tempfile
+import numpy as np
+import pandas as pd
+from engine import analyze_financials, analyze_financials_stream, normalize_columns, infer_date_format, parse_amounts
+from file_loader import load_statement
+from schema_inference import schema_cache, SCHEMA_CHECK_ROWS
+from snapshot_format import SnapshotWriter, write_snapshot
+
+# CPU-bound part of the /upload pipeline: parse -> snapshot -> analyze.
+# Kept free of FastAPI/app state so it can run on a process pool (ANALYSIS_EXECUTOR=process):
+# everything in and out is a path, a filename, a dataframe or a plain dict.
+
+# Streaming Settings
+# CSV uploads above STREAM_CSV_ABOVE_MB are analyzed in CSV_CHUNK_ROWS chunks instead of being loaded whole
+STREAM_CSV_ABOVE_BYTES = int(float(os.getenv("STREAM_CSV_ABOVE_MB", "50")) * 1024 * 1024)
+CSV_CHUNK_ROWS = int(os.getenv("CSV_CHUNK_ROWS", "100000"))
+
+# Columns the chat context needs as numbers
+CHAT_NUMERIC_COLUMNS = ['Revenue', 'Operating Expenses', 'Loan Repayment', 'Accounts Receivable', 'Accounts Payable']
+
+# Statement columns with their own field in the transactions table (database.TRANSACTION_FIELDS)
+TRANSACTION_NUMERIC_COLUMNS = ['Debit', 'Credit'] + CHAT_NUMERIC_COLUMNS
+
+def stream_csv_chunks(source, csv_options=None, date_format=None):
+    """
+    Yields the chat_frame of each CSV chunk (read with csv_options): columns normalized, amounts
+    and dates parsed once, here, so analyze_financials_stream's prepare_frame finds them done.
+    Without a date_format, it is pinned from the first chunk, as analyze_financials_stream does.
+    """
+    for i, chunk in enumerate(pd.read_csv(source, chunksize=CSV_CHUNK_ROWS, **(csv_options or {}))):
+        frame = chat_frame(chunk, date_format)
+        if i == 0 and 'Date' in frame.columns:
+            date_format = frame.attrs.get('date_format')
+        yield frame
+
+def _append_snapshot(writer, frame):
+    if writer.aborted:
+        return
+    try:
+        writer.append(frame)
+    except Exception as e: # Keep analyzing; the upload just won't have a snapshot
+        print(f"Snapshot failed: {e}")
+        writer.abort()
+
+def transaction_records(df):
+    """
+    Rows as JSON-ready dicts: NaN -> None (Postgres doesn't like NaN), Timestamps -> str.
+    """
+    df_json = df.copy()
+    for col in df_json.columns:
+        if pd.api.types.is_datetime64_any_dtype(df_json[col]):
+            df_json[col] = df_json[col].astype(str)
+    df_json = df_json.astype(object) # Float columns would turn None back into NaN
+    return df_json.where(pd.notnull(df_json), None).to_dict(orient='records')
+
+def _python_values(series):
+    return series.astype(object).where(series.notna(), None).tolist()
+
+def transaction_columns(df, first_row=0):
+    """
+    The analyzed upload column-wise for database.save_transactions: statement column -> list of
+    Python values (NaN -> None, dates as datetime), the row category, other columns as per-row
+    'extra' dicts, 'row_count' and 'first_row' (the row_index of the first row, for chunks).
+    Vectorized here so the db stage only has to insert.
+    """
+    columns = {'row_count': len(df), 'first_row': first_row}
+    if 'Date' in df.columns:
+        dates = df['Date'] if pd.api.types.is_datetime64_any_dtype(df['Date']) else pd.to_datetime(df['Date'], errors='coerce')
+        columns['Date'] = [None if d is pd.NaT else d for d in dates.dt.to_pydatetime()] # datetime, not pd.Timestamp
+    if 'Description' in df.columns:
+        columns['Description'] = _python_values(df['Description'].where(df['Description'].isna(), df['Description'].astype(str)))
+    numbers = {}
+    for col in TRANSACTION_NUMERIC_COLUMNS:
+        if col in df.columns:
+            numbers[col] = pd.to_numeric(df[col], errors='coerce')
+            columns[col] = _python_values(numbers[col])
+
+    zero = pd.Series(0.0, index=df.index)
+    conditions = [numbers.get(col, zero).fillna(0) != 0 for col in ('Revenue', 'Loan Repayment', 'Operating Expenses')]
+    columns['category'] = np.select(conditions, ['Revenue', 'Loan Repayment', 'Operating Expenses'], default=None).tolist()
+
+    known = {'Date', 'Description', *TRANSACTION_NUMERIC_COLUMNS}
+    extra_columns = [c for c in df.columns if c not in known]
+    columns['extra'] = transaction_records(df[extra_columns]) if extra_columns else None
+    return columns
+
+class TransactionSpool:
+    """
+    The transaction rows of a streamed upload, written to a temporary file one chunk at a time
+    (transaction_columns per chunk, numbered on from the previous one) instead of being kept in
+    memory. Iterating reads the chunks back in order, one at a time (database.transaction_chunks).
+    Picklable, so it can come back from a process pool; discard() deletes the file.
+    """
+
+    def __init__(self):
+        fd, self.path = tempfile.mkstemp(prefix="upload-rows-", suffix=".pkl")
+        os.close(fd)
+        self.row_count = 0
+
+    def append(self, df):
+        columns = transaction_columns(df, first_row=self.row_count)
+        with open(self.path, "ab") as f:
+            pickle.dump(columns, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.row_count += columns['row_count']
+
+    def __iter__(self):
+        with open(self.path, "rb") as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+
+    def discard(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+def chat_frame(df, date_format=None):
+    """
+    Normalized copy of the upload with numeric core columns and parsed dates, used as the in-memory
+    chat context and stored as the upload snapshot. Unparseable dates become NaT (rows are kept).
+    The date format used is left in attrs['date_format'].
+    """
+    chat_df = normalize_columns(df.copy())
+    for col in CHAT_NUMERIC_COLUMNS:
+        if col in chat_df.columns:
+             chat_df[col] = parse_amounts(chat_df[col])
+    if 'Date' in chat_df.columns and not pd.api.types.is_datetime64_any_dtype(chat_df['Date']):
+        date_format = date_format or infer_date_format(chat_df['Date'])
+        chat_df['Date'] = pd.to_datetime(chat_df['Date'], errors='coerce', format=date_format)
+        chat_df.attrs['date_format'] = date_format
+    return chat_df
+
+def _save_snapshot(df, snapshot_path):
+    # Best effort, like the CSV it replaces: a failed snapshot must not fail the upload
+    try:
+        write_snapshot(df, snapshot_path)
+    except Exception as e:
+        print(f"Snapshot failed: {e}")
+
+def analyze_upload(path, filename, snapshot_path, anomaly_engine=None, industry=None):
+    """
+    Parses the statement at path (streaming large CSVs), saves its chat_frame as a snapshot
+    directory at snapshot_path (snapshot_format.py) and runs the analysis.
+    Returns (chat_df, result, records, transactions): records are the rows as JSON-ready dicts (the
+    /upload response), transactions the same rows for the transactions table (transaction_columns).
+    chat_df and records are None for streamed uploads (they would need the whole file); their
+    transactions are a TransactionSpool, which the caller discards once it is saved.
+    anomaly_engine names the anomaly detector (anomaly_detectors.py; None = ANOMALY_ENGINE) and
+    industry the pretrained engine's model.
+    CSVs are read with the options of their header's schema (schema_inference.py).
+    Raises UnsupportedFileError for unreadable files.
+    """
+    schema = schema_cache.schema_for_csv(path) if filename.endswith('.csv') else None
+    if filename.endswith('.csv') and os.path.getsize(path) > STREAM_CSV_ABOVE_BYTES:
+        # Large file: chunked parse + incremental metrics, the whole file is never in memory
+        print(f"Streaming CSV analysis in chunks of {CSV_CHUNK_ROWS} rows")
+        if schema is not None:
+            schema = schema_cache.confirm(schema, pd.read_csv(path, nrows=SCHEMA_CHECK_ROWS, **schema.read_options()), path)
+        csv_options = schema.read_options() if schema is not None else None
+        date_format = schema.date_format if schema is not None else None
+        writer = SnapshotWriter(snapshot_path, widen_ints=True)
+        spool = TransactionSpool()
+
+        def store_chunk(frame): # The chunk's chat_frame as the analysis left it, like the whole-file snapshot
+            _append_snapshot(writer, frame)
+            spool.append(frame)
+
+        try:
+            chunks = stream_csv_chunks(path, csv_options, date_format)
+            result = analyze_financials_stream(chunks, anomaly_engine, industry, date_format, on_chunk=store_chunk)
+        except BaseException:
+            writer.abort()
+            spool.discard()
+            raise
+        if "error" in result:
+            spool.discard()
+            spool = None
+        if "error" in result or writer.aborted:
+            writer.abort()
+        else:
+            try:
+                writer.close()
+            except Exception as e:
+                writer.abort()
+                print(f"Snapshot failed: {e}")
+        return None, result, None, spool
+
+    df = load_statement(path, filename, schema.read_options() if schema is not None else None)
+    if schema is not None and df is not None:
+        schema = schema_cache.confirm(schema, df, path)
+    date_format = schema.date_format if schema is not None else None
+    result = analyze_financials(df, anomaly_engine, industry, date_format)
+    if df is None or "error" in result:
+        return None, result, None, None
+
+    # SAVE A SNAPSHOT FOR CHAT PERSISTENCE
+    chat_df = chat_frame(df, date_format)
+    _save_snapshot(chat_df, snapshot_path)
+    return chat_df, result, transaction_records(df), transaction_columns(df)
@@ -1,32 +1,183 @@
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.styles import getSampleStyleSheet
+import hashlib
 import io
-import matplotlib.pyplot as plt
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-def generate_pdf_report(data):
+# Rendering Settings
+# REPORT_CHART_MODE: 'raster' (matplotlib PNGs, the default look) or 'vector' (native ReportLab drawings, no matplotlib)
+# REPORT_CHART_DPI: PNG resolution for raster charts
+# REPORT_CHART_CACHE_SIZE: rendered chart images kept, keyed on a hash of the chart data
+REPORT_CHART_MODE = os.getenv("REPORT_CHART_MODE", "raster")
+REPORT_CHART_DPI = int(os.getenv("REPORT_CHART_DPI", "100"))
+REPORT_CHART_CACHE_SIZE = int(os.getenv("REPORT_CHART_CACHE_SIZE", "128"))
+
+CHART_TITLES = ('Revenue vs Expenses', 'Net Cash Flow')
+CHART_WIDTH, CHART_HEIGHT = 400, 200
+
+def _build_styles():
     """
-    Generates a professional investor-ready PDF report.
-    Returns bytes.
+    Paragraph styles, built once. Reports only read them, so they are safe to share across threads.
     """
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
-    
     styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(name='Justify', alignment=1))
-    
+
     # Custom Styles
     title_style = styles['Heading1']
     title_style.alignment = 1
-    
+
     subtitle_style = styles['Heading2']
     subtitle_style.textColor = colors.HexColor('#4F46E5')
-    
+
     normal_style = styles['Normal']
     normal_style.fontSize = 11
     normal_style.leading = 14
+    return title_style, subtitle_style, normal_style
+
+TITLE_STYLE, SUBTITLE_STYLE, NORMAL_STYLE = _build_styles()
+
+METRICS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0f172a')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f1f5f9')),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+])
+
+# --- Raster charts (matplotlib, object-oriented: no global pyplot state, so threads can render in parallel) ---
+
+_chart_cache = OrderedDict() # (title, data hash, dpi) -> PNG bytes
+_chart_cache_lock = threading.Lock()
+chart_cache_stats = {"hits": 0, "misses": 0}
+_chart_pool = ThreadPoolExecutor(max_workers=len(CHART_TITLES), thread_name_prefix="chart")
+
+def _chart_series(chart_data, title):
+    months = [d['Month'] for d in chart_data]
+    if title == 'Revenue vs Expenses':
+        return months, [[d['Revenue'] for d in chart_data], [d['Operating Expenses'] for d in chart_data]]
+    return months, [[d['Net Cash Flow'] for d in chart_data]]
+
+def _render_chart_png(months, series, title, dpi):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=(6, 3))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    if title == 'Revenue vs Expenses':
+        ax.plot(months, series[0], label='Revenue', color='green', marker='o')
+        ax.plot(months, series[1], label='OpEx', color='red', marker='x')
+        ax.legend()
+    elif title == 'Net Cash Flow':
+        ax.bar(months, series[0], color=['green' if v > 0 else 'red' for v in series[0]])
+
+    ax.set_title(title)
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=dpi)
+    return buf.getvalue()
+
+def chart_png(chart_data, title, dpi=REPORT_CHART_DPI):
+    """
+    PNG bytes for one trend chart. Identical chart data is rendered once and served from the cache.
+    """
+    months, series = _chart_series(chart_data, title)
+    digest = hashlib.sha1(json.dumps([months, series]).encode("utf-8")).hexdigest()
+    key = (title, digest, dpi)
+    with _chart_cache_lock:
+        png = _chart_cache.get(key)
+        if png is not None:
+            _chart_cache.move_to_end(key)
+            chart_cache_stats["hits"] += 1
+            return png
+        chart_cache_stats["misses"] += 1
+
+    png = _render_chart_png(months, series, title, dpi)
+    with _chart_cache_lock:
+        _chart_cache[key] = png
+        while len(_chart_cache) > REPORT_CHART_CACHE_SIZE:
+            _chart_cache.popitem(last=False)
+    return png
+
+# --- Vector charts (native ReportLab graphics) ---
+
+def _label_every(months, max_labels=24):
+    step = max(1, -(-len(months) // max_labels))
+    return [m if i % step == 0 else '' for i, m in enumerate(months)]
+
+def vector_chart(chart_data, title):
+    """
+    The same chart as a ReportLab Drawing: scales without blurring and needs no matplotlib.
+    """
+    from reportlab.graphics.shapes import Drawing, String
+    from reportlab.graphics.charts.linecharts import HorizontalLineChart
+    from reportlab.graphics.charts.barcharts import VerticalBarChart
+    from reportlab.graphics.charts.legends import Legend
+    from reportlab.graphics.widgets.markers import makeMarker
+
+    months, series = _chart_series(chart_data, title)
+    drawing = Drawing(CHART_WIDTH, CHART_HEIGHT)
+    drawing.add(String(CHART_WIDTH / 2, CHART_HEIGHT - 14, title, textAnchor='middle', fontName='Helvetica', fontSize=11))
+
+    if title == 'Revenue vs Expenses':
+        chart = HorizontalLineChart()
+        chart.data = [tuple(s) for s in series]
+        chart.lines[0].strokeColor = colors.green
+        chart.lines[1].strokeColor = colors.red
+        chart.lines[0].symbol = makeMarker('FilledCircle', size=3)
+        chart.lines[1].symbol = makeMarker('Cross', size=3)
+        legend = Legend()
+        legend.x, legend.y = CHART_WIDTH - 80, CHART_HEIGHT - 30
+        legend.fontSize = 7
+        legend.colorNamePairs = [(colors.green, 'Revenue'), (colors.red, 'OpEx')]
+        drawing.add(legend)
+    else:
+        chart = VerticalBarChart()
+        chart.data = [tuple(series[0])]
+        chart.bars.strokeColor = None
+        for i, value in enumerate(series[0]):
+            chart.bars[(0, i)].fillColor = colors.green if value > 0 else colors.red
+
+    chart.x, chart.y = 50, 45
+    chart.width, chart.height = CHART_WIDTH - 70, CHART_HEIGHT - 75
+    chart.categoryAxis.categoryNames = _label_every(months)
+    chart.categoryAxis.labels.angle = 45
+    chart.categoryAxis.labels.boxAnchor = 'ne'
+    chart.categoryAxis.labels.fontSize = 6
+    chart.valueAxis.labels.fontSize = 7
+    drawing.add(chart)
+    return drawing
+
+def _chart_flowables(charts_data, chart_mode):
+    if chart_mode == 'vector':
+        return [vector_chart(charts_data, title) for title in CHART_TITLES]
+    # Both charts render at once on their own Figure objects
+    pngs = list(_chart_pool.map(lambda title: chart_png(charts_data, title), CHART_TITLES))
+    return [Image(io.BytesIO(png), width=CHART_WIDTH, height=CHART_HEIGHT) for png in pngs]
+
+def generate_pdf_report(data, chart_mode=None):
+    """
+    Generates a professional investor-ready PDF report.
+    chart_mode: 'raster' or 'vector' (default: REPORT_CHART_MODE).
+    Returns bytes.
+    """
+    chart_mode = chart_mode or REPORT_CHART_MODE
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+    
+    title_style = TITLE_STYLE
+    subtitle_style = SUBTITLE_STYLE
+    normal_style = NORMAL_STYLE
     
     elements = []
     
@@ -35,7 +186,7 @@ def generate_pdf_report(data):
     elements.append(Spacer(1, 12))
     
     date_str = datetime.now().strftime("%B %d, %Y")
-    elements.append(Paragraph(f"Generated on: {date_str}", styles['Normal']))
+    elements.append(Paragraph(f"Generated on: {date_str}", normal_style))
     elements.append(Spacer(1, 24))
     
     # --- Score Section ---
@@ -89,56 +240,24 @@ def generate_pdf_report(data):
     ]
     
     t = Table(table_data, colWidths=[200, 150, 100])
-    t.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0f172a')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f1f5f9')),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-    ]))
+    t.setStyle(METRICS_TABLE_STYLE)
     elements.append(t)
     elements.append(Spacer(1, 24))
 
-    # --- Charts (Generated via Matplotlib) ---
+    # --- Charts ---
     charts_data = data.get('charts_data', [])
     if charts_data:
         elements.append(Paragraph("Financial Trends", subtitle_style))
         elements.append(Spacer(1, 12))
-        
-        # Helper to generate chart image bytes
-        def generate_chart(chart_data, title):
-            plt.figure(figsize=(6, 3))
-            months = [d['Month'] for d in chart_data]
-            
-            if title == 'Revenue vs Expenses':
-                plt.plot(months, [d['Revenue'] for d in chart_data], label='Revenue', color='green', marker='o')
-                plt.plot(months, [d['Operating Expenses'] for d in chart_data], label='OpEx', color='red', marker='x')
-                plt.legend()
-            elif title == 'Net Cash Flow':
-                colors_bar = ['green' if d['Net Cash Flow'] > 0 else 'red' for d in chart_data]
-                plt.bar(months, [d['Net Cash Flow'] for d in chart_data], color=colors_bar)
-            
-            plt.title(title)
-            plt.xticks(rotation=45)
-            plt.tight_layout()
-            
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', dpi=100)
-            plt.close()
-            buf.seek(0)
-            return buf
 
         try:
+            trend_chart, cash_flow_chart = _chart_flowables(charts_data, chart_mode)
             # 1. Trend Chart
-            img_buf = generate_chart(charts_data, 'Revenue vs Expenses')
-            elements.append(Image(img_buf, width=400, height=200))
+            elements.append(trend_chart)
             elements.append(Spacer(1, 12))
             
             # 2. Cash Flow Chart
-            img_buf2 = generate_chart(charts_data, 'Net Cash Flow')
-            elements.append(Image(img_buf2, width=400, height=200))
+            elements.append(cash_flow_chart)
 
         except Exception as e:
             print(f"Chart generation failed: {e}")
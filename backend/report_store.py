@@ -0,0 +1,170 @@
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+# Report Store
+# /upload only registers a report (its analysis result, minus transaction rows, as JSON on disk).
+# The PDF is rendered on the first GET /report/{id} and then served from a byte-budgeted in-memory
+# LRU; PDFs evicted from memory spill to the same directory instead of being thrown away.
+#   REPORT_STORE_DIR     - directory for report sources and spilled PDFs
+#   REPORT_STORE_MAX_MB  - memory budget for rendered PDFs
+#   REPORT_STORE_DISK_MB - disk budget; beyond it spilled PDFs are deleted first (they can be rendered
+#                          again), then the oldest reports (source and PDF together)
+DEFAULT_DIR = os.getenv("REPORT_STORE_DIR", "./report_store")
+DEFAULT_MAX_BYTES = int(float(os.getenv("REPORT_STORE_MAX_MB", "64")) * 1024 * 1024)
+DEFAULT_MAX_DISK_BYTES = int(float(os.getenv("REPORT_STORE_DISK_MB", "1024")) * 1024 * 1024)
+
+def new_report_id():
+    return uuid.uuid4().hex
+
+class ReportStore:
+    """
+    report_id -> analysis result (always on disk) and rendered PDF (memory LRU, spilled to disk).
+    """
+
+    def __init__(self, directory=DEFAULT_DIR, max_bytes=DEFAULT_MAX_BYTES, max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict() # report_id -> pdf bytes
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._disk_bytes = sum(entry.stat().st_size for entry in self._stored_files())
+
+        # Counters
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.renders = 0
+        self.spills = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+    def _stored_files(self):
+        # Report sources and spilled PDFs; *.tmp files are writes still in flight
+        return [entry for entry in os.scandir(self.directory)
+                if entry.is_file() and entry.name.endswith((".json", ".pdf"))]
+
+    def _path(self, report_id, extension):
+        if not report_id.isalnum(): # Ids are uuid hex; never let one name a path outside the store
+            raise KeyError(report_id)
+        return os.path.join(self.directory, f"{report_id}.{extension}")
+
+    def _write(self, path, data):
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self._disk_bytes += len(data)
+        self._enforce_disk_budget()
+
+    def put_source(self, report_id, result, filename=None):
+        """
+        Registers a report: the analysis result it will be rendered from (transaction rows dropped).
+        """
+        source = {key: value for key, value in result.items() if key != 'transaction_data'}
+        source['filename'] = filename
+        self._write(self._path(report_id, "json"), json.dumps(source, default=str).encode("utf-8"))
+
+    def has(self, report_id):
+        try:
+            return os.path.exists(self._path(report_id, "json"))
+        except KeyError:
+            return False
+
+    def get_source(self, report_id):
+        try:
+            with open(self._path(report_id, "json"), "rb") as f:
+                return json.loads(f.read())
+        except (KeyError, FileNotFoundError):
+            return None
+
+    def get_pdf(self, report_id):
+        """
+        Rendered PDF bytes from memory or the spill directory, or None if not rendered yet.
+        """
+        with self._lock:
+            pdf = self._memory.get(report_id)
+            if pdf is not None:
+                self._memory.move_to_end(report_id)
+                self.memory_hits += 1
+                return pdf
+        try:
+            with open(self._path(report_id, "pdf"), "rb") as f:
+                pdf = f.read()
+        except (KeyError, FileNotFoundError):
+            return None
+        with self._lock:
+            self.disk_hits += 1
+        self._remember(report_id, pdf)
+        return pdf
+
+    def put_pdf(self, report_id, pdf):
+        with self._lock:
+            self.renders += 1
+        self._remember(report_id, pdf)
+
+    def _remember(self, report_id, pdf):
+        evicted = []
+        with self._lock:
+            if report_id in self._memory:
+                self._memory_bytes -= len(self._memory.pop(report_id))
+            self._memory[report_id] = pdf
+            self._memory_bytes += len(pdf)
+            while self._memory_bytes > self.max_bytes and len(self._memory) > 1:
+                old_id, old_pdf = self._memory.popitem(last=False)
+                self._memory_bytes -= len(old_pdf)
+                evicted.append((old_id, old_pdf))
+                self.evictions += 1
+        for old_id, old_pdf in evicted:
+            path = self._path(old_id, "pdf")
+            if not os.path.exists(path):
+                self._write(path, old_pdf)
+                self.spills += 1
+
+    def _enforce_disk_budget(self):
+        with self._lock:
+            if self._disk_bytes <= self.max_disk_bytes:
+                return
+            files = []
+            for entry in self._stored_files():
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                report_id, extension = os.path.splitext(entry.name)
+                files.append((extension != ".pdf", stat.st_mtime, report_id, entry.path, stat.st_size))
+            # Spilled PDFs (oldest first) before sources; by the time a source goes, so has its PDF
+            for is_source, _, report_id, path, size in sorted(files):
+                if self._disk_bytes <= self.max_disk_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                self._disk_bytes -= size
+                self.disk_evictions += 1
+                if is_source and report_id in self._memory: # Nothing left to serve it with
+                    self._memory_bytes -= len(self._memory.pop(report_id))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "max_bytes": self.max_bytes,
+                "disk_bytes": self._disk_bytes,
+                "max_disk_bytes": self.max_disk_bytes,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "renders": self.renders,
+                "spills": self.spills,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions
+            }
+
+# Shared process-wide instance
+report_store = ReportStore()
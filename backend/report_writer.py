@@ -0,0 +1,192 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from database import (SessionLocal, SQLITE_PRODUCTION_MODE, TRANSACTION_INSERT_BATCH, build_report, transaction_insert_sql,
+                      prepare_transaction_rows, transaction_columns_from_records)
+
+# Single Writer for SQLite (production mode, see database.py)
+# SQLite runs one write transaction at a time, so concurrent uploads committing on their own mostly
+# wait for the lock and pay a commit (WAL append + sync) each. Instead, every save is queued to one
+# writer thread, which takes whatever has queued up (waiting up to SQLITE_WRITER_LINGER_MS for more)
+# and writes it as one transaction. Callers bind the transaction rows beforehand
+# (database.prepare_transaction_rows), so the writer only executes SQL. Streamed uploads are the
+# exception: their rows come as a pipeline.TransactionSpool and are bound chunk by chunk on the writer
+# thread, so only one chunk of them is in memory.
+# If a grouped transaction fails, its saves are retried one by one so only the bad one fails.
+# Groups are also capped by transaction rows: one long transaction keeps the writer thread on the CPU
+# (and the GIL) long enough to delay the event loop and readers.
+#   SQLITE_WRITER_BATCH      - max saves per transaction
+#   SQLITE_WRITER_GROUP_ROWS - a group takes no more saves once it has this many transaction rows
+#   SQLITE_WRITER_LINGER_MS  - how long the writer waits for more saves once it has one (0 = don't wait)
+SQLITE_WRITER_BATCH = int(os.getenv("SQLITE_WRITER_BATCH", "32"))
+SQLITE_WRITER_GROUP_ROWS = int(os.getenv("SQLITE_WRITER_GROUP_ROWS", "2000"))
+SQLITE_WRITER_LINGER_MS = float(os.getenv("SQLITE_WRITER_LINGER_MS", "2"))
+
+_STOP = object()
+
+class _Save:
+    def __init__(self, data, filename, rows):
+        self.data = data
+        self.filename = filename
+        self.rows = rows
+        self.row_count = len(rows) if isinstance(rows, list) else rows.row_count
+        self.future = Future()
+
+    def row_batches(self):
+        if isinstance(self.rows, list):
+            yield self.rows
+            return
+        for columns in self.rows: # TransactionSpool
+            yield prepare_transaction_rows(columns)
+
+class ReportWriter:
+    """
+    Owns all report writes of this process. submit() returns a concurrent.futures.Future that
+    resolves to the saved Report (detached, attributes loaded).
+    """
+
+    def __init__(self, max_batch=SQLITE_WRITER_BATCH, max_group_rows=SQLITE_WRITER_GROUP_ROWS,
+                 linger_s=SQLITE_WRITER_LINGER_MS / 1000):
+        self.max_batch = max_batch
+        self.max_group_rows = max_group_rows
+        self.linger_s = linger_s
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+        # Counters
+        self.saves = 0
+        self.failed = 0
+        self.transactions = 0
+        self.retried_groups = 0
+        self.largest_group = 0
+        self.commit_s = 0.0
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, data, filename, rows):
+        """
+        Queues a save of an analysis result (as for database.save_report) and its transaction rows
+        (database.prepare_transaction_rows, or a pipeline.TransactionSpool).
+        """
+        save = _Save(data, filename, rows)
+        self._ensure_started()
+        self._queue.put(save)
+        return save.future
+
+    async def save_async(self, data, filename, transactions=None, offload=None):
+        """
+        save_report_async through the writer: rows are bound via offload(fn, *args) (default
+        asyncio.to_thread), then the save is queued and awaited.
+        """
+        offload = offload or asyncio.to_thread
+        if transactions is None:
+            transactions = await offload(transaction_columns_from_records, data.get('transaction_data') or [])
+        rows = await offload(prepare_transaction_rows, transactions) if isinstance(transactions, dict) else transactions
+        return await asyncio.wrap_future(self.submit(data, filename, rows))
+
+    def _next_group(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        group = [first]
+        rows = first.row_count
+        deadline = time.monotonic() + self.linger_s
+        while len(group) < self.max_batch and rows < self.max_group_rows:
+            try:
+                timeout = deadline - time.monotonic()
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP) # Finish this group, then stop
+                break
+            group.append(item)
+            rows += item.row_count
+        return group
+
+    def _run(self):
+        while True:
+            group = self._next_group()
+            if group is None:
+                return
+            group = [save for save in group if save.future.set_running_or_notify_cancel()]
+            if not group:
+                continue
+            try:
+                self._write(group)
+            except BaseException as e: # Never leave a caller waiting on a dead thread
+                for save in group:
+                    if not save.future.done():
+                        save.future.set_exception(e)
+
+    def _write(self, group):
+        start = time.perf_counter()
+        try:
+            with SessionLocal(expire_on_commit=False) as db:
+                reports = []
+                for save in group:
+                    report = build_report(save.data, save.filename)
+                    db.add(report)
+                    db.flush() # Assigns the id the rows are inserted under
+                    connection = db.connection()
+                    sql = transaction_insert_sql(connection.dialect, report.id)
+                    for rows in save.row_batches():
+                        for offset in range(0, len(rows), TRANSACTION_INSERT_BATCH):
+                            connection.exec_driver_sql(sql, rows[offset:offset + TRANSACTION_INSERT_BATCH])
+                    reports.append(report)
+                db.commit()
+        except Exception as e:
+            if len(group) > 1:
+                with self._lock:
+                    self.retried_groups += 1
+                for save in group:
+                    self._write([save])
+                return
+            with self._lock:
+                self.failed += 1
+            group[0].future.set_exception(e)
+            return
+        with self._lock:
+            self.transactions += 1
+            self.saves += len(group)
+            self.largest_group = max(self.largest_group, len(group))
+            self.commit_s += time.perf_counter() - start
+        for save, report in zip(group, reports):
+            print(f"Report saved to DB with ID: {report.id}")
+            save.future.set_result(report)
+
+    def stop(self, timeout=30):
+        """
+        Writes everything already queued, then stops the thread.
+        """
+        with self._start_lock:
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "saves": self.saves,
+                "failed": self.failed,
+                "transactions": self.transactions,
+                "saves_per_transaction": round(self.saves / self.transactions, 2) if self.transactions else None,
+                "largest_group": self.largest_group,
+                "retried_groups": self.retried_groups,
+                "avg_transaction_ms": round(self.commit_s / self.transactions * 1000, 2) if self.transactions else None,
+                "queued": self._queue.qsize()
+            }
+
+# Shared process-wide instance (None unless SQLite production mode is on)
+report_writer = ReportWriter() if SQLITE_PRODUCTION_MODE else None
@@ -0,0 +1,112 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Upload Result Cache
+# Re-uploading the same statement (to switch language, refresh the dashboard...) returns the stored
+# /upload response instead of re-running parse -> analysis -> LLM -> PDF -> DB.
+# Key: sha256 of the file bytes + file type + industry + language + keyword-table fingerprint + anomaly
+# engine (+ the model version for the pretrained engine, so a retrain isn't answered from the cache)
+# + whether the insight may come from the insight cache (such a response must not answer a request
+# that didn't allow it).
+#   RESULT_CACHE_SIZE   - max cached responses
+#   RESULT_CACHE_MAX_MB - max total size of cached responses (they include transaction rows)
+#   RESULT_CACHE_TTL_S  - entries older than this are recomputed
+DEFAULT_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_SIZE", "64"))
+DEFAULT_MAX_BYTES = int(float(os.getenv("RESULT_CACHE_MAX_MB", "256")) * 1024 * 1024)
+DEFAULT_TTL_S = float(os.getenv("RESULT_CACHE_TTL_S", "3600"))
+
+def result_cache_key(file_digest, filename, industry, language, anomaly_engine="", model_version="", use_insight_cache=False):
+    from categorization import categories_fingerprint
+    extension = os.path.splitext(filename.lower())[1]
+    parts = [file_digest, extension, industry, language, categories_fingerprint(), anomaly_engine, model_version,
+             "insight-cache" if use_insight_cache else ""]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+class ResultCache:
+    """
+    In-memory LRU of encoded /upload responses, bounded by entry count, total bytes and age.
+    Entries remember how long the original computation took, so hits report the time they saved.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, ttl_s=DEFAULT_TTL_S):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._entries = OrderedDict() # key -> (body bytes, stored_at, compute_s, report_id, report_db_id)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.time_saved_s = 0.0
+
+    def get(self, key):
+        """
+        Returns (response body, report_id, report_db_id), or None on a miss / expired entry.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] > self.ttl_s:
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.time_saved_s += entry[2]
+            return entry[0], entry[3], entry[4]
+
+    def put(self, key, body, compute_s, report_id=None, report_db_id=None):
+        if len(body) > self.max_bytes:
+            return # Would evict everything else and still not fit
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (body, time.time(), compute_s, report_id, report_db_id)
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypasses += 1
+
+    def _drop(self, key):
+        body = self._entries.pop(key)[0]
+        self._bytes -= len(body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "time_saved_s": round(self.time_saved_s, 3)
+            }
+
+# Shared process-wide instance
+result_cache = ResultCache()
@@ -0,0 +1,221 @@
+import csv
+import hashlib
+import io
+import os
+import re
+import threading
+from collections import OrderedDict
+
+# Schema Inference Cache (CSV uploads)
+# Exports from the same bank share a header row. The first SCHEMA_SNIFF_KB of an upload are read,
+# the header is fingerprinted, and what was worked out for that header is cached per fingerprint:
+# the column renames (engine.column_renames), how each amount column is written and the date format.
+# read_csv then gets explicit options instead of discovering them per file:
+#   - amounts with thousands separators ("1,23,456.00") are parsed by the C parser (thousands=",")
+#     instead of being read as text and regex-stripped afterwards
+#   - text columns (dates, descriptions, amounts with currency symbols) are read as str straight away
+#   - the Date column is parsed with the cached format instead of a guessed one
+# Numeric columns are left to the parser's own float detection (a forced float64 would turn one stray
+# "N/A" into a failed read), and every column is kept (no usecols): the chat snapshot and the
+# transactions table store the columns the analysis does not use.
+# A cached schema is checked against the rows actually read (SCHEMA_CHECK_ROWS); if the file no longer
+# fits it (e.g. a new date format under the same header), it is inferred again from those rows.
+#   SCHEMA_SNIFF_KB      - bytes read to find the header and, on a miss, to infer the schema from
+#   SCHEMA_CHECK_ROWS    - leading rows a cached schema is checked against
+#   SCHEMA_CACHE_ENTRIES - distinct headers remembered (LRU)
+SCHEMA_SNIFF_BYTES = int(float(os.getenv("SCHEMA_SNIFF_KB", "64")) * 1024)
+SCHEMA_CHECK_ROWS = int(os.getenv("SCHEMA_CHECK_ROWS", "1000"))
+SCHEMA_CACHE_ENTRIES = int(os.getenv("SCHEMA_CACHE_ENTRIES", "256"))
+
+# Statement columns (as normalize_columns names them) holding amounts
+AMOUNT_COLUMNS = ['Debit', 'Credit', 'Revenue', 'Operating Expenses', 'Loan Repayment', 'Accounts Receivable', 'Accounts Payable']
+TEXT_COLUMNS = ['Date', 'Description']
+
+# How an amount column is written
+PLAIN = "plain"       # Numbers the parser reads as such
+GROUPED = "grouped"   # Thousands separators: 1,234.50 / 1,23,456.00
+TEXT = "text"         # Anything else (currency symbols, Dr/Cr suffixes): stripped by engine.parse_amounts
+
+_PLAIN_NUMBER = re.compile(r"-?\d+(\.\d+)?")
+_GROUPED_NUMBER = re.compile(r"-?(\d{1,3}(,\d{3})+|\d{1,2}(,\d{2})*,\d{3})(\.\d+)?")
+
+def header_fingerprint(header):
+    return hashlib.sha256("\x1f".join(header).encode("utf-8")).hexdigest()
+
+def _amount_format(values):
+    import pandas as pd
+    if pd.api.types.is_numeric_dtype(values):
+        return PLAIN
+    text = values.dropna().astype(str).str.strip()
+    text = text[text != ""]
+    if text.empty or text.str.fullmatch(_PLAIN_NUMBER.pattern).all():
+        return PLAIN
+    if text.str.fullmatch(f"{_GROUPED_NUMBER.pattern}|{_PLAIN_NUMBER.pattern}").all():
+        return GROUPED
+    return TEXT
+
+class StatementSchema:
+    """
+    What is known about one header: the statement column each raw column maps to, the format of
+    the amount columns, and the Date column's format (None = let pandas guess).
+    """
+
+    def __init__(self, fingerprint, targets, amount_formats, text_columns, date_format):
+        self.fingerprint = fingerprint
+        self.targets = targets                # raw column -> statement column (unmapped ones map to themselves)
+        self.amount_formats = amount_formats  # raw column -> PLAIN / GROUPED / TEXT
+        self.text_columns = text_columns      # Date / Description columns that hold text
+        self.date_format = date_format
+
+    @classmethod
+    def infer(cls, fingerprint, frame):
+        """
+        Infers a schema from the leading rows of a statement (read without options, or with this
+        header's previous schema).
+        """
+        import pandas as pd
+        from engine import column_renames, infer_date_format
+        stripped = {str(c).strip(): c for c in frame.columns}
+        renames = dict(column_renames(tuple(stripped)))
+        targets = {stripped[name]: renames.get(name, name) for name in stripped}
+        amount_formats = {raw: _amount_format(frame[raw]) for raw, target in targets.items() if target in AMOUNT_COLUMNS}
+        text_columns = [raw for raw, target in targets.items()
+                        if target in TEXT_COLUMNS and not pd.api.types.is_numeric_dtype(frame[raw])]
+        date_format = None
+        date_column = next((raw for raw, target in targets.items() if target == 'Date'), None)
+        if date_column is not None:
+            date_format = infer_date_format(frame[date_column])
+        return cls(fingerprint, targets, amount_formats, text_columns, date_format)
+
+    def read_options(self):
+        """
+        Keyword arguments for pd.read_csv.
+        """
+        dtype = dict.fromkeys(self.text_columns, "str")
+        dtype.update((raw, "str") for raw, fmt in self.amount_formats.items() if fmt == TEXT)
+        options = {"dtype": dtype}
+        if GROUPED in self.amount_formats.values():
+            options["thousands"] = ","
+        return options
+
+    def fits(self, frame):
+        """
+        True if the rows read with read_options() are what this schema expects: amount columns came
+        out as numbers (or, for TEXT ones, still need stripping) and the dates parse with date_format.
+        """
+        import pandas as pd
+        if list(frame.columns) != list(self.targets):
+            return False
+        for raw, fmt in self.amount_formats.items():
+            if _amount_format(frame[raw]) != (TEXT if fmt == TEXT else PLAIN):
+                return False
+        date_column = next((raw for raw, target in self.targets.items() if target == 'Date'), None)
+        if date_column is not None and self.date_format is not None:
+            dates = frame[date_column]
+            parsed = pd.to_datetime(dates, errors='coerce', format=self.date_format)
+            if (parsed.isna() & dates.notna()).any():
+                return False
+        return True
+
+def sniff_csv(path):
+    """
+    (header fingerprint, leading bytes cut at the last complete line) of a CSV file, or None if it
+    has no readable header.
+    """
+    with open(path, "rb") as f:
+        head = f.read(SCHEMA_SNIFF_BYTES)
+        complete = len(head) < SCHEMA_SNIFF_BYTES
+    if not complete:
+        head = head[:head.rfind(b"\n") + 1]
+    text = head.decode("utf-8-sig", errors="replace")
+    header = next(csv.reader(io.StringIO(text)), None)
+    if not header:
+        return None
+    return header_fingerprint(header), head
+
+class SchemaCache:
+    """
+    In-memory LRU of StatementSchema per header fingerprint.
+    """
+
+    def __init__(self, max_entries=SCHEMA_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.unreadable = 0
+
+    def get(self, fingerprint):
+        with self._lock:
+            schema = self._entries.get(fingerprint)
+            if schema is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(fingerprint)
+            self.hits += 1
+            return schema
+
+    def put(self, schema):
+        with self._lock:
+            self._entries[schema.fingerprint] = schema
+            self._entries.move_to_end(schema.fingerprint)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _infer(self, fingerprint, head):
+        import pandas as pd
+        schema = StatementSchema.infer(fingerprint, pd.read_csv(io.BytesIO(head)))
+        self.put(schema)
+        return schema
+
+    def schema_for_csv(self, path):
+        """
+        The schema for a CSV upload: cached for its header, or inferred from its first SCHEMA_SNIFF_KB.
+        None if the file can't be sniffed (it is then read as before, without options).
+        """
+        try:
+            sniffed = sniff_csv(path)
+            if sniffed is None:
+                raise ValueError("no header")
+            fingerprint, head = sniffed
+            return self.get(fingerprint) or self._infer(fingerprint, head)
+        except Exception as e:
+            with self._lock:
+                self.unreadable += 1
+            print(f"Schema inference skipped: {e}")
+            return None
+
+    def confirm(self, schema, frame, path):
+        """
+        Checks a schema against the first rows read with it (frame). Returns the schema to go on
+        with: the same one, or, when the file didn't fit, one inferred again from the file at path
+        (read without options), which replaces it in the cache.
+        """
+        if schema.fits(frame.head(SCHEMA_CHECK_ROWS)):
+            return schema
+        with self._lock:
+            self.stale += 1
+        try:
+            return self._infer(schema.fingerprint, sniff_csv(path)[1])
+        except Exception as e:
+            print(f"Schema inference skipped: {e}")
+            return None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "stale": self.stale,
+                "unreadable": self.unreadable
+            }
+
+# Shared process-wide instance
+schema_cache = SchemaCache()
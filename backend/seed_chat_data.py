@@ -1,17 +1,21 @@
 import pandas as pd
 import os
+from pipeline import chat_frame
+from report_store import new_report_id
+from snapshot_format import write_snapshot
+from snapshot_store import snapshot_store
 
 # Path to the anomalous data we created earlier
 source_file = "../anomalous_data.csv"
-target_file = "latest_upload.csv"
 
 if os.path.exists(source_file):
     print(f"Readinng from {source_file}...")
     df = pd.read_csv(source_file)
-    
-    # Save to backend folder for the chat app
-    df.to_csv(target_file, index=False)
-    print(f"SUCCESS: Created {target_file} manually.")
+
+    # Save as an upload snapshot for the chat app
+    report_id = new_report_id()
+    write_snapshot(chat_frame(df), snapshot_store.path_for(report_id))
+    print(f"SUCCESS: Created snapshot {report_id} in {snapshot_store.directory} manually.")
     print("You can now chat with the bot immediately!")
 else:
     print(f"ERROR: Could not find {source_file}. Please upload a file via the dashboard.")
@@ -0,0 +1,184 @@
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+# Columnar upload snapshot format (see snapshot_store.py for where snapshots live).
+# A snapshot is a directory:
+#   meta.json   - row count and per-column layout/dtype
+#   c<i>.bin    - numeric, bool and datetime columns as raw little-endian arrays (np.memmap)
+#   c<i>.codes  - text columns dictionary-encoded as int32 codes (-1 = missing, np.memmap) ...
+#   c<i>.dict   - ... and their distinct values, NUL-separated UTF-8
+# Loading maps the arrays instead of reading them; only the text dictionaries are decoded.
+SNAPSHOT_VERSION = 1
+_SEPARATOR = "\x00"
+
+class _Column:
+    """
+    Append side of one snapshot column. The layout is fixed by the first chunk; later chunks are
+    coerced to it (values that don't fit become missing).
+    """
+
+    def __init__(self, directory, index, name, series, widen_ints):
+        self.name = name
+        self.meta = {"name": name, "pandas_dtype": str(series.dtype)}
+        self.base = os.path.join(directory, f"c{index}")
+        dtype = series.dtype
+        if isinstance(dtype, pd.DatetimeTZDtype):
+            self.meta.update(layout="array", dtype=np.dtype(f"<M8[{dtype.unit}]").str, tz=str(dtype.tz))
+        elif pd.api.types.is_datetime64_dtype(dtype):
+            self.meta.update(layout="array", dtype=dtype.str)
+        elif dtype == bool:
+            self.meta.update(layout="array", dtype=np.dtype(bool).str)
+        elif pd.api.types.is_numeric_dtype(dtype):
+            numpy_dtype = dtype if isinstance(dtype, np.dtype) else np.dtype("float64") # Nullable Int64 etc.
+            if widen_ints and numpy_dtype.kind in "iu":
+                numpy_dtype = np.dtype("float64") # A later chunk may have gaps an int column can't hold
+            self.meta.update(layout="array", dtype=numpy_dtype.newbyteorder("<").str)
+        else:
+            self.meta.update(layout="dict")
+            self.codes = {}
+            self.values = []
+        self.file = open(f"{self.base}.codes" if self.meta["layout"] == "dict" else f"{self.base}.bin", "wb")
+
+    def append(self, series):
+        if self.meta["layout"] == "dict":
+            self.file.write(self._encode(series).astype("<i4").tobytes())
+            return
+        dtype = np.dtype(self.meta["dtype"])
+        if dtype.kind == "M":
+            values = series if pd.api.types.is_datetime64_any_dtype(series.dtype) else pd.to_datetime(series, errors="coerce")
+            if isinstance(values.dtype, pd.DatetimeTZDtype):
+                values = values.dt.tz_convert("UTC").dt.tz_localize(None)
+            array = values.to_numpy().astype(dtype)
+        elif dtype.kind == "b":
+            array = series.fillna(False).to_numpy().astype(bool)
+        else:
+            numbers = series if pd.api.types.is_numeric_dtype(series.dtype) else pd.to_numeric(series, errors="coerce")
+            if dtype.kind == "f":
+                array = numbers.to_numpy(dtype=dtype, na_value=np.nan)
+            else:
+                array = numbers.fillna(0).to_numpy().astype(dtype) # int column of a single-chunk snapshot
+        self.file.write(np.ascontiguousarray(array, dtype=dtype).tobytes())
+
+    def _encode(self, series):
+        # Factorize the chunk, then map only its distinct values onto the snapshot-wide dictionary
+        local_codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        mapping = np.empty(len(uniques) + 1, dtype=np.int32)
+        mapping[-1] = -1 # local -1 (missing) indexes the last slot
+        for i, value in enumerate(uniques):
+            text = value if isinstance(value, str) else str(value)
+            code = self.codes.get(text)
+            if code is None:
+                if _SEPARATOR in text:
+                    raise ValueError(f"Column {self.name!r} contains NUL characters")
+                code = self.codes[text] = len(self.values)
+                self.values.append(text)
+            mapping[i] = code
+        return mapping[local_codes]
+
+    def close(self):
+        self.file.close()
+        if self.meta["layout"] == "dict":
+            with open(f"{self.base}.dict", "wb") as f:
+                f.write(_SEPARATOR.join(self.values).encode("utf-8"))
+            self.meta["dictionary_size"] = len(self.values)
+        return self.meta
+
+class SnapshotWriter:
+    """
+    Writes a snapshot chunk by chunk into path (a directory). Nothing is visible at path until
+    close() succeeds. widen_ints=True stores int columns as float64, for inputs where a later chunk
+    may have gaps in a column the first chunk had complete.
+    """
+
+    def __init__(self, path, widen_ints=False):
+        self.path = path
+        self.widen_ints = widen_ints
+        self.rows = 0
+        self.aborted = False
+        self._tmp = f"{path}.tmp"
+        self._columns = None
+        shutil.rmtree(self._tmp, ignore_errors=True)
+        os.makedirs(self._tmp)
+
+    def append(self, df):
+        if self._columns is None:
+            self._columns = [_Column(self._tmp, i, name, df[name], self.widen_ints) for i, name in enumerate(df.columns)]
+        for column in self._columns:
+            series = df[column.name] if column.name in df.columns else pd.Series(None, index=df.index, dtype=object)
+            column.append(series)
+        self.rows += len(df)
+
+    def close(self):
+        columns = [column.close() for column in self._columns or []]
+        with open(os.path.join(self._tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": SNAPSHOT_VERSION, "rows": self.rows, "columns": columns}, f)
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        self.aborted = True
+        for column in self._columns or []:
+            column.file.close()
+        shutil.rmtree(self._tmp, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+            return
+        try:
+            self.close()
+        except BaseException:
+            self.abort()
+            raise
+
+def write_snapshot(df, path):
+    """
+    Writes df as a snapshot directory at path, keeping its dtypes.
+    """
+    with SnapshotWriter(path) as writer:
+        writer.append(df)
+
+def _map(path, dtype, rows):
+    if rows == 0:
+        return np.empty(0, dtype=dtype)
+    # Copy-on-write mapping: pages are shared with the file until the frame is modified (never written back)
+    return np.asarray(np.memmap(path, dtype=dtype, mode="c", shape=(rows,)))
+
+def load_snapshot(path, columns=None):
+    """
+    The snapshot at path as a DataFrame. Numeric, bool and datetime columns are copy-on-write maps
+    of the column files; text columns are rebuilt from their dictionaries.
+    columns limits which columns are loaded. Raises FileNotFoundError if there is no snapshot.
+    """
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    rows = meta["rows"]
+    data = {}
+    for i, column in enumerate(meta["columns"]):
+        if columns is not None and column["name"] not in columns:
+            continue
+        base = os.path.join(path, f"c{i}")
+        if column["layout"] == "array":
+            values = _map(f"{base}.bin", np.dtype(column["dtype"]), rows)
+            series = pd.Series(values, copy=False, name=column["name"])
+            if column.get("tz"):
+                series = series.dt.tz_localize("UTC").dt.tz_convert(column["tz"])
+        else:
+            codes = _map(f"{base}.codes", np.dtype("<i4"), rows)
+            with open(f"{base}.dict", "rb") as f:
+                text = f.read().decode("utf-8")
+            values = np.empty(column["dictionary_size"] + 1, dtype=object)
+            if column["dictionary_size"]:
+                values[:-1] = text.split(_SEPARATOR)
+            values[-1] = None # code -1
+            dtype = "str" if column["pandas_dtype"] == "str" else object
+            series = pd.Series(values[codes], name=column["name"], dtype=dtype)
+        data[column["name"]] = series
+    return pd.DataFrame(data, copy=False)
+
@@ -0,0 +1,122 @@
+import os
+import shutil
+import threading
+import time
+
+# Upload Snapshots
+# Every upload's normalized frame (pipeline.chat_frame) is kept as a columnar snapshot keyed by its
+# report id, so nothing has to re-parse CSV text to get the statement back and concurrent uploads no
+# longer overwrite each other's file. The format is in snapshot_format.py (numpy/pandas, loaded on
+# first use). Snapshots older than SNAPSHOT_MAX_AGE_H, or beyond SNAPSHOT_MAX_MB (oldest first), are deleted.
+#   SNAPSHOT_DIR        - directory for snapshots
+#   SNAPSHOT_MAX_MB     - disk budget
+#   SNAPSHOT_MAX_AGE_H  - snapshots older than this are deleted (0 = keep until the budget needs the space)
+DEFAULT_DIR = os.getenv("SNAPSHOT_DIR", "./upload_snapshots")
+DEFAULT_MAX_BYTES = int(float(os.getenv("SNAPSHOT_MAX_MB", "1024")) * 1024 * 1024)
+DEFAULT_MAX_AGE_S = float(os.getenv("SNAPSHOT_MAX_AGE_H", "168")) * 3600
+
+class SnapshotStore:
+    """
+    report_id -> upload snapshot directory, with age/size garbage collection.
+    Snapshots are written by the analysis stage (possibly in a worker process), so the store
+    rescans its directory instead of tracking writes.
+    """
+
+    def __init__(self, directory=DEFAULT_DIR, max_bytes=DEFAULT_MAX_BYTES, max_age_s=DEFAULT_MAX_AGE_S):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        # Counters
+        self.loads = 0
+        self.misses = 0
+        self.collected = 0
+        self.collected_bytes = 0
+
+    def path_for(self, report_id):
+        if not report_id.isalnum(): # Ids are uuid hex; never let one name a path outside the store
+            raise KeyError(report_id)
+        return os.path.join(self.directory, report_id)
+
+    def has(self, report_id):
+        try:
+            return os.path.exists(os.path.join(self.path_for(report_id), "meta.json"))
+        except KeyError:
+            return False
+
+    def load(self, report_id, columns=None):
+        """
+        The upload frame of report_id, or None if it has no snapshot (streamed elsewhere, or collected).
+        """
+        from snapshot_format import load_snapshot
+        try:
+            df = load_snapshot(self.path_for(report_id), columns)
+        except (KeyError, FileNotFoundError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.loads += 1
+        return df
+
+    def latest_id(self):
+        entries = [e for e in self._entries() if not e[0].endswith(".tmp")]
+        return max(entries, key=lambda e: e[1])[0] if entries else None
+
+    def _entries(self):
+        """
+        (name, mtime, bytes) per snapshot directory, in-progress ones (.tmp) included.
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir():
+                continue
+            try:
+                files = [f.stat() for f in os.scandir(entry.path) if f.is_file()]
+                mtime = max([entry.stat().st_mtime] + [s.st_mtime for s in files])
+            except FileNotFoundError:
+                continue # Collected or renamed meanwhile
+            entries.append((entry.name, mtime, sum(s.st_size for s in files)))
+        return entries
+
+    def collect_garbage(self, keep=()):
+        """
+        Deletes expired snapshots, then the oldest ones until the disk budget holds.
+        Ids in keep are never deleted. Returns the number of snapshots deleted.
+        """
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda e: e[1])
+            total = sum(e[2] for e in entries)
+            cutoff = time.time() - self.max_age_s if self.max_age_s > 0 else None
+            deleted = 0
+            for name, mtime, size in entries:
+                expired = cutoff is not None and mtime < cutoff
+                if not expired and (total <= self.max_bytes or name.endswith(".tmp")):
+                    continue # Space is only taken back from finished snapshots; stale .tmp dirs expire
+                if name in keep:
+                    continue
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+                total -= size
+                deleted += 1
+                self.collected += 1
+                self.collected_bytes += size
+            return deleted
+
+    def stats(self):
+        entries = self._entries()
+        with self._lock:
+            return {
+                "snapshots": len(entries),
+                "disk_bytes": sum(e[2] for e in entries),
+                "max_bytes": self.max_bytes,
+                "max_age_s": self.max_age_s,
+                "loads": self.loads,
+                "misses": self.misses,
+                "collected": self.collected,
+                "collected_bytes": self.collected_bytes
+            }
+
+# Shared process-wide instance
+snapshot_store = SnapshotStore()
@@ -0,0 +1,47 @@
+from categorization import _categorize_normalized, normalize_description, get_keyword_index, categorize_transactions_batch
+from categorization_cache import category_cache
+
+# Regression test: the keyword index (with the fuzzy scorer only on misses) must categorize every
+# description exactly as fuzzy scoring of every row does. Timing lives in bench_keyword_index.py.
+# Usage: python -m pytest test_keyword_index.py
+
+DESCRIPTIONS = [
+    # Bank-style templates
+    "UPI/SWIGGY/4821", "UPI/ZOMATO/17", "NEFT SALARY 202403", "ACH EMI HDFC LOAN 99", "POS AMAZON RETAIL 5531",
+    "AWS BILLING 0042", "RENT WEWORK BLR", "IMPS CLIENT PAYMENT 812", "ATM WDL 3310", "NETFLIX SUBSCRIPTION",
+    "BANK CHARGES Q3", "FACEBOOK ADS 77", "CHQ DEP 000123", "TRF TO SELF", "INTEREST DEBIT", "GST PAYMENT 18",
+    "MISC 404", "CREDIT CARD PAYMENT HDFC", "STRIPE PAYOUT", "RAZORPAY SETTLEMENT 7", "GOOGLE CLOUD INDIA",
+    # Raw keywords and fragments of keywords
+    "SALES", "Revenue", "payroll", "ELECTRICITY", "em", "lo", "inte", "wif", "ub", "o", "zz",
+    # Typos
+    "POS ubr 12", "UPI swigy 3", "NEFT salery 8", "IMPS repaymant 41", "POS netflx 9",
+    # Noise, blanks and non-text
+    "", "   ", "*/-_.", "x7Q/9-k", "0000", None, 12345.0,
+]
+
+def _expected(descriptions):
+    return [_categorize_normalized(normalize_description(d)) for d in descriptions]
+
+def test_index_matches_fuzzy_scoring():
+    keys = [normalize_description(d) for d in DESCRIPTIONS]
+    hits = get_keyword_index().match_many(keys)
+    got = [hit if hit is not None else _categorize_normalized(key) for key, hit in zip(keys, hits)]
+    assert got == _expected(DESCRIPTIONS)
+
+def test_index_resolves_keyword_hits():
+    keys = [normalize_description(d) for d in ["NEFT SALARY 202403", "ACH EMI HDFC LOAN 99", "ATM WDL 3310"]]
+    assert all(hit is not None for hit in get_keyword_index().match_many(keys))
+
+def test_batch_matches_fuzzy_scoring():
+    category_cache.clear()
+    categories, paths = categorize_transactions_batch(DESCRIPTIONS, return_paths=True, use_llm=False)
+    assert list(categories) == _expected(DESCRIPTIONS)
+    assert set(paths) <= {"cache", "index", "fuzzy"}
+    assert "index" in paths and "fuzzy" in paths
+
+def test_cached_batch_matches_fuzzy_scoring():
+    category_cache.clear()
+    categorize_transactions_batch(DESCRIPTIONS, use_llm=False)
+    categories, paths = categorize_transactions_batch(DESCRIPTIONS, return_paths=True, use_llm=False)
+    assert list(categories) == _expected(DESCRIPTIONS)
+    assert set(paths) == {"cache"}
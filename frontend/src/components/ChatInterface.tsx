@@ -44,28 +44,60 @@ export default function ChatInterface() {
         setInput('');
         setLoading(true);
 
+        const botId = (Date.now() + 1).toString();
+        const setBotText = (text: string) => {
+            setMessages(prev => prev.some(m => m.id === botId)
+                ? prev.map(m => m.id === botId ? { ...m, text } : m)
+                : [...prev, { id: botId, text, sender: 'bot', timestamp: new Date() }]);
+        };
+
         try {
             const apiUrl = import.meta.env.VITE_API_URL || 'http://localhost:8000';
             const response = await fetch(`${apiUrl}/chat`, {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
+                headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
                 body: JSON.stringify({ message: userMsg.text })
             });
 
-            const data = await response.json();
-
-            const botMsg: Message = {
-                id: (Date.now() + 1).toString(),
-                text: data.answer || "Sorry, I couldn't analyze that.",
-                sender: 'bot',
-                timestamp: new Date()
-            };
-
-            setMessages(prev => [...prev, botMsg]);
+            const contentType = response.headers.get('content-type') || '';
+            if (!response.body || !contentType.includes('text/event-stream')) {
+                // Older backends (or CHAT_STREAMING=0) answer with a single JSON blob
+                const data = await response.json();
+                setBotText(data.answer || "Sorry, I couldn't analyze that.");
+                return;
+            }
+
+            // Server-Sent Events: 'data: {"delta"}' chunks, then 'event: done' / 'event: error' with the full answer
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let text = '';
+            let finished = false;
+            while (!finished) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const events = buffer.split('\n\n');
+                buffer = events.pop() || '';
+                for (const raw of events) {
+                    const event = raw.match(/^event: (.*)$/m)?.[1];
+                    const dataLine = raw.match(/^data: (.*)$/m)?.[1];
+                    if (!dataLine) continue;
+                    const data = JSON.parse(dataLine);
+                    if (event === 'done' || event === 'error') {
+                        setBotText(data.answer || text || "Sorry, I couldn't analyze that.");
+                        finished = true;
+                        break;
+                    }
+                    text += data.delta;
+                    setLoading(false);
+                    setBotText(text);
+                }
+            }
         } catch (error) {
             console.error(error);
             const errorMsg: Message = {
-                id: (Date.now() + 1).toString(),
+                id: (Date.now() + 2).toString(),
                 text: "Error connecting to the AI Analyst. Please ensure the backend is running.",
                 sender: 'bot',
                 timestamp: new Date()